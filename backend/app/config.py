@@ -3,9 +3,10 @@
 """
 
 import os
+import tempfile
 from pathlib import Path
 from pydantic_settings import BaseSettings
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 
 class Settings(BaseSettings):
@@ -20,11 +21,14 @@ class Settings(BaseSettings):
     BASE_DIR: Path = Path(__file__).parent.parent
     PUBLIC_DIR: str = os.getenv("PUBLIC_DIR", "public")
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    RESULT_CACHE_DIR: str = os.getenv("RESULT_CACHE_DIR", "cache")
+    INPUT_CACHE_DIR: str = os.getenv("INPUT_CACHE_DIR", "input_cache")
     SCRIPTS_DIR: Path = Path(__file__).parent / "scripts"
 
     # 文件限制
     MAX_FILE_SIZE_MB: int = 100
     MAX_FILE_SIZE_BYTES: int = MAX_FILE_SIZE_MB * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 流式写入分块大小（1MB），限制单个上传的内存占用
 
     # 允许的文件扩展名
     ALLOWED_DOC_EXT: List[str] = [
@@ -45,18 +49,130 @@ class Settings(BaseSettings):
 
     # 外部工具路径
     FFMPEG_PATH: str = os.getenv("FFMPEG_PATH", "ffmpeg")
+    FFPROBE_PATH: str = os.getenv("FFPROBE_PATH", "ffprobe")  # 获取音频时长以计算进度
     SOFFICE_PATH: str = os.getenv("SOFFICE_PATH", "soffice")
     PYTHON_PATH: str = os.getenv("PYTHON_PATH", "python")
 
     # 公网访问 URL
     PUBLIC_BASE_URL: str = os.getenv("PUBLIC_BASE_URL", "http://localhost:8080")
 
+    # 远程下载（downloadUrl）配置
+    DOWNLOAD_POOL_SIZE: int = 32  # 连接池总连接数
+    DOWNLOAD_POOL_PER_HOST: int = 8  # 单个源站最大连接数
+    DOWNLOAD_DNS_CACHE_TTL: int = 300  # 秒
+    DOWNLOAD_CONNECT_TIMEOUT: int = 10  # 秒
+    DOWNLOAD_READ_TIMEOUT: int = 30  # 秒，两次读取之间的最大间隔
+    DOWNLOAD_TOTAL_TIMEOUT: int = 300  # 秒
+    DOWNLOAD_RANGE_CONCURRENCY: int = 4  # 源站支持 Range 时的并发分段数，1 表示单连接
+    DOWNLOAD_RANGE_MIN_SIZE_MB: int = 8  # 首段大小，小于此值的文件单请求完成
+
     # 转换配置
-    MAX_CONCURRENT: int = 2
+    MAX_CONCURRENT: int = 2  # 自适应并发上限的初始值（见下方 ADAPTIVE_LIMIT_*）
+    # LibreOffice 实例池：每个实例使用从模板复制的独立用户配置，实例之间可并发
+    SOFFICE_POOL_ENABLED: bool = os.getenv("SOFFICE_POOL_ENABLED", "true").lower() == "true"
+    SOFFICE_POOL_UNO: bool = True  # 可导入 uno 时使用常驻监听进程
+    SOFFICE_POOL_SIZE: int = max(MAX_CONCURRENT, min(os.cpu_count() or 1, 8))
+    SOFFICE_PROFILE_DIR: str = os.getenv(
+        "SOFFICE_PROFILE_DIR", str(Path(tempfile.gettempdir()) / "soffice_profiles")
+    )
+    SOFFICE_POOL_BASE_PORT: int = 2002  # 常驻实例 i 监听 BASE_PORT + i
+    # 每个文档转换任务独立的临时输出目录，可指向 tmpfs（如 /dev/shm/convert_scratch）
+    SCRATCH_DIR: str = os.getenv(
+        "SCRATCH_DIR", str(Path(tempfile.gettempdir()) / "convert_scratch")
+    )
+    SOFFICE_MAX_JOBS: int = 200  # 常驻实例执行该数量任务后重启
+    SOFFICE_HEALTH_INTERVAL: int = 60  # 秒，空闲超过该时间的实例分配前检查 UNO 连接
+    # 调度器并发池：分类池互相独立，引擎池限制同一外部程序的进程数
+    # python 引擎同时服务文档脚本和图片转换，上限不低于两者之和，避免互相阻塞
+    SCHEDULER_CATEGORY_LIMITS: Dict[str, int] = {
+        "document": SOFFICE_POOL_SIZE,
+        "audio": 2,
+        "image": 4,
+    }
+    SCHEDULER_ENGINE_LIMITS: Dict[str, int] = {
+        "libreoffice": SOFFICE_POOL_SIZE,
+        "python": SOFFICE_POOL_SIZE + 4,
+        "ffmpeg": 2,
+    }
+    SCHEDULER_AGING_SECONDS: int = 60  # 排队超过该时间的任务不再按文件大小排序
+    # 自适应并发上限（见 concurrency_limit）：ADAPTIVE_LIMIT_CATEGORIES 中各分类合计的
+    # 运行任务数，初始为 MAX_CONCURRENT，按 CPU、可用内存和近期任务延迟在 [MIN, MAX] 内调整；
+    # 图片转换耗时短，只受自身分类池限制，不会排在长文档转换之后
+    ADAPTIVE_LIMIT_ENABLED: bool = os.getenv("ADAPTIVE_LIMIT_ENABLED", "true").lower() == "true"
+    ADAPTIVE_LIMIT_CATEGORIES: List[str] = ["document", "audio"]
+    ADAPTIVE_LIMIT_MIN: int = int(os.getenv("ADAPTIVE_LIMIT_MIN", "1"))
+    ADAPTIVE_LIMIT_MAX: int = int(
+        os.getenv(
+            "ADAPTIVE_LIMIT_MAX",
+            str(sum(map(SCHEDULER_CATEGORY_LIMITS.get, ADAPTIVE_LIMIT_CATEGORIES))),
+        )
+    )
+    ADAPTIVE_LIMIT_INTERVAL: float = 5.0  # 秒，两次调整的间隔
+    ADAPTIVE_CPU_TARGET: float = 75.0  # CPU 使用率低于该值且有任务排队时增大上限
+    ADAPTIVE_CPU_HIGH: float = 90.0  # CPU 使用率达到该值时减小上限
+    ADAPTIVE_MEMORY_LOW_PCT: float = 10.0  # 可用内存占比低于该值时减小上限
+    ADAPTIVE_LATENCY_TOLERANCE: float = 2.0  # 近期每 MB 耗时达到长期值的该倍数时减小上限
+    ADAPTIVE_DECREASE_FACTOR: float = 0.75  # 乘性减小系数
+    # 按内存加权的准入控制（见 memory_admission）：运行中任务的峰值内存估计之和
+    # 不超过 MEMORY_BUDGET_MB（0 为物理内存的 60%）
+    MEMORY_ADMISSION_ENABLED: bool = os.getenv("MEMORY_ADMISSION_ENABLED", "true").lower() == "true"
+    MEMORY_BUDGET_MB: int = int(os.getenv("MEMORY_BUDGET_MB", "0"))
+    # 峰值内存估计的先验系数 (基础 MB, 每 MB 输入, 每页 MB)，按实际用量校准，
+    # 按 "源->目标"、分类、引擎的顺序查找
+    MEMORY_ESTIMATES: Dict[str, Tuple[float, float, float]] = {
+        # pdf2docx 逐页解析版面，multi_processing 时每个进程各自加载文档
+        "pdf->doc": (250, 10, 8),
+        "pdf->docx": (250, 10, 8),
+        # pdf2image 以 200 DPI 把所有页面渲染为位图并同时保留（A4 约 11MB / 页）
+        "pdf->ppt": (200, 4, 14),
+        "pdf->pptx": (200, 4, 14),
+        "pdf->xls": (200, 6, 4),
+        "pdf->xlsx": (200, 6, 4),
+        "pdf->txt": (120, 2, 0.5),
+        # 图片解码后的位图远大于压缩后的文件；PDF 转图片逐页渲染
+        "image": (120, 12, 2),
+        "libreoffice": (300, 10, 1),
+        "python": (150, 4, 0),
+        "ffmpeg": (80, 1, 0),
+    }
+    # CPU 预算（见 cpu_budget）：放行的任务按该核数分配线程 / 进程数，0 为本机可用核数
+    CPU_BUDGET_ENABLED: bool = os.getenv("CPU_BUDGET_ENABLED", "true").lower() == "true"
+    CPU_BUDGET_CORES: int = int(os.getenv("CPU_BUDGET_CORES", "0"))
+
+    # Python 转换 worker 池（常驻进程，避免每个任务重新启动解释器和导入依赖）
+    PY_WORKER_POOL_ENABLED: bool = os.getenv("PY_WORKER_POOL_ENABLED", "true").lower() == "true"
+    PY_WORKER_POOL_SIZE: int = (
+        SOFFICE_POOL_SIZE + 4
+    )  # 最多保留的空闲 worker 数（与 python 引擎池一致）
+    PY_WORKER_MIN_IDLE: int = 1  # 启动时预热的 worker 数
+    PY_WORKER_MAX_TASKS: int = 50  # 单个 worker 执行该数量任务后回收
+    PY_WORKER_MAX_RSS_MB: int = 1024  # worker 常驻内存超过该值后回收
     CONVERSION_TIMEOUT: int = 300  # 秒（增加到5分钟以支持大文件）
+
+    # 转换进程资源限制（见 supervisor），0 为不限制
+    # 内存：配置了可用的 cgroup 时为 memory.max，否则为 RLIMIT_AS（虚拟地址空间，需留余量）
+    ENGINE_MEMORY_LIMITS_MB: Dict[str, int] = {
+        "libreoffice": 4096,
+        "python": 4096,
+        "ffmpeg": 2048,
+    }
+    CONVERSION_CPU_LIMIT: int = CONVERSION_TIMEOUT * 2  # CPU 秒（多线程转换会超过墙钟时间）
+    CONVERSION_MAX_OUTPUT_MB: int = 1024  # 转换进程写入的单个文件大小上限
+    # cgroup v2 目录（需已委派给本服务且不含服务自身进程），每个任务在其下创建子组
+    CONVERSION_CGROUP_DIR: str = os.getenv("CONVERSION_CGROUP_DIR", "")
+    CONVERSION_OUTPUT_TAIL_KB: int = 64  # 保留的转换进程 stdout / stderr 尾部
     CLEANUP_INTERVAL: int = 3600  # 秒（1小时）
     FILE_EXPIRE_TIME: int = 24 * 60 * 60  # 秒（24小时）
 
+    # 转换结果缓存（按输入内容哈希 + 转换参数寻址）
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_MB: int = 1024  # 缓存磁盘预算，超出后按 LRU 淘汰
+
+    # 远程输入缓存（按 downloadUrl + ETag / Last-Modified）
+    INPUT_CACHE_ENABLED: bool = os.getenv("INPUT_CACHE_ENABLED", "true").lower() == "true"
+    INPUT_CACHE_MAX_MB: int = 2048  # 缓存磁盘预算，超出后按 LRU 淘汰
+    INPUT_CACHE_FRESHNESS: int = 300  # 秒，新鲜期内重复提交不访问源站
+
     # PDF转换配置
     PDF_LARGE_FILE_THRESHOLD_MB: int = 20  # 大文件阈值
     PDF_STREAM_PROCESSING: bool = True  # 启用流式处理
@@ -68,6 +184,25 @@ class Settings(BaseSettings):
     # Redis 配置（多实例/Serverless 环境必需）
     # 微信云托管 Redis 内网地址格式: redis://:password@host:port/db
     REDIS_URL: str = os.getenv("REDIS_URL", "")
+    REDIS_MAX_CONNECTIONS: int = 50  # 任务存储连接池上限
+    # 任务状态本地缓存：进行中的任务缓存 TTL 秒（更新时通过发布/订阅失效），
+    # 已结束的任务缓存到过期为止
+    TASK_CACHE_ENABLED: bool = os.getenv("TASK_CACHE_ENABLED", "true").lower() == "true"
+    TASK_CACHE_TTL: int = 10
+    TASK_CACHE_MAX_ENTRIES: int = 10_000
+    # 未配置 Redis 时内存中最多保留的任务数，超出后淘汰最久未访问的已结束任务
+    TASK_MEMORY_MAX_TASKS: int = 100_000
+    # 未配置 Redis 时的 SQLite 任务数据库路径（单实例部署，重启后任务不丢失），
+    # 为空时使用内存存储
+    TASK_DB_PATH: str = os.getenv("TASK_DB_PATH", "")
+    TASK_DB_BATCH_SIZE: int = 256  # 写线程单个事务最多合并的写入数
+    TASK_DB_READERS: int = 4  # 读线程数（每个线程一个连接）
+    # 任务状态推送（SSE / WebSocket）无变化时的心跳间隔（秒），同时重新读取一次任务
+    TASK_EVENTS_HEARTBEAT: int = 15
+    # 任务状态长轮询（GET /convert/task/{id}?wait=）的最长等待时间（秒）
+    TASK_LONG_POLL_MAX_WAIT: int = 30
+    # 转换进度写入任务存储的最小间隔（秒），阶段切换时立即写入
+    TASK_PROGRESS_INTERVAL: float = 1.0
 
     # 音频质量设置
     AUDIO_QUALITY: Dict[str, str] = {
@@ -148,5 +283,9 @@ PYTHON_CONVERSIONS: Dict[str, Dict[str, str]] = {
     "md->docx": {"script": "md_to_docx.py", "description": "Markdown 转 DOCX"},
 }
 
+# 可按 CPU 预算使用多个线程 / 进程的转换脚本（pdf2docx 进程池、pdf2image 渲染线程），
+# 其余脚本为单线程，固定占用 1 个核
+PARALLEL_SCRIPTS = {"pdf_to_doc.py", "pdf_to_ppt.py"}
+
 
 settings = Settings()
@@ -5,15 +5,24 @@ ConvertEasy Backend - FastAPI 文件格式转换服务
 import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Optional
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 
 from app.config import settings
+from app.models import TaskState
 from app.routers import convert
 from app.utils.file_utils import ensure_dir, cleanup_expired_files, check_dependencies
+from app.utils.downloader import downloader
+from app.utils.worker_pool import python_worker_pool
+from app.utils.soffice_pool import soffice_pool
+from app.utils.scheduler import job_scheduler
+from app.utils.supervisor import process_supervisor
+from app.utils.task_manager import task_manager
+from app.utils.task_events import task_events
 from app.middleware.rate_limiter import RateLimiterMiddleware
 
 
@@ -28,11 +37,19 @@ async def lifespan(app: FastAPI):
     print(f"📄 支持文档格式: {', '.join(settings.ALLOWED_DOC_EXT)}")
     print(f"🎵 支持音频格式: {', '.join(settings.ALLOWED_AUDIO_EXT)}")
     print(f"🖼️ 支持图片格式: {', '.join(settings.ALLOWED_IMAGE_EXT)}")
-    print(f"⚡ 并发转换数: {settings.MAX_CONCURRENT}")
+    print(
+        f"⚡ 并发转换数: {settings.MAX_CONCURRENT}"
+        + (
+            f"（自适应 {settings.ADAPTIVE_LIMIT_MIN}-{settings.ADAPTIVE_LIMIT_MAX}）"
+            if settings.ADAPTIVE_LIMIT_ENABLED
+            else ""
+        )
+    )
 
     # 确保目录存在
     ensure_dir(settings.UPLOAD_DIR)
     ensure_dir(settings.PUBLIC_DIR)
+    ensure_dir(settings.RESULT_CACHE_DIR)
 
     # 启动时清理过期文件
     print("🧹 执行启动清理...")
@@ -42,6 +59,24 @@ async def lifespan(app: FastAPI):
     print("🔍 检查系统依赖...")
     await check_dependencies()
 
+    # 远程下载共享连接池
+    await downloader.start()
+
+    # 预热 Python 转换 worker
+    await python_worker_pool.start()
+
+    # 启动 LibreOffice 实例池
+    try:
+        await soffice_pool.start()
+    except Exception as e:
+        print(f"⚠ LibreOffice 实例池启动失败: {e}")
+
+    # 订阅任务更新通知（多实例间同步任务状态本地缓存）
+    await task_manager.start()
+
+    # 按负载定时调整并发上限
+    await job_scheduler.start()
+
     # 启动定时清理任务
     cleanup_task = asyncio.create_task(periodic_cleanup())
 
@@ -55,6 +90,11 @@ async def lifespan(app: FastAPI):
         await cleanup_task
     except asyncio.CancelledError:
         pass
+    await downloader.close()
+    await python_worker_pool.close()
+    await soffice_pool.close()
+    await task_manager.close()
+    await job_scheduler.close()
     print("👋 服务器已关闭")
 
 
@@ -116,7 +156,10 @@ async def server_status():
     import platform
     import psutil
     from datetime import datetime
-    from app.utils.task_manager import task_manager
+    from app.utils.result_cache import result_cache
+    from app.utils.input_cache import input_cache
+    from app.utils.cpu_budget import cpu_budget
+    from app.utils.memory_admission import memory_admission
 
     # 获取目录文件统计
     uploads_count = (
@@ -127,7 +170,7 @@ async def server_status():
     )
 
     # 获取任务统计
-    task_stats = task_manager.get_stats()
+    task_stats = await task_manager.get_stats()
 
     return {
         "status": "running",
@@ -138,6 +181,17 @@ async def server_status():
             "publicBaseUrl": settings.PUBLIC_BASE_URL,
         },
         "tasks": task_stats,
+        "taskCache": task_manager.get_cache_stats(),
+        "taskEvents": task_events.get_stats(),
+        "scheduler": job_scheduler.get_stats(),
+        "cpuBudget": cpu_budget.get_stats(),
+        "memoryAdmission": memory_admission.get_stats(),
+        "pythonWorkers": python_worker_pool.get_stats(),
+        "supervisor": process_supervisor.get_stats(),
+        "libreoffice": soffice_pool.get_stats(),
+        "resultCache": result_cache.get_stats(),
+        "inputCache": input_cache.get_stats(),
+        "conversionFlight": convert.conversion_flight.get_stats(),
         "files": {"uploads": uploads_count, "public": public_count},
         "system": {
             "platform": platform.system(),
@@ -150,6 +204,53 @@ async def server_status():
     }
 
 
+@app.get("/server-status/concurrency")
+async def concurrency_status():
+    """自适应并发上限：当前上限、负载信号和最近的调整记录"""
+    stats = job_scheduler.get_stats()
+    categories = settings.ADAPTIVE_LIMIT_CATEGORIES
+    return {
+        **job_scheduler.limiter.get_status(),
+        "running": sum(stats["running"][c] for c in categories),
+        "queued": sum(stats["queued"][c] for c in categories),
+    }
+
+
+@app.get("/server-status/tasks")
+async def list_recent_tasks(
+    state: Optional[TaskState] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """
+    按创建时间倒序分页列出最近的任务，可按状态过滤
+
+    接口无鉴权，不返回任务 ID（凭 ID 可查询到结果文件地址）和文件路径
+    """
+    stats = await task_manager.get_stats()
+    tasks = await task_manager.list_tasks(state, offset, limit)
+    return {
+        "total": stats[state.value] if state else stats["total"],
+        "offset": offset,
+        "limit": limit,
+        "tasks": [
+            {
+                "state": task.state,
+                "category": task.category,
+                "source": task.source,
+                "target": task.target,
+                "createdAt": task.created_at.isoformat(),
+                "updatedAt": task.updated_at.isoformat(),
+                "queueWaitMs": task.queue_wait_ms,
+                "cpuTimeMs": task.cpu_time_ms,
+                "maxRssKb": task.max_rss_kb,
+                "message": task.error,
+            }
+            for task in tasks
+        ],
+    }
+
+
 @app.post("/cleanup")
 async def manual_cleanup():
     """手动清理过期文件"""
@@ -25,6 +25,10 @@ class TaskState(str, Enum):
     ERROR = "error"
 
 
+# 已结束的任务状态，之后不再变化
+TERMINAL_STATES = (TaskState.FINISHED, TaskState.ERROR)
+
+
 class ConvertTask(BaseModel):
     """转换任务模型"""
 
@@ -42,6 +46,13 @@ class ConvertTask(BaseModel):
     preview_url: Optional[str] = None
     error: Optional[str] = None
     original_filename: Optional[str] = None
+    content_hash: Optional[str] = None
+    started_at: Optional[datetime] = None  # 调度器放行、开始转换的时间
+    queue_wait_ms: Optional[int] = None  # 入队到开始转换的等待时间
+    progress: Optional[int] = None  # 转换进度 0-100（转换进程上报）
+    stage: Optional[str] = None  # 当前转换阶段（转换进程上报）
+    cpu_time_ms: Optional[int] = None  # 转换进程消耗的 CPU 时间（supervisor 统计）
+    max_rss_kb: Optional[int] = None  # 转换进程的峰值内存
 
 
 class UploadResponse(BaseModel):
@@ -59,6 +70,9 @@ class TaskStatusResponse(BaseModel):
     downloadUrl: Optional[str] = None
     previewUrl: Optional[str] = None
     message: Optional[str] = None
+    queueWaitMs: Optional[int] = None
+    progress: Optional[int] = None
+    stage: Optional[str] = None
 
 
 class SupportedFormatsResponse(BaseModel):
@@ -3,14 +3,27 @@
 """
 
 import asyncio
-import aiohttp
-import aiofiles
+import hashlib
+import json
+import re
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
-
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import (
+    APIRouter,
+    UploadFile,
+    File,
+    Form,
+    HTTPException,
+    BackgroundTasks,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import FileResponse, StreamingResponse
 from nanoid import generate as nanoid
 
 from app.config import settings, SUPPORTED_CONVERSIONS
@@ -22,13 +35,23 @@ from app.models import (
     TaskStatusResponse,
     DetectTargetsResponse,
 )
-from app.utils.task_manager import task_manager
+from app.utils.task_manager import task_manager, TERMINAL_STATES
+from app.utils.task_events import task_events
+from app.utils.result_cache import result_cache, conversion_options
+from app.utils.singleflight import SingleFlight
+from app.utils.scheduler import job_scheduler
+from app.utils.input_cache import input_cache
+from app.utils.supervisor import track_usage
 from app.utils.file_utils import (
     detect_ext_by_name,
     is_allowed_ext,
     is_conversion_supported,
     get_supported_targets,
     format_file_size,
+    iter_upload_file,
+    save_stream_to_file,
+    FileTooLargeError,
+    link_or_copy,
     build_public_url,
     build_download_url,
     build_preview_url,
@@ -39,8 +62,13 @@ from app.utils.converter import run_ffmpeg, run_document_conversion, run_image_c
 router = APIRouter()
 general_router = APIRouter()
 
-# 并发限制信号量
-convert_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT)
+# 相同内容、相同目标的进行中转换合并
+conversion_flight = SingleFlight()
+
+# 本实例上执行中（排队或转换中）的任务 -> 执行该任务转换的协程
+running_conversions: Dict[str, asyncio.Task] = {}
+
+CANCELLED_MESSAGE = "任务已取消"
 
 
 @general_router.get("/supported-formats")
@@ -107,6 +135,7 @@ async def upload_and_convert(
     # 处理文件来源
     input_path = None
     original_filename = None
+    hasher = hashlib.sha256()
 
     if file and file.filename:
         # 直接上传的文件
@@ -116,68 +145,163 @@ async def upload_and_convert(
         input_path = Path(settings.UPLOAD_DIR) / filename
         original_filename = Path(file.filename).stem
 
-        # 保存文件
-        async with aiofiles.open(input_path, "wb") as f:
-            content = await file.read()
-            await f.write(content)
+        # 已知大小时提前拒绝
+        if file.size is not None and file.size > settings.MAX_FILE_SIZE_BYTES:
+            raise HTTPException(
+                status_code=413, detail=f"文件大小超过限制 ({settings.MAX_FILE_SIZE_MB}MB)"
+            )
+
+        # 分块流式保存文件，超限时立即中止并删除部分文件
+        try:
+            await save_stream_to_file(
+                iter_upload_file(file, settings.UPLOAD_CHUNK_SIZE),
+                input_path,
+                settings.MAX_FILE_SIZE_BYTES,
+                hasher,
+            )
+        except FileTooLargeError:
+            raise HTTPException(
+                status_code=413, detail=f"文件大小超过限制 ({settings.MAX_FILE_SIZE_MB}MB)"
+            )
+        content_hash = hasher.hexdigest()
 
     elif downloadUrl:
         # 从 URL 下载文件
+        ext = detect_ext_by_name(downloadUrl.split("?")[0])
+        file_id = nanoid()
+        filename = f"{file_id}{ext}"
+        input_path = Path(settings.UPLOAD_DIR) / filename
+        original_filename = cloudPath and Path(cloudPath).stem or file_id
+
+        # 相同 URL 重复提交时复用已下载的文件
         try:
-            ext = detect_ext_by_name(downloadUrl.split("?")[0])
-            file_id = nanoid()
-            filename = f"{file_id}{ext}"
-            input_path = Path(settings.UPLOAD_DIR) / filename
-            original_filename = cloudPath and Path(cloudPath).stem or file_id
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(downloadUrl) as resp:
-                    if resp.status >= 400:
-                        raise HTTPException(status_code=500, detail="下载远程文件失败")
-
-                    async with aiofiles.open(input_path, "wb") as f:
-                        async for chunk in resp.content.iter_chunked(8192):
-                            await f.write(chunk)
+            content_hash = await input_cache.fetch(
+                downloadUrl, input_path, settings.MAX_FILE_SIZE_BYTES
+            )
+        except FileTooLargeError:
+            raise HTTPException(
+                status_code=413, detail=f"文件大小超过限制 ({settings.MAX_FILE_SIZE_MB}MB)"
+            )
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"下载远程文件失败: {str(e)}")
     else:
         raise HTTPException(status_code=400, detail="缺少文件")
 
     # 验证分类和文件类型
-    if category not in ["document", "audio", "image"]:
-        if input_path and input_path.exists():
+    actual_ext = detect_ext_by_name(str(input_path))
+    try:
+        validate_conversion(category, actual_ext, target, source)
+    except HTTPException:
+        if input_path.exists():
             input_path.unlink()
+        raise
+
+    return await submit_task(
+        background_tasks, category, target, input_path, original_filename, content_hash
+    )
+
+
+@router.put("/upload/raw", response_model=UploadResponse)
+async def upload_raw_and_convert(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    category: str,
+    target: str,
+    source: Optional[str] = None,
+    filename: Optional[str] = None,
+):
+    """
+    以原始请求体（application/octet-stream）上传文件并开始转换
+
+    跳过 multipart 解析和临时文件中转，请求体直接流式写入最终的输入路径。
+    源格式取自 filename 的扩展名，未提供 filename 时使用 source。
+    """
+    target = target.lower().lstrip(".")
+
+    if filename:
+        ext = detect_ext_by_name(filename)
+        original_filename = Path(filename).stem
+    elif source:
+        ext = f".{source.lower().lstrip('.')}"
+        original_filename = None
+    else:
+        raise HTTPException(status_code=400, detail="缺少文件名或源格式")
+
+    # 先校验再接收请求体，不支持的请求不会写盘
+    validate_conversion(category, ext, target, source)
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > settings.MAX_FILE_SIZE_BYTES:
+            raise HTTPException(
+                status_code=413, detail=f"文件大小超过限制 ({settings.MAX_FILE_SIZE_MB}MB)"
+            )
+
+    file_id = nanoid()
+    input_path = Path(settings.UPLOAD_DIR) / f"{file_id}{ext}"
+    hasher = hashlib.sha256()
+    try:
+        written = await save_stream_to_file(
+            request.stream(), input_path, settings.MAX_FILE_SIZE_BYTES, hasher
+        )
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=413, detail=f"文件大小超过限制 ({settings.MAX_FILE_SIZE_MB}MB)"
+        )
+
+    if written == 0:
+        input_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="缺少文件")
+
+    return await submit_task(
+        background_tasks,
+        category,
+        target,
+        input_path,
+        original_filename or file_id,
+        hasher.hexdigest(),
+    )
+
+
+def validate_conversion(category: str, ext: str, target: str, source: Optional[str]) -> None:
+    """校验分类、源格式和转换目标，不合法时抛出 HTTPException"""
+    if category not in ["document", "audio", "image"]:
         raise HTTPException(status_code=400, detail="不支持的分类")
 
-    actual_ext = detect_ext_by_name(str(input_path))
-    actual_source = actual_ext.replace(".", "")
+    actual_source = ext.replace(".", "")
 
     # 验证前端传递的源格式
     if source and source.lower() != actual_source:
-        if input_path.exists():
-            input_path.unlink()
         raise HTTPException(
             status_code=400,
             detail=f"文件格式不匹配：选择的是 {source.upper()} 格式，但上传的是 {actual_source.upper()} 文件",
         )
 
     # 验证扩展名
-    if not is_allowed_ext(category, actual_ext):
-        if input_path.exists():
-            input_path.unlink()
+    if not is_allowed_ext(category, ext):
         raise HTTPException(status_code=400, detail="文件类型不被允许")
 
     # 验证转换是否支持
-    if not is_conversion_supported(category, actual_ext, target):
-        if input_path.exists():
-            input_path.unlink()
-        supported = get_supported_targets(category, actual_ext)
+    if not is_conversion_supported(category, ext, target):
+        supported = get_supported_targets(category, ext)
         raise HTTPException(
             status_code=400,
-            detail=f"不支持从 {actual_ext} 转换为 {target}",
+            detail=f"不支持从 {ext} 转换为 {target}",
             headers={"X-Supported-Targets": ",".join(supported)},
         )
 
+
+async def submit_task(
+    background_tasks: BackgroundTasks,
+    category: str,
+    target: str,
+    input_path: Path,
+    original_filename: Optional[str],
+    content_hash: Optional[str] = None,
+) -> UploadResponse:
+    """创建转换任务并提交后台执行，命中结果缓存时直接完成"""
+    actual_source = detect_ext_by_name(str(input_path)).replace(".", "")
+
     # 创建任务
     task_id = nanoid()
     task = ConvertTask(
@@ -188,105 +312,488 @@ async def upload_and_convert(
         source=actual_source,
         input_path=str(input_path),
         original_filename=original_filename,
+        content_hash=content_hash,
     )
-    task_manager.create_task(task)
+
+    # 命中结果缓存：直接链接已有产物，任务创建即完成
+    cache_key = result_cache_key(task)
+    if cache_key:
+        cached_output = await asyncio.to_thread(
+            result_cache.materialize, cache_key, build_output_path(task)
+        )
+        if cached_output:
+            mark_task_finished(task, cached_output)
+            await task_manager.create_task(task)
+            input_path.unlink(missing_ok=True)
+            print(f"⚡ 任务 {task_id} 命中结果缓存: {task.url}")
+            return UploadResponse(taskId=task_id, message="转换完成")
+
+    await task_manager.create_task(task)
+    job_scheduler.enqueue(task)
 
     print(f"📝 任务创建: {task_id}, 文件: {original_filename}, 格式: {actual_source} -> {target}")
 
-    # 后台执行转换
+    # 后台执行转换，由调度器按分类/引擎槽位放行
     background_tasks.add_task(convert_async, task)
 
     return UploadResponse(taskId=task_id, message="任务已提交，正在处理中")
 
 
 @router.get("/task/{task_id}", response_model=TaskStatusResponse)
-async def get_task_status(task_id: str):
-    """查询任务状态"""
-    task = task_manager.get_task(task_id)
+async def get_task_status(
+    task_id: str,
+    wait: float = Query(0, ge=0, le=settings.TASK_LONG_POLL_MAX_WAIT),
+):
+    """
+    查询任务状态
+
+    wait > 0 时为长轮询：任务未结束时最多等待 wait 秒，状态变化后立即返回，
+    超时返回当前状态。无法保持 SSE / WebSocket 连接的客户端用它代替每秒轮询。
+    """
+    task = await task_manager.get_task(task_id)
+    if task and wait and task.state not in TERMINAL_STATES:
+        task = await wait_for_state_change(task, wait)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
 
     print(f"🔍 查询任务状态: {task_id}, 状态: {task.state.value}, URL: {task.url}")
 
+    return task_status_response(task)
+
+
+@router.delete("/task/{task_id}", response_model=TaskStatusResponse)
+async def cancel_task(task_id: str):
+    """
+    取消任务
+
+    排队中的任务移出调度队列；转换中的任务杀掉转换进程组、清理未完成的输出并
+    立即释放调度槽位。任务在其他实例上执行时，由该实例收到任务更新通知后终止转换。
+    已结束的任务不能取消。
+    """
+    task = await task_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if task.state in TERMINAL_STATES:
+        raise HTTPException(status_code=409, detail="任务已结束，无法取消")
+
+    # 先发出取消再写入状态，写入期间转换不会继续推进
+    work = running_conversions.get(task_id)
+    if work is not None:
+        work.cancel()
+    job_scheduler.discard(task_id)
+    await mark_task_cancelled(task)
+    if work is not None:
+        # 等待转换进程被杀掉、槽位释放后再返回
+        await asyncio.wait((work,))
+
+    print(f"🛑 任务 {task_id} 已取消")
+    return task_status_response(task)
+
+
+async def mark_task_cancelled(task: ConvertTask) -> None:
+    task.state = TaskState.ERROR
+    task.error = CANCELLED_MESSAGE
+    task.updated_at = datetime.now()
+    await task_manager.update_task(task, "state", "error")
+
+
+async def wait_for_state_change(task: ConvertTask, timeout: float) -> Optional[ConvertTask]:
+    """
+    等待任务状态离开 task.state，返回最新的任务（任务已不存在时返回 None）
+
+    由任务更新通知唤醒（见 task_events），不轮询任务存储；
+    超时后重新读取一次，错过的通知不会导致返回旧状态。
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    with task_events.subscribe(task.id) as changed:
+        # 订阅前的更新收不到通知，订阅后先重新读取一次
+        current = await task_manager.get_task(task.id)
+        while current is not None and current.state == task.state:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            changed.clear()
+            current = await task_manager.get_task(task.id)
+        return current
+
+
+def task_status_response(task: ConvertTask) -> TaskStatusResponse:
+    """任务状态响应（查询接口与事件推送共用）"""
     return TaskStatusResponse(
         state=task.state,
         url=task.url,
         downloadUrl=task.download_url,
         previewUrl=task.preview_url,
         message=task.error,
+        queueWaitMs=task.queue_wait_ms,
+        progress=task.progress,
+        stage=task.stage,
     )
 
 
-async def convert_async(task: ConvertTask) -> None:
-    """异步执行转换"""
-    async with convert_semaphore:
-        task.state = TaskState.PROCESSING
-        task.updated_at = datetime.now()
-        task_manager.update_task(task)
+async def task_status_events(task_id: str) -> AsyncIterator[Tuple[str, Optional[dict]]]:
+    """
+    任务状态事件流
+
+    先产出当前状态，之后任务每次变化产出一次 ("status", 状态)，任务结束后停止。
+    TASK_EVENTS_HEARTBEAT 秒内没有变化时产出 ("ping", None) 并重新读取一次任务，
+    错过的通知（例如 Redis 订阅连接中断期间）最迟在下一次心跳时补上。
+    任务不存在（已过期或被删除）时产出 ("error", ...) 后停止。
+    """
+    last = None
+    # 先订阅再读取，读取之后的更新不会丢失
+    with task_events.subscribe(task_id) as changed:
+        while True:
+            changed.clear()
+            task = await task_manager.get_task(task_id)
+            if task is None:
+                yield "error", {"message": "任务不存在"}
+                return
+            status = task_status_response(task).model_dump(mode="json", exclude_none=True)
+            if status != last:
+                last = status
+                yield "status", status
+            if task.state in TERMINAL_STATES:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), settings.TASK_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield "ping", None
+
+
+async def _sse_stream(task_id: str) -> AsyncIterator[str]:
+    async for event, data in task_status_events(task_id):
+        if data is None:
+            yield ": ping\n\n"
+        else:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/task/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """订阅任务状态（Server-Sent Events），任务结束后服务端关闭连接"""
+    if not await task_manager.get_task(task_id):
+        raise HTTPException(status_code=404, detail="任务不存在")
 
-        try:
-            # 生成友好文件名
-            now = datetime.now()
-            timestamp = now.strftime("%y%m%d%H%M")
-
-            original_name = task.original_filename or f"document_{task.id[:6]}"
-            # 清理文件名中的特殊字符
-            import re
-
-            clean_name = re.sub(r"[^\w\u4e00-\u9fa5\s]", "_", original_name)
-            clean_name = re.sub(r"\s+", "_", clean_name)
-            friendly_name = f"{clean_name}_{timestamp}"
-
-            print(f"📝 生成文件名: 原始='{original_name}', 最终='{friendly_name}'")
-
-            output_path = Path(settings.PUBLIC_DIR) / f"{friendly_name}.{task.target}"
-
-            if task.category == Category.AUDIO:
-                # 音频转换
-                print(f"🎵 开始音频转换: {task.input_path} -> {output_path}")
-                await run_ffmpeg(task.input_path, str(output_path), task.target)
-            elif task.category == Category.IMAGE:
-                # 图片转换
-                print(f"🖼️ 开始图片转换: {task.input_path} -> {output_path}")
-                await run_image_conversion(task.input_path, str(output_path), task.target)
-            else:
-                # 文档转换
-                source_ext = detect_ext_by_name(task.input_path)
-                final_output = await run_document_conversion(
-                    task.input_path, str(output_path), source_ext, task.target
-                )
-                output_path = Path(final_output)
-
-            # 更新任务状态
-            task.output_path = str(output_path)
-            task.url = build_public_url(f"/public/{output_path.name}")
-            task.download_url = build_download_url(output_path.name)
-            task.preview_url = build_preview_url(output_path.name)
-            task.state = TaskState.FINISHED
-            task.updated_at = datetime.now()
-            task_manager.update_task(task)
+    return StreamingResponse(
+        _sse_stream(task_id),
+        media_type="text/event-stream",
+        # 禁止代理缓冲，事件到达后立即转发
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/task/{task_id}/ws")
+async def task_events_websocket(websocket: WebSocket, task_id: str):
+    """订阅任务状态（WebSocket），消息格式 {"type": "status" | "ping" | "error", ...}"""
+    await websocket.accept()
+
+    async def forward():
+        async for event, data in task_status_events(task_id):
+            await websocket.send_json({"type": event, **(data or {})})
+            if event == "error":
+                await websocket.close(code=1008)
+                return
+        await websocket.close()
+
+    async def wait_disconnect():
+        # 客户端不发送消息，只需要及时发现连接断开以退订
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender = asyncio.create_task(forward())
+    receiver = asyncio.create_task(wait_disconnect())
+    try:
+        await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in (sender, receiver):
+            t.cancel()
+        for t in (sender, receiver):
+            try:
+                await t
+            except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+                pass
+
+
+def build_output_path(task: ConvertTask) -> Path:
+    """
+    生成友好的输出文件路径：原文件名_任务ID前缀_时间戳.目标格式
+
+    时间戳只精确到分钟，同一分钟内上传的同名文件（合并的任务、命中缓存的任务）
+    靠任务 ID 区分，每个任务的产物是独立的文件（链接），过期时只删除自己的；
+    ID 前缀万一重复时使用完整 ID。
+    """
+    timestamp = datetime.now().strftime("%y%m%d%H%M")
+    original_name = task.original_filename or "document"
+
+    for task_id in (task.id[:6], task.id):
+        # 清理文件名中的特殊字符
+        clean_name = re.sub(r"[^\w\u4e00-\u9fa5\s]", "_", f"{original_name}_{task_id}")
+        clean_name = re.sub(r"\s+", "_", clean_name)
+        friendly_name = f"{clean_name}_{timestamp}"
+        output_path = Path(settings.PUBLIC_DIR) / f"{friendly_name}.{task.target}"
+        if not output_path.exists():
+            break
+
+    print(f"📝 生成文件名: 原始='{original_name}', 最终='{friendly_name}'")
+    return output_path
+
+
+# 转换结束时写入的资源用量字段（见 run_conversion）
+USAGE_FIELDS = ("cpu_time_ms", "max_rss_kb")
+# mark_task_finished 修改的字段
+FINISHED_FIELDS = (
+    "state",
+    "output_path",
+    "url",
+    "download_url",
+    "preview_url",
+    "progress",
+    *USAGE_FIELDS,
+)
 
-            file_size = format_file_size(output_path.stat().st_size)
-            print(f"✅ 任务 {task.id} 完成: {task.url}, 大小: {file_size}")
 
-            # 清理输入文件
-            input_file = Path(task.input_path)
-            if input_file.exists():
-                input_file.unlink()
-                print(f"🗑️ 已清理输入文件: {task.input_path}")
+def mark_task_finished(task: ConvertTask, output_path: Path) -> None:
+    """记录输出文件并将任务标记为完成"""
+    task.output_path = str(output_path)
+    task.url = build_public_url(f"/public/{output_path.name}")
+    task.download_url = build_download_url(output_path.name)
+    task.preview_url = build_preview_url(output_path.name)
+    task.progress = 100
+    task.state = TaskState.FINISHED
+    task.updated_at = datetime.now()
+
+
+def result_cache_key(task: ConvertTask) -> Optional[str]:
+    """任务对应的结果缓存键，未计算内容哈希时返回 None"""
+    if not task.content_hash:
+        return None
+    return result_cache.make_key(
+        task.content_hash,
+        task.source or "",
+        task.target,
+        conversion_options(task.category.value, task.target),
+    )
+
 
+async def convert_async(task: ConvertTask) -> None:
+    """
+    异步执行转换
+
+    转换在单独的协程中执行并登记到 running_conversions，本协程同时监听任务更新：
+    任务在执行期间被标记为结束（取消接口写入，可能来自其他实例）时取消转换协程，
+    转换进程随之被杀掉，调度槽位立即释放。
+    """
+    with task_events.subscribe(task.id) as changed:
+        # 订阅后读取一次：任务可能在后台执行开始前就已被取消
+        if await _is_cancelled(task.id):
+            job_scheduler.discard(task.id)
+            cleanup_input(task, "任务已取消")
+            return
+
+        work = asyncio.create_task(execute_conversion(task))
+        running_conversions[task.id] = work
+        watcher = asyncio.create_task(_watch_cancellation(task.id, work, changed))
+        try:
+            output_path = await work
+        except asyncio.CancelledError:
+            if not work.cancelled() or asyncio.current_task().cancelling():
+                raise
+            # 取消接口已写入状态，但转换可能在那之后才写入 processing，这里再写入一次
+            await mark_task_cancelled(task)
+            print(f"🛑 任务 {task.id} 的转换已终止")
+            cleanup_input(task, "任务已取消")
+            return
         except Exception as e:
             task.state = TaskState.ERROR
             task.error = str(e)
             task.updated_at = datetime.now()
-            task_manager.update_task(task)
+            await task_manager.update_task(task, "state", "error", *USAGE_FIELDS)
             print(f"❌ 任务 {task.id} 失败: {e}")
+            cleanup_input(task, "转换失败")
+            return
+        finally:
+            watcher.cancel()
+            running_conversions.pop(task.id, None)
+
+    # 更新任务状态
+    mark_task_finished(task, output_path)
+    await task_manager.update_task(task, *FINISHED_FIELDS)
+
+    file_size = format_file_size(output_path.stat().st_size)
+    print(f"✅ 任务 {task.id} 完成: {task.url}, 大小: {file_size}")
+    cleanup_input(task)
+
+
+async def _is_cancelled(task_id: str) -> bool:
+    current = await task_manager.get_task(task_id)
+    return current is None or current.state in TERMINAL_STATES
+
+
+async def _watch_cancellation(task_id: str, work: asyncio.Task, changed: asyncio.Event) -> None:
+    """任务有更新时重新读取，任务已结束（被取消）或被删除时取消转换协程"""
+    while True:
+        await changed.wait()
+        changed.clear()
+        if await _is_cancelled(task_id):
+            work.cancel()
+            return
+
+
+def cleanup_input(task: ConvertTask, reason: Optional[str] = None) -> None:
+    """清理输入文件"""
+    input_file = Path(task.input_path)
+    if input_file.exists():
+        input_file.unlink()
+        prefix = f"{reason}，" if reason else ""
+        print(f"🗑️ {prefix}已清理输入文件: {task.input_path}")
+
+
+async def execute_conversion(task: ConvertTask) -> Path:
+    """
+    执行转换，返回输出文件路径
+
+    相同内容、相同目标的任务同时在执行时，后到的任务作为 follower 合并到
+    进行中的转换上：不占用调度槽位，与 leader 同时完成或失败。
+    合并的任务之一被取消时，转换为其余任务继续执行。
+    """
+    cache_key = result_cache_key(task)
+    if not cache_key:
+        return await run_conversion(task)
+
+    if conversion_flight.is_inflight(cache_key):
+        job_scheduler.discard(task.id)
+        task.state = TaskState.PROCESSING
+        task.updated_at = datetime.now()
+        await task_manager.update_task(task, "state")
+        print(f"🔗 任务 {task.id} 合并到进行中的相同转换")
+
+    output_path, is_leader = await conversion_flight.do(
+        cache_key, lambda: run_conversion(task, cache_key)
+    )
+    if not is_leader:
+        output_path = await asyncio.to_thread(link_shared_output, task, output_path)
+    return output_path
+
+
+class TaskProgress:
+    """
+    转换进度回调：收到进度事件即更新任务对象，写入任务存储限频
+
+    同一时间最多一个写入在进行，相邻两次写入至少间隔 TASK_PROGRESS_INTERVAL 秒，
+    阶段切换时不受间隔限制。转换结束前调用 flush 等待最后一次写入完成，
+    避免进度写入晚于完成状态到达。
+    """
+
+    def __init__(self, task: ConvertTask):
+        self._task = task
+        self._last_write = 0.0
+        self._pending: Optional[asyncio.Task] = None
+
+    def __call__(self, event: dict) -> None:
+        task = self._task
+        progress = event.get("progress")
+        if progress is None and event.get("total"):
+            progress = event.get("current", 0) / event["total"] * 100
+        stage_changed = event["stage"] != task.stage
+        task.stage = event["stage"]
+        if isinstance(progress, (int, float)):
+            # 完成前不显示 100%
+            task.progress = max(0, min(int(progress), 99))
+
+        # 任务已取消（转换为合并的任务继续执行）时不再写入
+        if self._pending is not None or task.state in TERMINAL_STATES:
+            return
+        now = time.monotonic()
+        if not stage_changed and now - self._last_write < settings.TASK_PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        self._pending = asyncio.create_task(self._write())
+
+    async def _write(self) -> None:
+        try:
+            await task_manager.update_task(self._task, "progress", "stage")
+        except Exception as e:
+            print(f"⚠ 写入任务 {self._task.id} 进度失败: {e}")
+        finally:
+            self._pending = None
+
+    async def flush(self) -> None:
+        if self._pending is not None:
+            await self._pending
+
+
+async def run_conversion(task: ConvertTask, cache_key: Optional[str] = None) -> Path:
+    """等待调度器放行后执行实际转换，返回输出文件路径"""
+    async with job_scheduler.slot(task):
+        # leader 任务已取消、转换为合并的任务继续执行时，不覆盖其取消状态
+        if task.state not in TERMINAL_STATES:
+            task.state = TaskState.PROCESSING
+            task.updated_at = datetime.now()
+            await task_manager.update_task(task, "state", "started_at", "queue_wait_ms")
+
+        output_path = build_output_path(task)
+        progress = TaskProgress(task)
+
+        try:
+            with track_usage() as usage:
+                if task.category == Category.AUDIO:
+                    # 音频转换
+                    print(f"🎵 开始音频转换: {task.input_path} -> {output_path}")
+                    await run_ffmpeg(task.input_path, str(output_path), task.target, progress)
+                elif task.category == Category.IMAGE:
+                    # 图片转换
+                    print(f"🖼️ 开始图片转换: {task.input_path} -> {output_path}")
+                    await run_image_conversion(
+                        task.input_path, str(output_path), task.target, progress
+                    )
+                else:
+                    # 文档转换
+                    source_ext = detect_ext_by_name(task.input_path)
+                    final_output = await run_document_conversion(
+                        task.input_path, str(output_path), source_ext, task.target, progress
+                    )
+                    output_path = Path(final_output)
+        except asyncio.CancelledError:
+            # 转换被终止（所有合并的任务都已取消），删除已写入的部分输出
+            output_path.unlink(missing_ok=True)
+            raise
+        finally:
+            await progress.flush()
+            # 记录转换进程的资源用量（失败的任务同样记录）
+            if usage.processes:
+                task.cpu_time_ms = int(usage.cpu_time * 1000)
+                task.max_rss_kb = usage.max_rss_kb
+
+        # 写入结果缓存（在释放 single-flight 之前，避免新请求落入空窗期）
+        if cache_key:
+            try:
+                await asyncio.to_thread(result_cache.store, cache_key, output_path)
+            except OSError as e:
+                print(f"⚠ 写入结果缓存失败: {e}")
+
+        if task.state in TERMINAL_STATES:
+            # leader 已取消，产物只供合并的任务链接：记录到 leader 任务上，随其过期清理
+            task.output_path = str(output_path)
+            await task_manager.update_task(task, "output_path")
+
+        return output_path
+
+
+def link_shared_output(task: ConvertTask, shared_output: Path) -> Path:
+    """
+    follower 任务：将 leader 的产物链接为自己的输出文件（阻塞）
 
-            # 清理输入文件
-            input_file = Path(task.input_path)
-            if input_file.exists():
-                input_file.unlink()
-                print(f"🗑️ 转换失败，已清理输入文件: {task.input_path}")
+    输出文件名含任务 ID，与 leader 的不同：任务各自过期清理，互不影响
+    """
+    output_path = build_output_path(task).with_suffix(shared_output.suffix)
+    link_or_copy(shared_output, output_path)
+    return output_path
 
 
 # MIME 类型映射
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+转换线程预算 - 后端为每个转换任务分配的 CPU 线程 / 进程数
+
+后端通过环境变量 CONVERT_THREADS 传入（由调度器按总核数和运行中的任务数分配），
+脚本据此设置 pdf2docx 的进程数、pdf2image 的渲染线程数等。
+未设置（命令行直接运行）时使用本机全部可用核数。
+"""
+
+import os
+
+ENV_VAR = "CONVERT_THREADS"
+
+
+def thread_budget():
+    """本次转换可使用的线程 / 进程数"""
+    value = os.environ.get(ENV_VAR, "")
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
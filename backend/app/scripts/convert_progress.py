@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+转换进度上报 - 转换脚本与后端之间的进度协议
+
+后端通过环境变量 CONVERT_PROGRESS_FD 指定一个专用的文件描述符，
+脚本向其写入 JSON 行，每行一个事件:
+    {"stage": "render", "current": 3, "total": 10, "progress": 15, "bytes": 123, "eta": 4.2}
+
+- stage: 当前阶段
+- current / total: 阶段内已完成数 / 总数（通常为页数），可省略
+- progress: 整体进度 0-100，各阶段平均分配
+- bytes: 已输出的字节数，可省略
+- eta: 按已用时间估算的剩余秒数，可省略
+
+标准输出仍用于人读的日志。未设置 CONVERT_PROGRESS_FD（命令行直接运行）时不上报。
+"""
+
+import json
+import os
+import time
+
+ENV_VAR = "CONVERT_PROGRESS_FD"
+# 同一阶段内两次上报的最小间隔（秒），阶段切换和阶段完成总是上报
+MIN_INTERVAL = 0.2
+
+
+class Progress:
+    """进度上报器"""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self._started = time.monotonic()
+        self._stage = None
+        self._last = 0.0
+
+    def update(self, stage, current=None, total=None, bytes_written=None):
+        """上报进度；stage 不在 stages 中时视为第一个阶段"""
+        fd = os.environ.get(ENV_VAR)
+        if not fd:
+            return
+
+        now = time.monotonic()
+        if stage == self._stage and now - self._last < MIN_INTERVAL and current != total:
+            return
+        self._stage = stage
+        self._last = now
+
+        index = self.stages.index(stage) if stage in self.stages else 0
+        fraction = min(current / total, 1.0) if total and current is not None else 0.0
+        overall = (index + fraction) / len(self.stages)
+        event = {"stage": stage, "progress": int(overall * 100)}
+        if total:
+            event["current"] = current
+            event["total"] = total
+        if bytes_written is not None:
+            event["bytes"] = bytes_written
+        if overall > 0:
+            elapsed = now - self._started
+            event["eta"] = round(elapsed * (1 - overall) / overall, 1)
+
+        try:
+            # 单行小于 PIPE_BUF，多个进程同时写入也不会交错
+            os.write(int(fd), (json.dumps(event, ensure_ascii=False) + "\n").encode())
+        except (OSError, ValueError):
+            pass  # 后端已不再读取，不影响转换
@@ -6,6 +6,12 @@ import zipfile
 from PIL import Image
 import fitz  # PyMuPDF
 
+try:
+    from app.scripts.convert_progress import Progress
+except ImportError:
+    # 作为脚本运行时 app 包不在 sys.path 中，脚本目录在
+    from convert_progress import Progress
+
 
 def convert_image_to_image(input_path, output_path, target_format):
     """图片转图片"""
@@ -46,6 +52,7 @@ def convert_pdf_to_image(input_path, output_path, target_format):
     try:
         doc = fitz.open(input_path)
         page_count = len(doc)
+        progress = Progress(["render"])
 
         if page_count == 0:
             print("[ERROR] Empty PDF")
@@ -53,9 +60,11 @@ def convert_pdf_to_image(input_path, output_path, target_format):
 
         # 如果只有一页，直接输出图片
         if page_count == 1:
+            progress.update("render", 0, 1)
             page = doc.load_page(0)
             pix = page.get_pixmap(dpi=150)
             pix.save(output_path)
+            progress.update("render", 1, 1, os.path.getsize(output_path))
             return True
 
         # 如果有多页，打包成 ZIP
@@ -83,15 +92,19 @@ def convert_pdf_to_image(input_path, output_path, target_format):
         if not zip_path.endswith(".zip"):
             zip_path = os.path.splitext(output_path)[0] + ".zip"
 
+        rendered = 0
         with zipfile.ZipFile(zip_path, "w") as zf:
             for i in range(page_count):
+                progress.update("render", i, page_count, rendered)
                 page = doc.load_page(i)
                 pix = page.get_pixmap(dpi=150)
                 img_filename = f"{base_name}_{i+1}.{target_format}"
                 img_path = os.path.join(temp_dir, img_filename)
                 pix.save(img_path)
+                rendered += os.path.getsize(img_path)
                 zf.write(img_path, img_filename)
                 os.remove(img_path)
+        progress.update("render", page_count, page_count, rendered)
 
         # 如果原始 output_path 不是 zip，重命名
         if output_path != zip_path:
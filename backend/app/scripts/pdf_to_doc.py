@@ -6,6 +6,7 @@
 支持后处理以改善格式保留
 """
 import argparse
+import logging
 import os
 import sys
 import time
@@ -17,12 +18,50 @@ from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 
+try:
+    from app.scripts.convert_budget import thread_budget
+    from app.scripts.convert_progress import Progress
+except ImportError:
+    # 作为脚本运行时 app 包不在 sys.path 中，脚本目录在
+    from convert_budget import thread_budget
+    from convert_progress import Progress
+
+# pdf2docx 的四个步骤 + 本脚本的后处理
+STAGES = ("open", "analyze", "parse", "build", "postprocess")
+
+
+class _Pdf2docxProgress(logging.Handler):
+    """把 pdf2docx 的日志（[k/4] 步骤、(i/n) Page 页码）转换为进度事件"""
+
+    STEP_PREFIXES = {"[1/4]": "open", "[2/4]": "analyze", "[3/4]": "parse", "[4/4]": "build"}
+
+    def __init__(self, progress):
+        super().__init__()
+        self.progress = progress
+        self.stage = "open"
+        self.pid = os.getpid()
+
+    def emit(self, record):
+        # multi_processing 时各子进程只解析部分页面，日志中的页码是全局序号，不上报
+        if os.getpid() != self.pid:
+            return
+        message = record.getMessage()
+        for prefix, stage in self.STEP_PREFIXES.items():
+            if prefix in message:
+                self.stage = stage
+                self.progress.update(stage)
+                return
+        if message.startswith("(") and len(record.args or ()) >= 2:
+            current, total = record.args[:2]
+            self.progress.update(self.stage, current, total)
+
 
 def convert_pdf_to_docx(pdf_path, docx_path):
     """
     使用 pdf2docx 转换，针对简历等复杂布局优化参数
     并进行后处理以改善格式
     """
+    handler = None
     try:
         from pdf2docx import Converter
         
@@ -33,7 +72,14 @@ def convert_pdf_to_docx(pdf_path, docx_path):
         print(f"[INFO] 文件大小: {file_size_mb:.2f} MB")
         
         print("[INFO] 第1步: 使用 pdf2docx 转换...")
+        progress = Progress(STAGES)
+        progress.update("open")
+        handler = _Pdf2docxProgress(progress)
+        logging.getLogger().addHandler(handler)
         cv = Converter(pdf_path)
+        # 进程数按后端分配的 CPU 预算，只有 1 个核时不启动进程池
+        threads = thread_budget()
+        print(f"[INFO] 使用 {threads} 个进程")
         
         # 优化参数以处理复杂布局和保留格式
         cv.convert(
@@ -65,13 +111,16 @@ def convert_pdf_to_docx(pdf_path, docx_path):
             keep_font_size=True,             # 保留字体大小
 
             # 其他
-            multi_processing=True,           # 加速 + 更稳定
+            multi_processing=threads > 1,    # 加速 + 更稳定
+            cpu_count=threads,
         )
         
         cv.close()
         
         print("[INFO] 第2步: 后处理以修复格式混乱...")
+        progress.update("postprocess")
         _postprocess_document(docx_path)
+        progress.update("postprocess", 1, 1, os.path.getsize(docx_path))
         
         elapsed = time.time() - start_time
         output_size_mb = os.path.getsize(docx_path) / (1024 * 1024)
@@ -87,6 +136,11 @@ def convert_pdf_to_docx(pdf_path, docx_path):
         traceback.print_exc()
         return False
 
+    finally:
+        # worker 进程会复用，移除本次转换添加的日志处理器
+        if handler is not None:
+            logging.getLogger().removeHandler(handler)
+
 
 def _postprocess_document(docx_path):
     """
@@ -34,6 +34,17 @@ except ImportError:
     print("[ERROR] 请安装: pip install python-pptx")
     sys.exit(1)
 
+try:
+    from app.scripts.convert_budget import thread_budget
+    from app.scripts.convert_progress import Progress
+except ImportError:
+    # 作为脚本运行时 app 包不在 sys.path 中，脚本目录在
+    from convert_budget import thread_budget
+    from convert_progress import Progress
+
+# 渲染 PDF（pdf2image 一次渲染全部页面，无逐页进度）、逐页插入幻灯片、保存
+STAGES = ("render", "build", "save")
+
 
 def _check_poppler() -> bool:
     """
@@ -64,7 +75,9 @@ def pdf_to_images(pdf_path: str, dpi: int = 200) -> List[Image.Image]:
     返回:
         图片列表（PIL Image 对象）
     """
-    print(f"[INFO] 正在将 PDF 转换为图片 (DPI={dpi})...")
+    # pdf2image 按页拆分给多个 pdftoppm 进程并行渲染，进程数按后端分配的 CPU 预算
+    thread_count = thread_budget()
+    print(f"[INFO] 正在将 PDF 转换为图片 (DPI={dpi}, {thread_count} 个渲染进程)...")
     
     try:
         # Windows 平台特殊处理
@@ -84,12 +97,14 @@ def pdf_to_images(pdf_path: str, dpi: int = 200) -> List[Image.Image]:
                     break
             
             if poppler_path:
-                images = convert_from_path(pdf_path, dpi=dpi, poppler_path=poppler_path)
+                images = convert_from_path(
+                    pdf_path, dpi=dpi, poppler_path=poppler_path, thread_count=thread_count
+                )
             else:
                 print("[WARN] 未找到 poppler，尝试使用系统 PATH")
-                images = convert_from_path(pdf_path, dpi=dpi)
+                images = convert_from_path(pdf_path, dpi=dpi, thread_count=thread_count)
         else:
-            images = convert_from_path(pdf_path, dpi=dpi)
+            images = convert_from_path(pdf_path, dpi=dpi, thread_count=thread_count)
         
         print(f"[SUCCESS] 成功转换 {len(images)} 页")
         return images
@@ -104,7 +119,8 @@ def pdf_to_images(pdf_path: str, dpi: int = 200) -> List[Image.Image]:
 
 
 def create_ppt_from_images(images: List[Image.Image], output_path: str, 
-                          slide_width: float = 10, slide_height: float = 7.5) -> bool:
+                           slide_width: float = 10, slide_height: float = 7.5,
+                           progress: Progress = None) -> bool:
     """
     从图片列表创建 PowerPoint 文件
     
@@ -113,6 +129,7 @@ def create_ppt_from_images(images: List[Image.Image], output_path: str,
         output_path: 输出 PPTX 文件路径
         slide_width: 幻灯片宽度（英寸），默认 10
         slide_height: 幻灯片高度（英寸），默认 7.5
+        progress: 进度上报器
     
     返回:
         是否成功
@@ -128,6 +145,8 @@ def create_ppt_from_images(images: List[Image.Image], output_path: str,
         # 为每张图片创建一个幻灯片
         for i, image in enumerate(images, 1):
             print(f"[INFO] 正在添加第 {i}/{len(images)} 页...")
+            if progress:
+                progress.update("build", i - 1, len(images))
             
             # 添加空白幻灯片
             blank_slide_layout = prs.slide_layouts[6]  # 6 = 空白布局
@@ -172,7 +191,11 @@ def create_ppt_from_images(images: List[Image.Image], output_path: str,
         
         # 保存 PowerPoint 文件
         print(f"[INFO] 正在保存 PowerPoint 文件...")
+        if progress:
+            progress.update("save")
         prs.save(output_path)
+        if progress:
+            progress.update("save", 1, 1, os.path.getsize(output_path))
         
         print(f"[SUCCESS] PowerPoint 文件已创建: {output_path}")
         return True
@@ -218,6 +241,8 @@ def pdf_to_ppt(pdf_path: str, ppt_path: str, dpi: int = 200) -> bool:
         
         # 第一步：PDF -> 图片
         print(f"\n[INFO] 步骤 1/2: 将 PDF 转换为图片...")
+        progress = Progress(STAGES)
+        progress.update("render")
         images = pdf_to_images(pdf_path, dpi=dpi)
         
         if not images:
@@ -226,7 +251,7 @@ def pdf_to_ppt(pdf_path: str, ppt_path: str, dpi: int = 200) -> bool:
         
         # 第二步：图片 -> PPT
         print(f"\n[INFO] 步骤 2/2: 将图片插入 PowerPoint...")
-        success = create_ppt_from_images(images, ppt_path)
+        success = create_ppt_from_images(images, ppt_path, progress=progress)
         
         if not success:
             return False
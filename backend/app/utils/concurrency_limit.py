@@ -0,0 +1,192 @@
+"""
+自适应并发上限 - 按 CPU、内存压力和近期任务延迟调整同时执行的转换任务数
+
+调度器的分类池 / 引擎池是静态上限；自适应上限在其之上限制 ADAPTIVE_LIMIT_CATEGORIES
+（文档、音频）合计的运行任务数，图片转换耗时短，只受自身分类池限制。
+由调度器每 ADAPTIVE_LIMIT_INTERVAL 秒调用 adjust() 按 AIMD 调整：
+- 过载（CPU 使用率 >= ADAPTIVE_CPU_HIGH、可用内存 <= ADAPTIVE_MEMORY_LOW_PCT，
+  或某个引擎近期延迟达到长期延迟的 ADAPTIVE_LATENCY_TOLERANCE 倍）时乘性减小；
+- 任务排队且上限已用满、CPU 低于 ADAPTIVE_CPU_TARGET、没有过载信号时加 1；
+- 其余情况保持不变，空闲时不会无限增大。
+上限始终在 [ADAPTIVE_LIMIT_MIN, ADAPTIVE_LIMIT_MAX] 内，初始值为 MAX_CONCURRENT。
+每次决策（包括保持）都保留在调整记录中，连续相同的保持合并为一条并计数。
+
+延迟按引擎统计"每 MB 输入的耗时"（不足 1MB 按 1MB 计），分别维护短期和长期
+指数滑动平均，两者之比反映并发增加后单个任务是否明显变慢。
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, Optional
+
+import psutil
+
+from app.config import settings
+
+# 短期 / 长期延迟的指数滑动平均系数
+SHORT_ALPHA = 0.3
+LONG_ALPHA = 0.05
+# 引擎至少完成该数量的任务后才参考其延迟
+MIN_LATENCY_SAMPLES = 5
+# 保留的调整记录数
+HISTORY_SIZE = 100
+
+
+@dataclass
+class _Latency:
+    """单个引擎的延迟统计（秒 / MB）"""
+
+    short: float
+    long: float
+    samples: int = 1
+
+    def add(self, cost: float) -> None:
+        self.short += SHORT_ALPHA * (cost - self.short)
+        self.long += LONG_ALPHA * (cost - self.long)
+        self.samples += 1
+
+    @property
+    def ratio(self) -> float:
+        if self.samples < MIN_LATENCY_SAMPLES or self.long <= 0:
+            return 1.0
+        return self.short / self.long
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发上限"""
+
+    def __init__(self):
+        self.limit = self._clamp(settings.MAX_CONCURRENT)
+        self._latency: Dict[str, _Latency] = {}
+        self._decisions: Deque[dict] = deque(maxlen=HISTORY_SIZE)
+        self._last: Optional[dict] = None
+        self._increases = 0
+        self._decreases = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ADAPTIVE_LIMIT_ENABLED
+
+    @staticmethod
+    def _clamp(limit: int) -> int:
+        floor = max(1, settings.ADAPTIVE_LIMIT_MIN)
+        return max(floor, min(limit, max(floor, settings.ADAPTIVE_LIMIT_MAX)))
+
+    def record_latency(self, engine: str, seconds: float, size: int) -> None:
+        """记录一个成功完成的任务的执行时间"""
+        cost = seconds / max(size / (1024 * 1024), 1.0)
+        latency = self._latency.get(engine)
+        if latency is None:
+            self._latency[engine] = _Latency(short=cost, long=cost)
+        else:
+            latency.add(cost)
+
+    def latency_ratio(self) -> float:
+        """各引擎短期延迟 / 长期延迟的最大值"""
+        return max((latency.ratio for latency in self._latency.values()), default=1.0)
+
+    @staticmethod
+    def sample() -> dict:
+        """采样系统负载（CPU 使用率为距上次采样的平均值）"""
+        memory = psutil.virtual_memory()
+        return {
+            "cpuPercent": psutil.cpu_percent(interval=None),
+            "memoryAvailablePercent": round(memory.available / memory.total * 100, 1),
+        }
+
+    def adjust(self, running: int, queued: int, signals: Optional[dict] = None) -> bool:
+        """
+        按当前负载调整上限，返回上限是否变化
+
+        参数:
+            running: 运行中的任务数
+            queued: 等待调度的任务数
+            signals: 负载采样（默认调用 sample()）
+        """
+        signals = dict(signals or self.sample())
+        signals["latencyRatio"] = round(self.latency_ratio(), 2)
+        old = self._clamp(self.limit)
+
+        reasons = []
+        if signals["cpuPercent"] >= settings.ADAPTIVE_CPU_HIGH:
+            reasons.append(f"CPU {signals['cpuPercent']:.0f}%")
+        if signals["memoryAvailablePercent"] <= settings.ADAPTIVE_MEMORY_LOW_PCT:
+            reasons.append(f"可用内存 {signals['memoryAvailablePercent']:.0f}%")
+        if signals["latencyRatio"] >= settings.ADAPTIVE_LATENCY_TOLERANCE:
+            reasons.append(f"延迟升高 {signals['latencyRatio']:.1f}x")
+
+        if reasons:
+            action, reason = "decrease", "过载: " + ", ".join(reasons)
+            new = self._clamp(min(old - 1, int(old * settings.ADAPTIVE_DECREASE_FACTOR)))
+            # 以减小后的并发水平重新积累短期延迟，避免同一批慢任务连续触发减小
+            for latency in self._latency.values():
+                latency.short = latency.long
+        elif queued and running >= old and signals["cpuPercent"] < settings.ADAPTIVE_CPU_TARGET:
+            action, reason = "increase", f"{queued} 个任务排队，CPU {signals['cpuPercent']:.0f}%"
+            new = self._clamp(old + 1)
+        else:
+            action, reason, new = "hold", "", old
+
+        if new == old and action != "hold":
+            reason += "（已达上下限）"
+            action = "hold"
+        self.limit = new
+        self._last = {
+            "at": datetime.now().isoformat(),
+            "action": action,
+            "from": old,
+            "to": new,
+            "reason": reason,
+            "running": running,
+            "queued": queued,
+            "count": 1,
+            **signals,
+        }
+        previous = self._decisions[-1] if self._decisions else None
+        if (
+            action == "hold"
+            and previous is not None
+            and (previous["action"], previous["to"], previous["reason"]) == (action, new, reason)
+        ):
+            # 连续相同的保持决策合并为一条，空闲时不会挤掉之前的调整记录
+            self._last["count"] = previous["count"] + 1
+            self._decisions[-1] = self._last
+        else:
+            self._decisions.append(self._last)
+        if new == old:
+            return False
+
+        if new > old:
+            self._increases += 1
+        else:
+            self._decreases += 1
+        print(f"🎚️ 并发上限 {old} -> {new}: {reason}")
+        return True
+
+    def get_status(self) -> dict:
+        """当前上限、负载信号和调整记录（最近的在前）"""
+        return {
+            "enabled": self.enabled,
+            "limit": self.limit,
+            "categories": list(settings.ADAPTIVE_LIMIT_CATEGORIES),
+            "floor": settings.ADAPTIVE_LIMIT_MIN,
+            "ceiling": settings.ADAPTIVE_LIMIT_MAX,
+            "intervalSeconds": settings.ADAPTIVE_LIMIT_INTERVAL,
+            "increases": self._increases,
+            "decreases": self._decreases,
+            "latency": {
+                engine: {
+                    "shortSecondsPerMb": round(latency.short, 3),
+                    "longSecondsPerMb": round(latency.long, 3),
+                    "samples": latency.samples,
+                }
+                for engine, latency in self._latency.items()
+            },
+            "lastDecision": self._last,
+            "decisions": list(reversed(self._decisions)),
+        }
+
+
+# 全局自适应并发上限实例
+concurrency_limiter = AdaptiveConcurrencyLimiter()
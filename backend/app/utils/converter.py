@@ -1,13 +1,31 @@
 """
-转换工具函数 - FFmpeg 和 LibreOffice 转换
+转换工具函数 - FFmpeg、LibreOffice 和 Python 脚本转换
+
+FFmpeg 和 Python 脚本在转换过程中上报进度（见 progress），
+由 on_progress 回调接收；LibreOffice 不上报进度。
+
+外部程序都通过 supervisor 启动：不经过 shell、在独立的进程组中运行并受资源限制，
+超时或任务被取消时杀掉整个进程组，不会留下继续占用 CPU 的孤儿进程。
+转换结果先写入任务独立的临时目录，完成后再移入公开目录，中途失败或
+取消时不会在公开目录留下不完整的文件。
+FFmpeg 和 Python 脚本按调度器分配的 CPU 预算（见 cpu_budget）设置线程 / 进程数。
 """
 
 import asyncio
+import contextlib
 import os
+import shlex
 import shutil
 from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from app.config import PYTHON_CONVERSIONS, settings
+from app.utils.cpu_budget import cpu_budget
+from app.utils.file_utils import move_into_place, scratch_dir
+from app.utils.progress import FfmpegProgressParser, ProgressCallback, ProgressPipe
+from app.utils.soffice_pool import find_soffice, soffice_pool
+from app.utils.supervisor import process_supervisor
+from app.utils.worker_pool import python_worker_pool
 
 
 def safe_decode(byte_data: bytes) -> str:
@@ -27,37 +45,128 @@ def safe_decode(byte_data: bytes) -> str:
             return byte_data.decode("utf-8", errors="replace")
 
 
-async def run_ffmpeg(input_path: str, output_path: str, target_format: str) -> None:
-    """运行 FFmpeg 进行音频转换"""
-    quality = settings.AUDIO_QUALITY.get(target_format, "")
-
-    # 优化参数
-    base_params = "-hide_banner -loglevel error -stats -y"
-    format_params = {
-        "mp3": f"{base_params} -c:a libmp3lame -threads 0 -af 'volume=1.0'",
-        "wav": f"{base_params} -c:a pcm_s16le -ac 2",
-        "aac": f"{base_params} -c:a aac -threads 0 -movflags +faststart",
-        "flac": f"{base_params} -compression_level 8",
-        "ogg": f"{base_params} -c:a libvorbis -qscale:a 5",
-        "m4a": f"{base_params} -c:a aac -b:a 128k -movflags +faststart",
-        "wma": f"{base_params} -c:a wmav2 -b:a 128k",
-    }
+async def _run_script(
+    args: Sequence[str],
+    on_progress: Optional[ProgressCallback],
+    env: Optional[Dict[str, str]] = None,
+) -> Tuple[bytes, bytes]:
+    """运行 Python 脚本子进程，运行期间读取其专用进度管道"""
+    if on_progress is None:
+        result = await process_supervisor.run(args, "python", settings.CONVERSION_TIMEOUT, env=env)
+        return result.stdout, result.stderr
 
-    optimized_params = format_params.get(target_format, base_params)
+    pipe = ProgressPipe(on_progress)
+    try:
+        result = await process_supervisor.run(
+            args,
+            "python",
+            settings.CONVERSION_TIMEOUT,
+            env={**(env or os.environ), **pipe.env()},
+            pass_fds=(pipe.write_fd,),
+        )
+        # 关闭父进程持有的写端后读完管道中剩余的进度（脱离进程组的进程可能仍持有写端）
+        pipe.close_writer()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(pipe.wait_eof(), 1)
+        return result.stdout, result.stderr
+    finally:
+        pipe.close()
+
+
+async def probe_duration(input_path: str) -> Optional[float]:
+    """用 ffprobe 获取媒体时长（秒），失败时返回 None"""
+    ffprobe_path = shutil.which(settings.FFPROBE_PATH)
+    if not ffprobe_path:
+        return None
+    args = [
+        ffprobe_path,
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        input_path,
+    ]
+    try:
+        result = await process_supervisor.run(args, "ffmpeg", 10)
+        return float(result.stdout.decode().strip()) or None
+    except (OSError, ValueError, asyncio.TimeoutError):
+        return None
+
+
+async def run_ffmpeg(
+    input_path: str,
+    output_path: str,
+    target_format: str,
+    on_progress: Optional[ProgressCallback] = None,
+) -> None:
+    """运行 FFmpeg 进行音频转换（-progress 输出到标准输出，增量解析为进度事件）"""
+    # 先写入临时目录，完成后再移入 output_path
+    with scratch_dir() as scratch:
+        scratch_output = scratch / Path(output_path).name
+        await _run_ffmpeg(input_path, str(scratch_output), target_format, on_progress)
+        await asyncio.to_thread(move_into_place, scratch_output, Path(output_path))
+
+
+async def _run_ffmpeg(
+    input_path: str,
+    output_path: str,
+    target_format: str,
+    on_progress: Optional[ProgressCallback],
+) -> None:
+    quality = shlex.split(settings.AUDIO_QUALITY.get(target_format, ""))
+
+    # 优化参数（线程数按 CPU 预算，而不是 -threads 0 占满所有核）
+    base_params = [
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-nostats",
+        "-progress",
+        "pipe:1",
+        "-threads",
+        str(cpu_budget.current()),
+        "-y",
+    ]
+    format_params: Dict[str, List[str]] = {
+        "mp3": ["-c:a", "libmp3lame", "-af", "volume=1.0"],
+        "wav": ["-c:a", "pcm_s16le", "-ac", "2"],
+        "aac": ["-c:a", "aac", "-movflags", "+faststart"],
+        "flac": ["-compression_level", "8"],
+        "ogg": ["-c:a", "libvorbis", "-qscale:a", "5"],
+        "m4a": ["-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart"],
+        "wma": ["-c:a", "wmav2", "-b:a", "128k"],
+    }
 
     ffmpeg_path = shutil.which(settings.FFMPEG_PATH) or settings.FFMPEG_PATH
-    cmd = f'"{ffmpeg_path}" -i "{input_path}" {optimized_params} {quality} "{output_path}"'
+    args = [
+        ffmpeg_path,
+        "-i",
+        input_path,
+        *base_params,
+        *format_params.get(target_format, []),
+        *quality,
+        output_path,
+    ]
 
-    print(f"🎵 Running FFmpeg: {cmd}")
+    print(f"🎵 Running FFmpeg: {shlex.join(args)}")
 
-    proc = await asyncio.create_subprocess_shell(
-        cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
+    duration = await probe_duration(input_path) if on_progress else None
+    parser = FfmpegProgressParser(on_progress or (lambda event: None), duration)
+    pending = b""
 
-    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=settings.CONVERSION_TIMEOUT)
+    def read_progress(data: bytes) -> None:
+        nonlocal pending
+        *lines, pending = (pending + data).split(b"\n")
+        for line in lines:
+            parser.feed_line(line)
+
+    result = await process_supervisor.run(
+        args, "ffmpeg", settings.CONVERSION_TIMEOUT, on_stdout=read_progress
+    )
+    stderr = result.stderr
 
-    if stdout:
-        print(f"FFmpeg output: {safe_decode(stdout)}")
     if stderr:
         print(f"FFmpeg warnings: {safe_decode(stderr)}")
 
@@ -73,60 +182,51 @@ async def run_ffmpeg(input_path: str, output_path: str, target_format: str) -> N
 
 async def run_soffice(input_path: str, output_dir: str, target_format: str) -> str:
     """运行 LibreOffice 进行文档转换"""
-    # 查找 LibreOffice
-    common_paths = [
-        "/usr/bin/soffice",
-        "/usr/local/bin/soffice",
-        "/snap/bin/soffice",
-        "/opt/libreoffice/program/soffice",
-        "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+    # 实例池：每个实例使用独立的用户配置，可并发转换
+    if soffice_pool.enabled:
+        return await soffice_pool.convert(input_path, output_dir, target_format)
+
+    args = [
+        find_soffice(),
+        "--headless",
+        "--norestore",
+        "--nofirststartwizard",
+        "--nologo",
+        "--nodefault",
+        "--view",
+        "--convert-to",
+        target_format,
+        "--outdir",
+        output_dir,
+        input_path,
     ]
 
-    soffice_path = settings.SOFFICE_PATH
-    for path in common_paths:
-        if Path(path).exists():
-            soffice_path = path
-            break
-
-    soffice_path = shutil.which(soffice_path) or soffice_path
+    print(f"📄 Running LibreOffice: {shlex.join(args)}")
 
-    cmd = (
-        f'"{soffice_path}" --headless --norestore --nofirststartwizard '
-        f"--nologo --nodefault --view --convert-to {target_format} "
-        f'--outdir "{output_dir}" "{input_path}"'
+    result = await process_supervisor.run(
+        args, "libreoffice", settings.CONVERSION_TIMEOUT, env={**os.environ, "HOME": "/tmp"}
     )
 
-    print(f"📄 Running LibreOffice: {cmd}")
-
-    proc = await asyncio.create_subprocess_shell(
-        cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        env={**os.environ, "HOME": "/tmp"},
-    )
-
-    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=settings.CONVERSION_TIMEOUT)
-
-    if stdout:
-        print(f"LibreOffice output: {safe_decode(stdout)}")
-    if stderr:
-        print(f"LibreOffice warnings: {safe_decode(stderr)}")
-
-    # 查找输出文件
-    output_dir_path = Path(output_dir)
-    converted_files = list(output_dir_path.glob(f"*.{target_format}"))
+    if result.stdout:
+        print(f"LibreOffice output: {safe_decode(result.stdout)}")
+    if result.stderr:
+        print(f"LibreOffice warnings: {safe_decode(result.stderr)}")
 
-    if not converted_files:
+    # LibreOffice 输出文件名固定为 <输入文件名>.<目标格式>
+    output_file = Path(output_dir) / f"{Path(input_path).stem}.{target_format}"
+    if not output_file.exists():
         raise Exception(f"LibreOffice 转换失败，未生成 .{target_format} 文件")
 
-    # 返回最新的文件
-    latest_file = max(converted_files, key=lambda f: f.stat().st_mtime)
-    print(f"✓ LibreOffice 转换完成: {latest_file}")
+    print(f"✓ LibreOffice 转换完成: {output_file}")
+    return str(output_file)
 
-    return str(latest_file)
 
-
-async def run_python_conversion(input_path: str, output_path: str, conversion_key: str) -> None:
+async def run_python_conversion(
+    input_path: str,
+    output_path: str,
+    conversion_key: str,
+    on_progress: Optional[ProgressCallback] = None,
+) -> None:
     """运行 Python 脚本进行转换"""
     if conversion_key not in PYTHON_CONVERSIONS:
         raise Exception(f"不支持的转换类型: {conversion_key}")
@@ -137,25 +237,34 @@ async def run_python_conversion(input_path: str, output_path: str, conversion_ke
     if not script_path.exists():
         raise Exception(f"转换脚本不存在: {script_path}")
 
-    python_path = shutil.which(settings.PYTHON_PATH) or settings.PYTHON_PATH
-    cmd = f'"{python_path}" "{script_path}" -i "{input_path}" -o "{output_path}"'
-
-    print(f"🐍 Running Python conversion: {cmd}")
-    print(f"   转换类型: {script_info['description']}")
+    if python_worker_pool.enabled:
+        print(f"🐍 Running Python conversion in worker: {script_path.name}")
+        print(f"   转换类型: {script_info['description']}")
+        _, stdout, stderr = await python_worker_pool.run(
+            script_path,
+            ["-i", input_path, "-o", output_path],
+            settings.CONVERSION_TIMEOUT,
+            on_progress,
+            threads=cpu_budget.current(),
+        )
+    else:
+        python_path = shutil.which(settings.PYTHON_PATH) or settings.PYTHON_PATH
+        args = [python_path, str(script_path), "-i", input_path, "-o", output_path]
 
-    proc = await asyncio.create_subprocess_shell(
-        cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        env={**os.environ, "PYTHONPATH": str(script_path.parent)},
-    )
+        print(f"🐍 Running Python conversion: {shlex.join(args)}")
+        print(f"   转换类型: {script_info['description']}")
 
-    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=settings.CONVERSION_TIMEOUT)
+        stdout, stderr = await _run_script(
+            args,
+            on_progress,
+            env={**os.environ, "PYTHONPATH": str(script_path.parent), **cpu_budget.env()},
+        )
+        stdout, stderr = safe_decode(stdout), safe_decode(stderr)
 
     if stdout:
-        print(f"Python output: {safe_decode(stdout)}")
+        print(f"Python output: {stdout}")
     if stderr:
-        print(f"Python warnings: {safe_decode(stderr)}")
+        print(f"Python warnings: {stderr}")
 
     # 验证输出文件
     output = Path(output_path)
@@ -170,7 +279,11 @@ async def run_python_conversion(input_path: str, output_path: str, conversion_ke
 
 
 async def run_document_conversion(
-    input_path: str, output_path: str, source_ext: str, target_format: str
+    input_path: str,
+    output_path: str,
+    source_ext: str,
+    target_format: str,
+    on_progress: Optional[ProgressCallback] = None,
 ) -> str:
     """执行文档转换"""
     source_format = source_ext.replace(".", "")
@@ -179,50 +292,76 @@ async def run_document_conversion(
     print(f"📄 开始文档转换: {input_path} -> {output_path}")
     print(f"   转换类型: {source_format} -> {target_format}")
 
-    # 检查是否需要 Python 脚本
-    if conversion_key in PYTHON_CONVERSIONS:
-        print(f"   使用 Python 脚本: {PYTHON_CONVERSIONS[conversion_key]['description']}")
-        await run_python_conversion(input_path, output_path, conversion_key)
-        return output_path
-    else:
-        # 使用 LibreOffice
-        print("   使用 LibreOffice")
-        output_dir = str(Path(output_path).parent)
-        actual_output = await run_soffice(input_path, output_dir, target_format)
-
-        # 如果输出文件名不一致，重命名
-        if actual_output != output_path and Path(actual_output).exists():
-            try:
-                shutil.move(actual_output, output_path)
-                return output_path
-            except Exception as e:
-                print(f"⚠ 重命名失败，使用原文件名: {e}")
-                return actual_output
-
-        return output_path
-
-
-async def run_image_conversion(input_path: str, output_path: str, target_format: str) -> None:
+    # 转换结果先写入任务独立的临时目录，完成后再原子地移入公开目录：
+    # 并发任务互不干扰，公开目录中也不会出现未写完的文件
+    with scratch_dir() as scratch:
+        # 检查是否需要 Python 脚本
+        if conversion_key in PYTHON_CONVERSIONS:
+            print(f"   使用 Python 脚本: {PYTHON_CONVERSIONS[conversion_key]['description']}")
+            actual_output = str(scratch / Path(output_path).name)
+            await run_python_conversion(input_path, actual_output, conversion_key, on_progress)
+        else:
+            # 使用 LibreOffice
+            print("   使用 LibreOffice")
+            actual_output = await run_soffice(input_path, str(scratch), target_format)
+
+        await asyncio.to_thread(move_into_place, Path(actual_output), Path(output_path))
+
+    return output_path
+
+
+async def run_image_conversion(
+    input_path: str,
+    output_path: str,
+    target_format: str,
+    on_progress: Optional[ProgressCallback] = None,
+) -> None:
     """运行图片转换脚本"""
+    # 多页 PDF 转图片时脚本会在输出目录生成中间文件，统一在临时目录中进行
+    with scratch_dir() as scratch:
+        scratch_output = scratch / Path(output_path).name
+        await _run_image_conversion(input_path, str(scratch_output), target_format, on_progress)
+        await asyncio.to_thread(move_into_place, scratch_output, Path(output_path))
+
+
+async def _run_image_conversion(
+    input_path: str,
+    output_path: str,
+    target_format: str,
+    on_progress: Optional[ProgressCallback],
+) -> None:
     script_path = settings.SCRIPTS_DIR / "image_convert.py"
-    python_path = shutil.which(settings.PYTHON_PATH) or settings.PYTHON_PATH
-
-    cmd = (
-        f'"{python_path}" "{script_path}" -i "{input_path}" -o "{output_path}" -t "{target_format}"'
-    )
 
-    print(f"🖼️ Running Image conversion: {cmd}")
-
-    proc = await asyncio.create_subprocess_shell(
-        cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
-
-    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=settings.CONVERSION_TIMEOUT)
+    if python_worker_pool.enabled:
+        print(f"🖼️ Running Image conversion in worker: {input_path} -> {target_format}")
+        _, stdout, stderr = await python_worker_pool.run(
+            script_path,
+            ["-i", input_path, "-o", output_path, "-t", target_format],
+            settings.CONVERSION_TIMEOUT,
+            on_progress,
+        )
+    else:
+        python_path = shutil.which(settings.PYTHON_PATH) or settings.PYTHON_PATH
+        args = [
+            python_path,
+            str(script_path),
+            "-i",
+            input_path,
+            "-o",
+            output_path,
+            "-t",
+            target_format,
+        ]
+
+        print(f"🖼️ Running Image conversion: {shlex.join(args)}")
+
+        stdout, stderr = await _run_script(args, on_progress)
+        stdout, stderr = safe_decode(stdout), safe_decode(stderr)
 
     if stdout:
-        print(f"Image output: {safe_decode(stdout)}")
+        print(f"Image output: {stdout}")
     if stderr:
-        print(f"Image warnings: {safe_decode(stderr)}")
+        print(f"Image warnings: {stderr}")
 
     if not Path(output_path).exists():
         raise Exception("Image conversion failed, output not found")
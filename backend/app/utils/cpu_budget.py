@@ -0,0 +1,119 @@
+"""
+CPU 预算协调器 - 为每个运行中的转换任务分配线程 / 进程数
+
+各引擎默认按机器核数开线程（pdf2docx 的 multi_processing 创建 cpu_count() 个进程，
+FFmpeg -threads 0），多个任务并发时互相争抢 CPU，每个任务都变慢。
+协调器在调度器放行任务时按总核数和运行中的任务数分配预算，由转换函数传给引擎：
+- 可并行的任务（见 PARALLEL_SCRIPTS，以及 FFmpeg）平分尚未分配的核数，
+  同一批放行的任务一起分配；已入队、即将开始的任务（如同时上传的一批文件）
+  也计入运行任务数，先开始的任务不会占满所有核；
+- 其余任务（LibreOffice、单线程脚本）固定占用 1 个核；
+- 预算在任务开始时确定，运行中不调整；任务结束后归还，供之后放行的任务使用；
+- 核数紧张时每个任务至少 1 个线程，总分配可能略超核数，但不会按任务数倍增；
+- CPU_BUDGET_ENABLED=false 时每个任务都分配全部核数（各引擎自行决定并行度时的行为）。
+
+转换函数通过 current() 读取当前任务的预算（ContextVar），无需逐层传参。
+"""
+
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Mapping, Optional
+
+from app.config import settings
+
+# 传给 Python 转换脚本的环境变量（见 scripts/convert_budget.py）
+THREADS_ENV = "CONVERT_THREADS"
+
+_current_threads: ContextVar[Optional[int]] = ContextVar("cpu_budget_threads", default=None)
+
+
+def available_cores() -> int:
+    """本进程可使用的核数（考虑 CPU 亲和性）"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+class CpuBudgetCoordinator:
+    """CPU 预算协调器"""
+
+    def __init__(self):
+        self._granted: Dict[str, int] = {}
+        self._grants = 0
+        self._threads_granted = 0
+
+    @property
+    def cores(self) -> int:
+        return settings.CPU_BUDGET_CORES or available_cores()
+
+    @property
+    def allocated(self) -> int:
+        return sum(self._granted.values())
+
+    def allocate(self, jobs: Mapping[str, bool], pending: int = 0) -> Dict[str, int]:
+        """
+        为同时放行的一批任务分配预算
+
+        参数:
+            jobs: 任务 ID -> 是否可使用多个线程
+            pending: 已入队、即将开始的任务数，为其预留份额
+
+        返回:
+            任务 ID -> 线程数
+        """
+        parallel = [task_id for task_id, scalable in jobs.items() if scalable]
+        grants = {task_id: 1 for task_id, scalable in jobs.items() if not scalable}
+        if not settings.CPU_BUDGET_ENABLED:
+            grants.update((task_id, self.cores) for task_id in parallel)
+        elif parallel:
+            running = len(self._granted) + len(jobs) + pending
+            free = self.cores - self.allocated - len(grants)
+            # 不超过按运行任务数平分的份额，余数留给之后放行的任务
+            share = max(1, min(self.cores // running, free // len(parallel)))
+            grants.update((task_id, share) for task_id in parallel)
+
+        self._granted.update(grants)
+        self._grants += len(grants)
+        self._threads_granted += sum(grants.values())
+        return grants
+
+    def release(self, task_id: str) -> None:
+        """任务结束，归还预算"""
+        self._granted.pop(task_id, None)
+
+    @contextmanager
+    def use(self, threads: int) -> Iterator[int]:
+        """在上下文中将 threads 设为当前任务的预算"""
+        token = _current_threads.set(threads)
+        try:
+            yield threads
+        finally:
+            _current_threads.reset(token)
+
+    def current(self) -> int:
+        """当前任务的线程预算；不在调度上下文中（如直接调用转换函数）时按空闲核数"""
+        threads = _current_threads.get()
+        if threads is not None:
+            return threads
+        return max(1, self.cores - self.allocated)
+
+    def env(self) -> Dict[str, str]:
+        """传给转换子进程的预算环境变量（同时限制 OpenMP / BLAS 线程池）"""
+        threads = str(self.current())
+        return {THREADS_ENV: threads, "OMP_NUM_THREADS": threads, "OPENBLAS_NUM_THREADS": threads}
+
+    def get_stats(self) -> dict:
+        """获取预算统计"""
+        return {
+            "enabled": settings.CPU_BUDGET_ENABLED,
+            "cores": self.cores,
+            "allocated": self.allocated,
+            "running": len(self._granted),
+            "grants": self._grants,
+            "avgThreads": round(self._threads_granted / self._grants, 2) if self._grants else 0,
+        }
+
+
+# 全局 CPU 预算协调器实例
+cpu_budget = CpuBudgetCoordinator()
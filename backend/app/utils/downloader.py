@@ -0,0 +1,291 @@
+"""
+远程文件下载器 - 处理 downloadUrl 输入
+
+所有下载共享一个由应用生命周期管理的 aiohttp.ClientSession：
+连接池复用 TCP/TLS 连接，DNS 结果缓存，并设置连接/读取/总超时。
+下载前根据 Content-Length 提前拒绝超限文件，下载中再按累计字节数兜底。
+
+源站支持 Range 时，大文件拆分为多个分段并发下载，各分段直接写入
+预分配文件的对应偏移；不支持时回退为单连接流式下载。
+"""
+
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+import aiofiles
+import aiohttp
+
+from app.config import settings
+from app.utils.file_utils import FileTooLargeError, save_stream_to_file
+
+# 自适应分块大小范围：按读取结果逐步放大
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+
+
+class DownloadError(Exception):
+    """远程文件下载失败"""
+
+
+@dataclass
+class DownloadResult:
+    """下载结果及源站返回的缓存校验信息"""
+
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    not_modified: bool = False
+
+    @classmethod
+    def from_response(cls, resp: aiohttp.ClientResponse, size: int) -> "DownloadResult":
+        return cls(size, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+
+
+def parse_content_range(header: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """解析 Content-Range，如 "bytes 0-99/1000" -> (0, 99, 1000)"""
+    if not header:
+        return None
+    match = re.match(r"bytes\s+(\d+)-(\d+)/(\d+)", header.strip())
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2)), int(match.group(3))
+
+
+def split_ranges(start: int, end: int, parts: int) -> List[Tuple[int, int]]:
+    """将 [start, end) 均分为最多 parts 段，返回 (偏移, 长度) 列表"""
+    total = end - start
+    if total <= 0 or parts <= 0:
+        return []
+    size = -(-total // parts)
+    return [(offset, min(size, end - offset)) for offset in range(start, end, size)]
+
+
+def _preallocate(path: Path, size: int) -> None:
+    """创建并预分配目标文件，文件系统不支持 fallocate 时退化为稀疏文件"""
+    with open(path, "wb") as f:
+        if size > 0 and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
+
+
+def _hash_file(path: Path, hasher) -> None:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(MAX_CHUNK_SIZE), b""):
+            hasher.update(block)
+
+
+async def iter_adaptive_chunks(
+    content: aiohttp.StreamReader, content_length: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    自适应分块读取响应体
+
+    初始块大小参考 Content-Length，每次读满一整块时翻倍，直到 MAX_CHUNK_SIZE；
+    慢速连接下保持小块，快速连接下减少循环和写入次数。
+    """
+    chunk_size = MIN_CHUNK_SIZE
+    if content_length:
+        chunk_size = min(max(content_length // 64, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+
+    while True:
+        chunk = await content.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+        if len(chunk) == chunk_size and chunk_size < MAX_CHUNK_SIZE:
+            chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+
+
+class RemoteDownloader:
+    """共享连接池的远程文件下载器"""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=settings.DOWNLOAD_POOL_SIZE,
+            limit_per_host=settings.DOWNLOAD_POOL_PER_HOST,
+            ttl_dns_cache=settings.DOWNLOAD_DNS_CACHE_TTL,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.DOWNLOAD_TOTAL_TIMEOUT,
+            connect=settings.DOWNLOAD_CONNECT_TIMEOUT,
+            sock_read=settings.DOWNLOAD_READ_TIMEOUT,
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def start(self) -> None:
+        """创建共享会话（应用启动时调用）"""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+            self._loop = asyncio.get_running_loop()
+
+    async def close(self) -> None:
+        """关闭共享会话（应用关闭时调用）"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # 未经生命周期启动（如测试环境）或事件循环变化时重新创建
+        if self._loop is not asyncio.get_running_loop():
+            self._session = None
+        await self.start()
+        return self._session
+
+    async def download(
+        self,
+        url: str,
+        dest_path: Path,
+        max_bytes: int,
+        hasher=None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> DownloadResult:
+        """
+        下载远程文件到 dest_path
+
+        首个请求携带 Range 头获取第一段：源站返回 206 时并发拉取其余分段，
+        返回 200 说明不支持 Range，直接按单连接流式下载。
+        传入 etag / last_modified 时发起条件请求，源站返回 304 则不写入文件。
+
+        异常:
+            FileTooLargeError: 文件超过 max_bytes
+            DownloadError: 源站返回错误状态码或分段响应不一致
+        """
+        session = await self._get_session()
+        concurrency = settings.DOWNLOAD_RANGE_CONCURRENCY
+        first_size = settings.DOWNLOAD_RANGE_MIN_SIZE_MB * 1024 * 1024
+
+        conditional = {}
+        if etag:
+            conditional["If-None-Match"] = etag
+        if last_modified:
+            conditional["If-Modified-Since"] = last_modified
+        headers = dict(conditional)
+        if concurrency > 1:
+            headers["Range"] = f"bytes=0-{first_size - 1}"
+
+        async with session.get(url, headers=headers) as resp:
+            if resp.status == 304:
+                return DownloadResult(0, etag, last_modified, not_modified=True)
+            if resp.status >= 400 and resp.status != 416:
+                raise DownloadError(f"源站返回 HTTP {resp.status}")
+            if resp.status == 206:
+                content_range = parse_content_range(resp.headers.get("Content-Range"))
+                if content_range is None or content_range[0] != 0:
+                    raise DownloadError("无法解析 Content-Range")
+                _, first_end, total = content_range
+                if total > max_bytes:
+                    raise FileTooLargeError(max_bytes)
+                await self._download_ranged(
+                    session, url, resp, dest_path, first_end + 1, total, concurrency
+                )
+                if hasher is not None:
+                    await asyncio.to_thread(_hash_file, dest_path, hasher)
+                return DownloadResult.from_response(resp, total)
+            if resp.status != 416:
+                # 200：源站不支持 Range，单连接流式下载
+                size = await self._stream_response(resp, dest_path, max_bytes, hasher)
+                return DownloadResult.from_response(resp, size)
+
+        # 416：空文件等情况下 Range 不可满足，改用普通请求
+        async with session.get(url, headers=conditional) as resp:
+            if resp.status == 304:
+                return DownloadResult(0, etag, last_modified, not_modified=True)
+            if resp.status >= 400:
+                raise DownloadError(f"源站返回 HTTP {resp.status}")
+            size = await self._stream_response(resp, dest_path, max_bytes, hasher)
+            return DownloadResult.from_response(resp, size)
+
+    async def _stream_response(
+        self, resp: aiohttp.ClientResponse, dest_path: Path, max_bytes: int, hasher
+    ) -> int:
+        """单连接流式写入完整响应体"""
+        if resp.content_length is not None and resp.content_length > max_bytes:
+            raise FileTooLargeError(max_bytes)
+
+        return await save_stream_to_file(
+            iter_adaptive_chunks(resp.content, resp.content_length),
+            dest_path,
+            max_bytes,
+            hasher,
+        )
+
+    async def _download_ranged(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        first_resp: aiohttp.ClientResponse,
+        dest_path: Path,
+        first_length: int,
+        total: int,
+        concurrency: int,
+    ) -> None:
+        """首段沿用已打开的响应，其余部分拆分后并发拉取，写入预分配文件的对应偏移"""
+        # 首段只有 DOWNLOAD_RANGE_MIN_SIZE_MB，很快结束，剩余部分按并发数均分
+        segments = split_ranges(first_length, total, concurrency)
+
+        # If-Range 保证各分段来自同一版本的文件，版本变化时源站返回 200
+        validator = first_resp.headers.get("ETag") or first_resp.headers.get("Last-Modified")
+        extra_headers = {"If-Range": validator} if validator else {}
+
+        try:
+            _preallocate(dest_path, total)
+            async with asyncio.TaskGroup() as group:
+                group.create_task(
+                    self._write_segment(first_resp.content, dest_path, 0, first_length)
+                )
+                for offset, length in segments:
+                    group.create_task(
+                        self._fetch_segment(session, url, dest_path, offset, length, extra_headers)
+                    )
+        except BaseException as e:
+            Path(dest_path).unlink(missing_ok=True)
+            if isinstance(e, BaseExceptionGroup):
+                raise e.exceptions[0]
+            raise
+
+    async def _fetch_segment(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        dest_path: Path,
+        offset: int,
+        length: int,
+        extra_headers: dict,
+    ) -> None:
+        headers = {"Range": f"bytes={offset}-{offset + length - 1}", **extra_headers}
+        async with session.get(url, headers=headers) as resp:
+            if resp.status != 206:
+                raise DownloadError(f"分段请求返回 HTTP {resp.status}，文件可能已变更")
+            await self._write_segment(resp.content, dest_path, offset, length)
+
+    async def _write_segment(
+        self, content: aiohttp.StreamReader, dest_path: Path, offset: int, length: int
+    ) -> None:
+        received = 0
+        async with aiofiles.open(dest_path, "r+b") as f:
+            await f.seek(offset)
+            async for chunk in iter_adaptive_chunks(content, length):
+                received += len(chunk)
+                if received > length:
+                    raise DownloadError("分段数据超出请求范围")
+                await f.write(chunk)
+        if received != length:
+            raise DownloadError(f"分段下载不完整: {received}/{length} 字节")
+
+
+# 全局下载器实例
+downloader = RemoteDownloader()
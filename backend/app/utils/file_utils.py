@@ -3,9 +3,16 @@
 """
 
 import asyncio
+import errno
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, Iterator, List
+
+import aiofiles
 
 from app.config import settings, SUPPORTED_CONVERSIONS, PYTHON_CONVERSIONS
 
@@ -97,6 +104,97 @@ def get_supported_targets(category: str, source_ext: str) -> List[str]:
     return supported
 
 
+class FileTooLargeError(Exception):
+    """文件超过大小限制"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"文件大小超过限制 ({format_file_size(max_bytes)})")
+
+
+async def iter_upload_file(file, chunk_size: int) -> AsyncIterator[bytes]:
+    """按块读取上传文件（UploadFile），避免整体读入内存"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def save_stream_to_file(
+    chunks: AsyncIterator[bytes], dest_path: Path, max_bytes: int, hasher=None
+) -> int:
+    """
+    将字节流分块写入磁盘，边写边统计大小
+
+    累计字节数一旦超过 max_bytes 立即抛出 FileTooLargeError；
+    任何异常（超限、客户端断开等）都会删除已写入的部分文件。
+    传入 hasher（如 hashlib.sha256()）时同步计算内容摘要。
+
+    返回:
+        写入的总字节数
+    """
+    written = 0
+    try:
+        async with aiofiles.open(dest_path, "wb") as f:
+            async for chunk in chunks:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise FileTooLargeError(max_bytes)
+                if hasher is not None:
+                    hasher.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        Path(dest_path).unlink(missing_ok=True)
+        raise
+    return written
+
+
+def link_or_copy(src: Path, dest: Path) -> None:
+    """硬链接文件（覆盖已存在的 dest），跨文件系统时回退为复制"""
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+@contextmanager
+def scratch_dir(prefix: str = "job_") -> Iterator[Path]:
+    """为单个转换任务创建独立的临时目录，退出时连同其中文件一起删除"""
+    ensure_dir(settings.SCRATCH_DIR)
+    path = Path(tempfile.mkdtemp(prefix=prefix, dir=settings.SCRATCH_DIR))
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def move_into_place(src: Path, dest: Path) -> None:
+    """
+    原子地将 src 移动到 dest（覆盖已存在的 dest）
+
+    同一文件系统内直接 rename；src 在其他文件系统（如 tmpfs）时，
+    先复制到 dest 所在目录的临时文件再 rename，dest 不会出现写了一半的文件。
+    """
+    try:
+        os.replace(src, dest)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    fd, tmp = tempfile.mkstemp(prefix=".", suffix=".part", dir=dest.parent)
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    src.unlink(missing_ok=True)
+
+
 def format_file_size(bytes_size: int) -> str:
     """格式化文件大小"""
     if bytes_size < 1024:
@@ -134,7 +232,7 @@ async def cleanup_expired_files() -> None:
     print(f"🧹 开始清理过期文件，当前时间: {now.isoformat()}")
 
     # 清理过期任务和文件
-    expired_tasks = task_manager.get_expired_tasks(expire_time)
+    expired_tasks = await task_manager.get_expired_tasks(expire_time)
     for task in expired_tasks:
         # 删除输入文件
         if task.input_path and Path(task.input_path).exists():
@@ -152,9 +250,16 @@ async def cleanup_expired_files() -> None:
             except Exception as e:
                 print(f"✗ 清理输出文件失败: {task.output_path} - {e}")
 
-        task_manager.delete_task(task.id)
+        await task_manager.delete_task(task.id)
         print(f"✓ 清理过期任务: {task.id}")
 
+    # 清理过期的转换结果缓存和远程输入缓存
+    from app.utils.result_cache import result_cache
+    from app.utils.input_cache import input_cache
+
+    await asyncio.to_thread(result_cache.evict_expired)
+    input_cache.evict_expired()
+
     # 清理 uploads 目录中的孤立文件（超过1小时）
     await cleanup_orphaned_files(settings.UPLOAD_DIR, 3600, "uploads")
 
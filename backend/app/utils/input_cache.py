@@ -0,0 +1,220 @@
+"""
+远程输入缓存 - 按 downloadUrl 缓存下载过的文件
+
+小程序经常用同一个云文件（downloadUrl + cloudPath）提交不同的目标格式。
+缓存以完整 URL 为键，记录源站返回的 ETag / Last-Modified：
+- 新鲜期（INPUT_CACHE_FRESHNESS）内再次提交：不访问源站，直接复用；
+- 超过新鲜期：携带 If-None-Match / If-Modified-Since 发起条件请求，
+  源站返回 304 时复用缓存，返回 200 时替换缓存文件。
+复用时将缓存文件硬链接到 UPLOAD_DIR，转换完成后删除的只是任务自己的链接。
+
+缓存只以 URL 为键而不使用 cloudPath：cloudPath 由客户端提交，
+若按它跳过源站请求，其他用户可以用同名 cloudPath 预先写入任意内容。
+
+索引只保存在本实例内存中，首次使用时删除缓存目录中按缓存命名规则
+（URL 的 SHA-256、下载中的 .part 文件）生成的遗留文件，目录中的其他文件不受影响；
+缓存按 INPUT_CACHE_MAX_MB 做 LRU 淘汰，超过 FILE_EXPIRE_TIME 未使用的条目
+由 cleanup_expired_files 清理。
+"""
+
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from nanoid import generate as nanoid
+
+from app.config import settings
+from app.utils.downloader import downloader
+from app.utils.file_utils import FileTooLargeError, link_or_copy
+from app.utils.singleflight import SingleFlight
+
+# 缓存文件名：URL 的 SHA-256，或下载中的临时文件 <nanoid>.part
+CACHE_FILE_PATTERN = re.compile(r"[0-9a-f]{64}|[\w-]{21}\.part")
+
+
+@dataclass
+class _InputEntry:
+    path: Path
+    size: int
+    content_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float  # 最近一次与源站确认的时间
+    last_used: float
+
+
+class InputCache:
+    """远程输入缓存（新鲜期 + 条件请求 + 磁盘预算 LRU）"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, _InputEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded_dir: Optional[Path] = None
+        # 同一 URL 的并发下载只访问一次源站
+        self._flight = SingleFlight()
+        self._hits = 0
+        self._revalidated = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.INPUT_CACHE_ENABLED
+
+    def _ensure_loaded(self) -> Path:
+        """
+        首次使用（或缓存目录变更）时删除遗留的缓存文件：索引不落盘，无法复用
+
+        只删除符合缓存命名规则的文件，INPUT_CACHE_DIR 误配置为其他目录时不会清空其内容
+        """
+        cache_dir = Path(settings.INPUT_CACHE_DIR)
+        if self._loaded_dir == cache_dir:
+            return cache_dir
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for file_path in cache_dir.iterdir():
+            if CACHE_FILE_PATTERN.fullmatch(file_path.name) and file_path.is_file():
+                file_path.unlink(missing_ok=True)
+        self._entries.clear()
+        self._total_bytes = 0
+        self._loaded_dir = cache_dir
+        return cache_dir
+
+    def _remove(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size
+        try:
+            entry.path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"✗ 删除输入缓存文件失败: {entry.path} - {e}")
+
+    def _get_entry(self, url: str) -> Optional[_InputEntry]:
+        entry = self._entries.get(url)
+        if entry is not None and not entry.path.exists():
+            self._remove(url)
+            return None
+        return entry
+
+    async def fetch(self, url: str, dest_path: Path, max_bytes: int) -> str:
+        """
+        获取远程文件到 dest_path
+
+        返回:
+            文件内容的 SHA-256
+
+        异常:
+            与 RemoteDownloader.download 相同
+        """
+        if not self.enabled:
+            hasher = hashlib.sha256()
+            await downloader.download(url, dest_path, max_bytes, hasher)
+            return hasher.hexdigest()
+
+        self._ensure_loaded()
+        entry = self._get_entry(url)
+        if entry is not None and time.time() - entry.fetched_at <= settings.INPUT_CACHE_FRESHNESS:
+            self._hits += 1
+        else:
+            entry, _ = await self._flight.do(url, lambda: self._refresh(url, max_bytes))
+
+        if entry.size > max_bytes:
+            raise FileTooLargeError(max_bytes)
+
+        entry.last_used = time.time()
+        if url in self._entries:
+            self._entries.move_to_end(url)
+        link_or_copy(entry.path, dest_path)
+        return entry.content_hash
+
+    async def _refresh(self, url: str, max_bytes: int) -> _InputEntry:
+        """向源站确认缓存条目：304 时沿用，否则下载新版本替换"""
+        cache_dir = self._ensure_loaded()
+        entry = self._get_entry(url)
+        temp_path = cache_dir / f"{nanoid()}.part"
+        hasher = hashlib.sha256()
+
+        try:
+            result = await downloader.download(
+                url,
+                temp_path,
+                max_bytes,
+                hasher,
+                etag=entry and entry.etag,
+                last_modified=entry and entry.last_modified,
+            )
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+        now = time.time()
+        if result.not_modified and entry is not None:
+            self._revalidated += 1
+            entry.fetched_at = now
+            return entry
+
+        self._misses += 1
+        self._remove(url)
+        cache_path = cache_dir / hashlib.sha256(url.encode()).hexdigest()
+        # 替换文件名而非改写内容，已链接到 UPLOAD_DIR 的旧版本不受影响
+        os.replace(temp_path, cache_path)
+
+        entry = _InputEntry(
+            path=cache_path,
+            size=result.size,
+            content_hash=hasher.hexdigest(),
+            etag=result.etag,
+            last_modified=result.last_modified,
+            fetched_at=now,
+            last_used=now,
+        )
+        self._entries[url] = entry
+        self._total_bytes += entry.size
+
+        # 刚加入的条目位于末尾，至少保留它直到链接完成
+        max_cache_bytes = settings.INPUT_CACHE_MAX_MB * 1024 * 1024
+        while self._total_bytes > max_cache_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+        return entry
+
+    def evict_expired(self) -> int:
+        """删除超过 FILE_EXPIRE_TIME 未使用的缓存条目"""
+        if not self.enabled or self._loaded_dir is None:
+            return 0
+
+        now = time.time()
+        expired = [
+            url
+            for url, entry in self._entries.items()
+            if now - entry.last_used > settings.FILE_EXPIRE_TIME
+        ]
+        for url in expired:
+            self._remove(url)
+        if expired:
+            print(f"🧹 清理了 {len(expired)} 个过期的远程输入缓存")
+        return len(expired)
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        lookups = self._hits + self._revalidated + self._misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self._hits,
+            "revalidated": self._revalidated,
+            "misses": self._misses,
+            "hitRate": round((self._hits + self._revalidated) / lookups, 4) if lookups else 0.0,
+            "evictions": self._evictions,
+        }
+
+
+# 全局远程输入缓存实例
+input_cache = InputCache()
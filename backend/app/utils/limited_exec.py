@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+受限 exec 包装程序 - 设置资源限制、加入 cgroup 后 exec 转换程序
+
+监管器不在 fork 之后执行 preexec_fn：后端进程中有线程池和 SQLite 写线程，
+fork 出的子进程在 exec 前执行 Python 代码可能因继承的锁而死锁。改为以本文件为入口
+启动转换程序：
+
+    python -S limited_exec.py [--memory-mb N] [--cpu-seconds N] [--file-size-mb N]
+                              [--cgroup DIR] -- 程序 参数...
+
+包装程序在新进程中设置 rlimit、把自己移入任务的 cgroup，再 exec 目标程序。
+exec 不改变进程号，监管器仍按 pid 等待、按进程组终止。
+只依赖标准库、不导入 app 包，额外开销只有一次解释器启动。
+"""
+
+import argparse
+import os
+import resource
+import signal
+import sys
+from typing import Optional
+
+MB = 1024 * 1024
+
+
+def set_limit(kind: int, soft: int, hard: Optional[int] = None) -> None:
+    """设置 rlimit，不超过当前的硬限制"""
+    _, current_hard = resource.getrlimit(kind)
+    hard = soft if hard is None else hard
+    if current_hard != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current_hard), min(hard, current_hard)
+    resource.setrlimit(kind, (soft, hard))
+
+
+def apply_limits(memory_mb: int = 0, cpu_seconds: int = 0, file_size_mb: int = 0) -> None:
+    """在当前进程设置内存（RLIMIT_AS）、CPU 时间和单个输出文件大小限制（0 为不限制）"""
+    if memory_mb:
+        set_limit(resource.RLIMIT_AS, memory_mb * MB)
+    if cpu_seconds:
+        # 软限制发送 SIGXCPU，仍未退出时硬限制发送 SIGKILL
+        set_limit(resource.RLIMIT_CPU, cpu_seconds, cpu_seconds + 5)
+    if file_size_mb:
+        set_limit(resource.RLIMIT_FSIZE, file_size_mb * MB)
+
+
+def join_cgroup(path: str) -> None:
+    """把当前进程移入 cgroup（之后 fork 的进程都在组内）"""
+    fd = os.open(os.path.join(path, "cgroup.procs"), os.O_WRONLY)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+    finally:
+        os.close(fd)
+
+
+def restore_signals() -> None:
+    """
+    恢复解释器启动时忽略的信号（与 subprocess 的 restore_signals 相同）
+
+    忽略状态会经 exec 继承，不恢复时目标程序超出 RLIMIT_FSIZE 不会被 SIGXFSZ 终止
+    """
+    for name in ("SIGPIPE", "SIGXFSZ"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), signal.SIG_DFL)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="设置资源限制后 exec 转换程序")
+    parser.add_argument("--memory-mb", type=int, default=0)
+    parser.add_argument("--cpu-seconds", type=int, default=0)
+    parser.add_argument("--file-size-mb", type=int, default=0)
+    parser.add_argument("--cgroup")
+    parser.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("缺少要执行的程序")
+
+    try:
+        if args.cgroup:
+            join_cgroup(args.cgroup)
+        apply_limits(args.memory_mb, args.cpu_seconds, args.file_size_mb)
+        restore_signals()
+        os.execvp(command[0], command)
+    except OSError as e:
+        print(f"limited_exec: {command[0]}: {e}", file=sys.stderr)
+        sys.exit(127)
+
+
+if __name__ == "__main__":
+    main()
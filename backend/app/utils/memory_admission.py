@@ -0,0 +1,165 @@
+"""
+按内存加权的准入控制 - 估计每个转换任务的峰值内存，合计不超过内存预算时才放行
+
+并发池按任务数计数，一个 90MB 扫描版 PDF 以 200 DPI 转 PPT（pdf2image 把每页渲染为
+位图并全部保留在内存中）和一个 txt->docx 同样只占一个槽位。准入控制在入队时估计
+任务的峰值内存，调度器只在运行中任务的估计值之和加上新任务不超过 MEMORY_BUDGET_MB
+时放行：
+- 估计 = (基础 + 每 MB 输入 × 输入大小 + 每页 × 页数) × 校准系数，
+  先验系数见 MEMORY_ESTIMATES，按 "源->目标"、分类、引擎的顺序查找；
+- 入队在上传请求中同步执行，只按输入大小估计；PDF 页数在等待调度前由 add_pages()
+  在线程中解析后补充，大文件不会阻塞事件循环；
+- 任务结束后用实际峰值内存（supervisor / worker 统计的 max_rss_kb）校准对应转换类型的
+  系数：实际值高于估计时快速上调，低于估计时缓慢下调，宁可高估；
+- 没有运行中的任务时总是放行，单个超出预算的任务不会永远等待；
+- 调度器中等待过久的任务因内存不足不能放行时，同一分类中排在其后的任务、以及单独
+  就会让其无法放行的大任务不再放行，为其腾出内存；其他分类的小任务照常放行。
+
+常驻 LibreOffice（UNO）实例转换没有按任务的资源统计，其估计值只使用先验系数。
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import psutil
+
+from app.config import settings
+from app.models import ConvertTask
+
+# 校准系数的指数滑动平均：实际值高于 / 低于估计时的权重
+RAISE_ALPHA = 0.5
+LOWER_ALPHA = 0.1
+MIN_FACTOR = 0.25
+MAX_FACTOR = 10.0
+
+
+def count_pages(path: str) -> Optional[int]:
+    """PDF 页数（只解析交叉引用表，不渲染页面）；非 PDF 或无法解析时返回 None"""
+    if not path.lower().endswith(".pdf"):
+        return None
+    try:
+        import fitz
+
+        with fitz.open(path) as doc:
+            return doc.page_count
+    except Exception:
+        return None
+
+
+@dataclass
+class MemoryEstimate:
+    """一个任务的峰值内存估计"""
+
+    key: str  # 先验系数和校准系数对应的转换类型
+    prior_mb: float  # 未校准的估计，放行时乘以当前的校准系数
+    per_page: float = 0  # 每页的先验系数，补充页数后计入 prior_mb
+    pages: Optional[int] = None
+
+
+@dataclass
+class _Calibration:
+    factor: float = 1.0
+    samples: int = 0
+
+    def observe(self, ratio: float) -> None:
+        alpha = RAISE_ALPHA if ratio > self.factor else LOWER_ALPHA
+        self.factor = min(max(self.factor + alpha * (ratio - self.factor), MIN_FACTOR), MAX_FACTOR)
+        self.samples += 1
+
+
+class MemoryAdmission:
+    """按内存加权的准入控制"""
+
+    def __init__(self):
+        self._reserved: Dict[str, int] = {}
+        self._calibration: Dict[str, _Calibration] = {}
+        self._admitted = 0
+        self._deferred = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.MEMORY_ADMISSION_ENABLED
+
+    @property
+    def budget_mb(self) -> int:
+        if settings.MEMORY_BUDGET_MB:
+            return settings.MEMORY_BUDGET_MB
+        return int(psutil.virtual_memory().total / (1024 * 1024) * 0.6)
+
+    @property
+    def reserved_mb(self) -> int:
+        return sum(self._reserved.values())
+
+    @staticmethod
+    def _prior_key(task: ConvertTask, engine: str) -> str:
+        for key in (f"{task.source}->{task.target}", task.category.value):
+            if key in settings.MEMORY_ESTIMATES:
+                return key
+        return engine
+
+    def estimate(self, task: ConvertTask, engine: str, size: int) -> MemoryEstimate:
+        """按输入大小估计任务的峰值内存（不解析文件，页数由 add_pages() 补充）"""
+        key = self._prior_key(task, engine)
+        base, per_mb, per_page = settings.MEMORY_ESTIMATES.get(key, (200, 4, 1))
+        prior = base + per_mb * size / (1024 * 1024)
+        return MemoryEstimate(key=key, prior_mb=prior, per_page=per_page)
+
+    async def add_pages(self, estimate: MemoryEstimate, path: str) -> None:
+        """在线程中统计 PDF 页数并计入估计（每个估计只统计一次）"""
+        if not estimate.per_page or estimate.pages is not None:
+            return
+        pages = await asyncio.to_thread(count_pages, path)
+        if pages is not None and estimate.pages is None:
+            estimate.pages = pages
+            estimate.prior_mb += estimate.per_page * pages
+
+    def calibrated_mb(self, estimate: MemoryEstimate) -> int:
+        """按同类任务的实际峰值内存校准后的估计（MB）"""
+        calibration = self._calibration.get(estimate.key)
+        return int(estimate.prior_mb * (calibration.factor if calibration else 1.0))
+
+    def fits(self, estimate: MemoryEstimate) -> bool:
+        """放行该任务后估计值之和是否在预算内（没有运行中的任务时总是放行）"""
+        if not self.enabled or not self._reserved:
+            return True
+        return self.reserved_mb + self.calibrated_mb(estimate) <= self.budget_mb
+
+    def admit(self, task_id: str, estimate: MemoryEstimate) -> None:
+        """任务放行，占用其估计内存"""
+        self._reserved[task_id] = self.calibrated_mb(estimate)
+        self._admitted += 1
+
+    def defer(self) -> None:
+        """任务因内存预算不足推迟放行（每个任务只计一次）"""
+        self._deferred += 1
+
+    def release(self, task_id: str) -> None:
+        """任务结束，归还估计内存"""
+        self._reserved.pop(task_id, None)
+
+    def observe(self, estimate: MemoryEstimate, max_rss_kb: int) -> None:
+        """用任务实际峰值内存校准同类任务的估计"""
+        if max_rss_kb <= 0 or estimate.prior_mb <= 0:
+            return
+        calibration = self._calibration.setdefault(estimate.key, _Calibration())
+        calibration.observe(max_rss_kb / 1024 / estimate.prior_mb)
+
+    def get_stats(self) -> dict:
+        """获取准入统计"""
+        return {
+            "enabled": self.enabled,
+            "budgetMb": self.budget_mb,
+            "reservedMb": self.reserved_mb,
+            "running": len(self._reserved),
+            "admitted": self._admitted,
+            "deferred": self._deferred,
+            "calibration": {
+                key: {"factor": round(c.factor, 2), "samples": c.samples}
+                for key, c in self._calibration.items()
+            },
+        }
+
+
+# 全局内存准入控制实例
+memory_admission = MemoryAdmission()
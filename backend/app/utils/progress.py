@@ -0,0 +1,136 @@
+"""
+转换进度解析 - 读取转换进程上报的进度
+
+- Python 脚本：向 CONVERT_PROGRESS_FD 指定的专用管道写入 JSON 行
+  （协议见 scripts/convert_progress.py），标准输出仍为人读的日志；
+- FFmpeg：-progress pipe:1 输出 key=value 行，每组以 progress=continue/end 结束，
+  换算为同样格式的事件。
+
+解析都是增量的：数据到达即解析，不等待进程退出。
+"""
+
+import asyncio
+import json
+import os
+from typing import Callable, Dict, Optional
+
+PROGRESS_FD_ENV = "CONVERT_PROGRESS_FD"
+# 单行进度事件的长度上限，超出视为异常输出并丢弃
+MAX_LINE = 64 * 1024
+
+ProgressCallback = Callable[[dict], None]
+
+
+class ProgressParser:
+    """增量解析进度 JSON 行（数据可能在任意位置被截断）"""
+
+    def __init__(self, callback: ProgressCallback):
+        self._callback = callback
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> None:
+        *lines, self._buffer = (self._buffer + data).split(b"\n")
+        if len(self._buffer) > MAX_LINE:
+            self._buffer = b""
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict) and isinstance(event.get("stage"), str):
+                self._callback(event)
+
+
+def drain_fd(fd: int, parser: ProgressParser) -> bool:
+    """读取非阻塞 fd 中已有的全部数据，返回是否读到 EOF"""
+    while True:
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+        if not data:
+            return True
+        parser.feed(data)
+
+
+class ProgressPipe:
+    """
+    子进程的专用进度管道：写端通过 pass_fds 交给子进程，
+    读端注册到事件循环，子进程退出（写端全部关闭）后读到 EOF
+    """
+
+    def __init__(self, callback: ProgressCallback):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        self._parser = ProgressParser(callback)
+        self._loop = asyncio.get_running_loop()
+        self._eof = self._loop.create_future()
+        self._loop.add_reader(self.read_fd, self._on_readable)
+
+    def env(self) -> Dict[str, str]:
+        return {PROGRESS_FD_ENV: str(self.write_fd)}
+
+    def _on_readable(self) -> None:
+        if drain_fd(self.read_fd, self._parser) and not self._eof.done():
+            self._loop.remove_reader(self.read_fd)
+            self._eof.set_result(None)
+
+    def close_writer(self) -> None:
+        """子进程启动后关闭父进程持有的写端"""
+        if self.write_fd >= 0:
+            os.close(self.write_fd)
+            self.write_fd = -1
+
+    async def wait_eof(self) -> None:
+        await self._eof
+
+    def close(self) -> None:
+        self.close_writer()
+        if not self._eof.done():
+            self._loop.remove_reader(self.read_fd)
+            self._eof.cancel()
+        os.close(self.read_fd)
+
+
+class FfmpegProgressParser:
+    """解析 FFmpeg -progress 输出（按行调用 feed_line）"""
+
+    def __init__(self, callback: ProgressCallback, duration: Optional[float] = None):
+        self._callback = callback
+        self._duration = duration
+        self._fields: Dict[str, str] = {}
+
+    def feed_line(self, line: bytes) -> None:
+        key, sep, value = line.decode("utf-8", errors="replace").strip().partition("=")
+        if not sep:
+            return
+        self._fields[key] = value
+        if key == "progress":
+            fields, self._fields = self._fields, {}
+            self._callback(self._event(fields, value == "end"))
+
+    def _event(self, fields: Dict[str, str], end: bool) -> dict:
+        event: dict = {"stage": "transcode"}
+        size = fields.get("total_size", "")
+        if size.isdigit():
+            event["bytes"] = int(size)
+        # out_time_us 在开始阶段可能为 N/A
+        out_us = fields.get("out_time_us", fields.get("out_time_ms", ""))
+        if not self._duration or not out_us.lstrip("-").isdigit():
+            return event
+
+        done = 1.0 if end else min(max(int(out_us) / 1_000_000 / self._duration, 0.0), 1.0)
+        event.update(
+            current=round(done * self._duration, 1),
+            total=round(self._duration, 1),
+            progress=int(done * 100),
+        )
+        speed = fields.get("speed", "").rstrip("x")
+        try:
+            if float(speed) > 0:
+                event["eta"] = round(self._duration * (1 - done) / float(speed), 1)
+        except ValueError:
+            pass
+        return event
@@ -0,0 +1,218 @@
+"""
+转换结果缓存 - 按输入内容哈希寻址
+
+相同文件（如在微信群里转发的模板）重复转换为同一目标格式时，
+直接复用已有的转换产物，不再重新调用 pdf2docx / LibreOffice。
+
+缓存键由 (内容 SHA-256, 源扩展名, 目标格式, 转换参数) 计算得出。
+产物以硬链接方式放入 RESULT_CACHE_DIR，命中时再硬链接到 PUBLIC_DIR：
+任务过期时 cleanup_expired_files 只删除任务自己的链接，不影响缓存；
+缓存条目按 FILE_EXPIRE_TIME 过期，并按磁盘预算做 LRU 淘汰。
+
+索引保存在本实例内存中（启动时从缓存目录重建），产物位于本地磁盘，
+因此与 MemoryTaskManager / RedisTaskManager 均可配合使用。
+
+链接 / 复制产物、删除和淘汰都是阻塞的文件操作（跨文件系统时复制最大 100MB），
+调用方通过 asyncio.to_thread 在线程中执行；索引由锁保护。
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+from app.utils.file_utils import link_or_copy
+
+# 缓存键版本，转换脚本行为变化时递增以使旧条目失效
+_KEY_VERSION = 1
+
+
+@dataclass
+class _CacheEntry:
+    path: Path
+    size: int
+    created_at: float
+
+
+def conversion_options(category: str, target: str) -> dict:
+    """影响转换产物的参数，参与缓存键计算"""
+    if category == "audio":
+        return {"quality": settings.AUDIO_QUALITY.get(target, "")}
+    return {}
+
+
+class ResultCache:
+    """转换结果缓存（磁盘预算 + LRU 淘汰）"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded_dir: Optional[Path] = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def make_key(content_hash: str, source_ext: str, target: str, options: dict = None) -> str:
+        """计算缓存键"""
+        payload = json.dumps(
+            [
+                _KEY_VERSION,
+                content_hash,
+                source_ext.lstrip(".").lower(),
+                target.lstrip(".").lower(),
+                options or {},
+            ],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.RESULT_CACHE_ENABLED
+
+    def _ensure_loaded(self) -> Path:
+        """首次使用（或缓存目录变更）时从磁盘重建索引"""
+        cache_dir = Path(settings.RESULT_CACHE_DIR)
+        if self._loaded_dir == cache_dir:
+            return cache_dir
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._entries.clear()
+        self._total_bytes = 0
+
+        files = []
+        for file_path in cache_dir.iterdir():
+            if not file_path.is_file():
+                continue
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, file_path, stat.st_size))
+
+        # 按修改时间排序，近似恢复 LRU 顺序
+        for mtime, file_path, size in sorted(files):
+            self._entries[file_path.stem] = _CacheEntry(file_path, size, mtime)
+            self._total_bytes += size
+
+        self._loaded_dir = cache_dir
+        return cache_dir
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size
+        try:
+            entry.path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"✗ 删除缓存文件失败: {entry.path} - {e}")
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """查找缓存产物，命中时刷新 LRU 顺序"""
+        with self._lock:
+            if not self.enabled:
+                return None
+            self._ensure_loaded()
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                expired = time.time() - entry.created_at > settings.FILE_EXPIRE_TIME
+                if expired or not entry.path.exists():
+                    self._remove(key)
+                    entry = None
+
+            if entry is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.path
+
+    def materialize(self, key: str, dest_path: Path) -> Optional[Path]:
+        """
+        将缓存产物链接到 dest_path，扩展名沿用缓存产物
+
+        返回:
+            实际生成的文件路径，未命中时返回 None
+        """
+        with self._lock:
+            cached = self.lookup(key)
+            if cached is None:
+                return None
+            dest_path = dest_path.with_suffix(cached.suffix)
+            try:
+                link_or_copy(cached, dest_path)
+            except OSError as e:
+                print(f"⚠ 缓存产物链接失败: {cached} -> {dest_path} - {e}")
+                self._remove(key)
+                return None
+            return dest_path
+
+    def store(self, key: str, artifact: Path) -> None:
+        """将转换产物加入缓存，并按磁盘预算淘汰最久未使用的条目"""
+        with self._lock:
+            if not self.enabled:
+                return
+            cache_dir = self._ensure_loaded()
+
+            size = artifact.stat().st_size
+            max_bytes = settings.RESULT_CACHE_MAX_MB * 1024 * 1024
+            if size > max_bytes:
+                return
+
+            self._remove(key)
+            cache_path = cache_dir / f"{key}{artifact.suffix}"
+            link_or_copy(artifact, cache_path)
+
+            self._entries[key] = _CacheEntry(cache_path, size, time.time())
+            self._total_bytes += size
+
+            while self._total_bytes > max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._evictions += 1
+
+    def evict_expired(self) -> int:
+        """删除超过 FILE_EXPIRE_TIME 的缓存条目"""
+        with self._lock:
+            if not self.enabled:
+                return 0
+            self._ensure_loaded()
+
+            now = time.time()
+            expired = [
+                key
+                for key, entry in self._entries.items()
+                if now - entry.created_at > settings.FILE_EXPIRE_TIME
+            ]
+            for key in expired:
+                self._remove(key)
+            if expired:
+                print(f"🧹 清理了 {len(expired)} 个过期的转换结果缓存")
+            return len(expired)
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hitRate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "evictions": self._evictions,
+        }
+
+
+# 全局结果缓存实例
+result_cache = ResultCache()
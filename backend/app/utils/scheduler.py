@@ -0,0 +1,299 @@
+"""
+转换任务调度器 - 显式队列 + 分类/引擎并发池 + 优先级
+
+上传接口创建任务后立即入队（enqueue），转换协程在真正执行转换前
+通过 slot() 等待调度：只有任务所属分类池和转换引擎池都有空闲槽位时才放行。
+- 分类池（document / audio / image）互相独立，小图片不会排在长文档转换之后；
+- 引擎池（libreoffice / python / ffmpeg）限制同一外部程序的并发进程数；
+- 同一时刻可放行多个任务时，输入文件小的优先；等待超过 SCHEDULER_AGING_SECONDS
+  的任务不再按大小排序，按入队顺序优先，避免大文件饿死。
+
+每个任务记录 started_at 与 queue_wait_ms（入队到放行的等待时间）。
+放行时由 cpu_budget 为任务分配线程预算，任务执行期间通过 cpu_budget.current() 读取。
+文档、音频任务合计的运行数另受自适应并发上限限制（见 concurrency_limit），
+调度器每 ADAPTIVE_LIMIT_INTERVAL 秒按负载调整一次，并记录每个成功任务的执行时间。
+入队时按输入大小估计任务的峰值内存，等待调度前在线程中补充 PDF 页数，
+运行中任务的估计值之和不超过内存预算时才放行（见 memory_admission），
+任务结束后用实际峰值内存校准估计。
+"""
+
+import asyncio
+import contextlib
+import itertools
+import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+from app.config import settings, PARALLEL_SCRIPTS, PYTHON_CONVERSIONS
+from app.models import Category, ConvertTask
+from app.utils.concurrency_limit import AdaptiveConcurrencyLimiter, concurrency_limiter
+from app.utils.cpu_budget import cpu_budget
+from app.utils.memory_admission import MemoryEstimate, memory_admission
+
+
+def engine_for(task: ConvertTask) -> str:
+    """任务使用的转换引擎"""
+    if task.category == Category.AUDIO:
+        return "ffmpeg"
+    if task.category == Category.IMAGE:
+        return "python"
+    if f"{task.source}->{task.target}" in PYTHON_CONVERSIONS:
+        return "python"
+    return "libreoffice"
+
+
+def is_parallel(task: ConvertTask) -> bool:
+    """任务的转换引擎能否使用多个线程 / 进程"""
+    if task.category == Category.AUDIO:
+        return True
+    conversion = PYTHON_CONVERSIONS.get(f"{task.source}->{task.target}")
+    return (
+        task.category == Category.DOCUMENT
+        and conversion is not None
+        and (conversion["script"] in PARALLEL_SCRIPTS)
+    )
+
+
+@dataclass
+class Job:
+    """调度队列中的一个任务"""
+
+    task_id: str
+    category: str
+    engine: str
+    size: int
+    seq: int
+    memory: MemoryEstimate
+    parallel: bool = False
+    threads: int = 1
+    memory_deferred: bool = False
+    enqueued_at: float = field(default_factory=time.monotonic)
+    waiter: Optional[asyncio.Future] = None
+
+
+class JobScheduler:
+    """转换任务调度器"""
+
+    def __init__(self, limiter: Optional[AdaptiveConcurrencyLimiter] = None):
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self._adjuster: Optional[asyncio.Task] = None
+        self._queued: Dict[str, Job] = {}
+        self._running_category: Counter = Counter()
+        self._running_engine: Counter = Counter()
+        self._seq = itertools.count()
+        self._started = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def enqueue(self, task: ConvertTask) -> Job:
+        """任务入队（重复入队返回已有的排队记录）"""
+        job = self._queued.get(task.id)
+        if job is not None:
+            return job
+
+        try:
+            size = os.path.getsize(task.input_path)
+        except OSError:
+            size = 0
+        engine = engine_for(task)
+        job = Job(
+            task_id=task.id,
+            category=task.category.value,
+            engine=engine,
+            size=size,
+            seq=next(self._seq),
+            memory=memory_admission.estimate(task, engine, size),
+            parallel=is_parallel(task),
+        )
+        self._queued[task.id] = job
+        return job
+
+    def discard(self, task_id: str) -> bool:
+        """移出尚未放行的任务（如合并到进行中的相同转换）"""
+        job = self._queued.pop(task_id, None)
+        if job is None:
+            return False
+        if job.waiter is not None and not job.waiter.done():
+            job.waiter.cancel()
+        return True
+
+    @asynccontextmanager
+    async def slot(self, task: ConvertTask) -> AsyncIterator[Job]:
+        """等待调度放行，退出上下文时释放槽位"""
+        job = self.enqueue(task)
+        try:
+            await memory_admission.add_pages(job.memory, task.input_path)
+            if self._queued.get(task.id) is not job:
+                # 统计页数期间被移出队列（discard）
+                raise asyncio.CancelledError()
+            job.waiter = asyncio.get_running_loop().create_future()
+            self._dispatch()
+            await job.waiter
+        except BaseException:
+            # 放行后、恢复执行前被取消：槽位已占用，需要归还
+            if (
+                self._queued.pop(task.id, None) is None
+                and job.waiter is not None
+                and not job.waiter.cancelled()
+            ):
+                self._release(job)
+            raise
+
+        started = time.monotonic()
+        wait = started - job.enqueued_at
+        self._started += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        task.started_at = datetime.now()
+        task.queue_wait_ms = int(wait * 1000)
+        print(
+            f"🚦 任务 {task.id} 开始执行 [{job.category}/{job.engine}], "
+            f"排队 {wait:.2f}s, {job.threads} 线程, "
+            f"预计内存 {memory_admission.calibrated_mb(job.memory)}MB"
+        )
+
+        try:
+            with cpu_budget.use(job.threads):
+                yield job
+            self.limiter.record_latency(job.engine, time.monotonic() - started, job.size)
+        finally:
+            # 失败的任务（如超出内存限制被终止）同样用于校准
+            if task.max_rss_kb:
+                memory_admission.observe(job.memory, task.max_rss_kb)
+            self._release(job)
+
+    async def start(self) -> None:
+        """启动自适应并发上限的定时调整（应用启动时调用）"""
+        if self.limiter.enabled and self._adjuster is None:
+            self.limiter.sample()  # 首次 CPU 采样没有参考区间，结果无意义
+            self._adjuster = asyncio.create_task(self._adjust_periodically())
+            print(f"🎚️ 自适应并发上限已启用: 初始 {self.limiter.limit}")
+
+    async def close(self) -> None:
+        """停止定时调整（应用关闭时调用）"""
+        if self._adjuster is not None:
+            self._adjuster.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._adjuster
+            self._adjuster = None
+
+    async def _adjust_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.ADAPTIVE_LIMIT_INTERVAL)
+            try:
+                queued = sum(
+                    1
+                    for job in self._queued.values()
+                    if job.waiter is not None and self._capped(job)
+                )
+                if self.limiter.adjust(self._running_capped(), queued):
+                    self._dispatch()
+            except Exception as e:
+                print(f"⚠ 调整并发上限失败: {e}")
+
+    @staticmethod
+    def _aged(job: Job) -> bool:
+        return time.monotonic() - job.enqueued_at >= settings.SCHEDULER_AGING_SECONDS
+
+    def _sort_key(self, job: Job):
+        aged = self._aged(job)
+        # 等待过久的任务按入队顺序排在最前，其余小文件优先
+        return (not aged, 0 if aged else job.size, job.seq)
+
+    def _capped(self, job: Job) -> bool:
+        """任务是否受自适应并发上限限制"""
+        return self.limiter.enabled and job.category in settings.ADAPTIVE_LIMIT_CATEGORIES
+
+    def _running_capped(self) -> int:
+        return sum(self._running_category[c] for c in settings.ADAPTIVE_LIMIT_CATEGORIES)
+
+    def _can_start(self, job: Job) -> bool:
+        category_limit = settings.SCHEDULER_CATEGORY_LIMITS.get(job.category, 1)
+        engine_limit = settings.SCHEDULER_ENGINE_LIMITS.get(job.engine, 1)
+        return (
+            self._running_category[job.category] < category_limit
+            and self._running_engine[job.engine] < engine_limit
+            and (not self._capped(job) or self._running_capped() < self.limiter.limit)
+        )
+
+    def _dispatch(self) -> None:
+        """按优先级放行所有能获得槽位的等待任务（被占满的池不阻塞其他池）"""
+        waiting = [j for j in self._queued.values() if j.waiter and not j.waiter.done()]
+        started = []
+        # 等待过久、因内存不足不能放行的任务所在的分类及其需要的内存
+        held_categories = set()
+        held_mb = 0
+        for job in sorted(waiting, key=self._sort_key):
+            if not self._can_start(job):
+                continue
+            if job.category in held_categories or (
+                held_mb
+                and held_mb + memory_admission.calibrated_mb(job.memory)
+                > memory_admission.budget_mb
+            ):
+                # 同一分类的后续任务、以及单独就会让等待过久的任务无法放行的大任务不放行
+                continue
+            if not memory_admission.fits(job.memory):
+                if not job.memory_deferred:
+                    job.memory_deferred = True
+                    memory_admission.defer()
+                if self._aged(job):
+                    # 等待过久的大任务：为其保留运行中任务释放的内存，其他分类的小任务照常放行
+                    held_categories.add(job.category)
+                    held_mb += memory_admission.calibrated_mb(job.memory)
+                continue
+            del self._queued[job.task_id]
+            self._running_category[job.category] += 1
+            self._running_engine[job.engine] += 1
+            memory_admission.admit(job.task_id, job.memory)
+            started.append(job)
+
+        if not started:
+            return
+        # 同一批放行的任务一起分配 CPU 预算；已入队但尚未等待调度的任务
+        # （上传后马上就会进入 slot()）若有空闲槽位，也为其预留份额
+        pending = sum(
+            1 for job in self._queued.values() if job.waiter is None and self._can_start(job)
+        )
+        grants = cpu_budget.allocate(
+            {job.task_id: job.parallel for job in started}, pending=pending
+        )
+        for job in started:
+            job.threads = grants[job.task_id]
+            job.waiter.set_result(None)
+
+    def _release(self, job: Job) -> None:
+        cpu_budget.release(job.task_id)
+        memory_admission.release(job.task_id)
+        self._running_category[job.category] -= 1
+        self._running_engine[job.engine] -= 1
+        self._dispatch()
+
+    def get_stats(self) -> dict:
+        """获取调度统计"""
+        queued = Counter(job.category for job in self._queued.values())
+        return {
+            "queued": {c.value: queued[c.value] for c in Category},
+            "running": {c.value: self._running_category[c.value] for c in Category},
+            "runningByEngine": {
+                engine: self._running_engine[engine] for engine in settings.SCHEDULER_ENGINE_LIMITS
+            },
+            "limits": {
+                "category": dict(settings.SCHEDULER_CATEGORY_LIMITS),
+                "engine": dict(settings.SCHEDULER_ENGINE_LIMITS),
+                "total": self.limiter.limit if self.limiter.enabled else None,
+            },
+            "started": self._started,
+            "avgQueueWaitMs": (
+                int(self._total_wait / self._started * 1000) if self._started else 0
+            ),
+            "maxQueueWaitMs": int(self._max_wait * 1000),
+        }
+
+
+# 全局调度器实例
+job_scheduler = JobScheduler(concurrency_limiter)
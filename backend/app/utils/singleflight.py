@@ -0,0 +1,79 @@
+"""
+Single-flight 合并 - 相同 key 的并发调用只执行一次
+
+首个调用者（leader）发起实际工作，执行期间到达的相同 key 调用者（follower）
+不再重复执行，而是等待并共享同一个结果或异常。
+
+实际工作在独立的协程中执行并按等待者计数：某个调用者被取消（如用户取消任务）
+只影响它自己，其余调用者继续等待；最后一个调用者被取消时才取消实际工作。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Call:
+    """进行中的一次实际调用"""
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合并相同 key 的进行中调用"""
+
+    def __init__(self):
+        self._inflight: Dict[str, _Call] = {}
+        self._leaders = 0
+        self._followers = 0
+
+    def is_inflight(self, key: str) -> bool:
+        """是否已有相同 key 的调用在执行"""
+        return key in self._inflight
+
+    def _finished(self, key: str, call: _Call) -> None:
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        # 没有等待者时避免 "exception was never retrieved" 警告
+        if not call.future.cancelled():
+            call.future.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行 fn，或等待相同 key 的进行中调用
+
+        返回:
+            (结果, 是否为 leader)
+        """
+        call = self._inflight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _Call(asyncio.ensure_future(fn()))
+            # 先于等待者的回调执行：调用结束后新到的请求不会再合并到这里
+            call.future.add_done_callback(lambda _: self._finished(key, call))
+            self._inflight[key] = call
+            self._leaders += 1
+        else:
+            self._followers += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.future), is_leader
+        except asyncio.CancelledError:
+            if not call.future.done():
+                # 调用者自身被取消：其余调用者仍在等待时实际工作继续
+                call.waiters -= 1
+                if call.waiters == 0:
+                    call.future.cancel()
+            elif call.future.cancelled() and not asyncio.current_task().cancelling():
+                raise RuntimeError("合并执行的任务已被取消")
+            raise
+
+    def get_stats(self) -> dict:
+        """获取合并统计"""
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self._leaders,
+            "coalesced": self._followers,
+        }
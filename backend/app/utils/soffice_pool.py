@@ -0,0 +1,470 @@
+"""
+LibreOffice 实例池 - 每个实例使用独立的用户配置
+
+原来所有转换都以 HOME=/tmp 启动 soffice，共享同一个用户配置目录：
+并发任务互相争用配置锁，实际上只能串行执行。实例池改为：
+- 启动时用 --terminate_after_init 生成一份预初始化的模板配置，
+  每个实例复制一份作为自己的 -env:UserInstallation，互不干扰；
+- 可导入 uno（安装了 python3-uno）时，每个实例是常驻的 headless 监听进程，
+  任务通过 UNO 套接字协议加载文档并导出，不再为每个任务支付启动开销；
+- 无法导入 uno 时，每个实例对应一个独立配置目录，任务仍以
+  soffice --convert-to 执行，但不同实例可以真正并发；
+- 常驻实例在分配前做健康检查（进程存活、UNO 可连接），转换超时视为卡死，
+  立即杀掉整个进程组并在后台重启，任务被取消时同样处理，重启完成前实例不参与分配；
+  执行 SOFFICE_MAX_JOBS 个任务后主动重启以回收内存。
+
+并发由调度器的 libreoffice 引擎池限制（上限即 SOFFICE_POOL_SIZE）。
+"""
+
+import asyncio
+import contextlib
+import itertools
+import os
+import shutil
+import subprocess
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Awaitable, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.utils.supervisor import kill_process_group, process_supervisor
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+
+    UNO_AVAILABLE = True
+except ImportError:
+    UNO_AVAILABLE = False
+
+COMMON_SOFFICE_PATHS = [
+    "/usr/bin/soffice",
+    "/usr/local/bin/soffice",
+    "/snap/bin/soffice",
+    "/opt/libreoffice/program/soffice",
+    "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+]
+
+# 源格式所属的 LibreOffice 组件
+DOCUMENT_FAMILIES: Dict[str, str] = {
+    "doc": "writer",
+    "docx": "writer",
+    "odt": "writer",
+    "rtf": "writer",
+    "txt": "writer",
+    "xls": "calc",
+    "xlsx": "calc",
+    "ods": "calc",
+    "csv": "calc",
+    "ppt": "impress",
+    "pptx": "impress",
+    "odp": "impress",
+}
+
+# (组件, 目标格式) -> 导出过滤器，未列出的组合回退为 --convert-to
+EXPORT_FILTERS: Dict[Tuple[str, str], str] = {
+    ("writer", "pdf"): "writer_pdf_Export",
+    ("writer", "doc"): "MS Word 97",
+    ("writer", "docx"): "MS Word 2007 XML",
+    ("writer", "odt"): "writer8",
+    ("writer", "rtf"): "Rich Text Format",
+    ("writer", "txt"): "Text",
+    ("writer", "html"): "HTML (StarWriter)",
+    ("calc", "pdf"): "calc_pdf_Export",
+    ("calc", "xls"): "MS Excel 97",
+    ("calc", "xlsx"): "Calc MS Excel 2007 XML",
+    ("calc", "ods"): "calc8",
+    ("calc", "csv"): "Text - txt - csv (StarCalc)",
+    ("impress", "pdf"): "impress_pdf_Export",
+    ("impress", "ppt"): "MS PowerPoint 97",
+    ("impress", "pptx"): "Impress MS PowerPoint 2007 XML",
+    ("impress", "odp"): "impress8",
+}
+
+
+def find_soffice() -> str:
+    """查找 LibreOffice 可执行文件"""
+    soffice_path = settings.SOFFICE_PATH
+    for path in COMMON_SOFFICE_PATHS:
+        if Path(path).exists():
+            soffice_path = path
+            break
+    return shutil.which(soffice_path) or soffice_path
+
+
+def export_filter(source_ext: str, target_format: str) -> Optional[str]:
+    """UNO 导出使用的过滤器名称"""
+    family = DOCUMENT_FAMILIES.get(source_ext.lstrip(".").lower())
+    return EXPORT_FILTERS.get((family, target_format))
+
+
+def _profile_arg(profile_dir: Path) -> str:
+    return f"-env:UserInstallation={profile_dir.resolve().as_uri()}"
+
+
+def _uno_props(**values) -> tuple:
+    props = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+def _uno_context(port: int):
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local
+    )
+    return resolver.resolve(
+        f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+    )
+
+
+def _uno_ping(port: int) -> bool:
+    try:
+        _uno_context(port)
+        return True
+    except Exception:
+        return False
+
+
+def _uno_convert(port: int, input_path: Path, output_path: Path, filter_name: str) -> None:
+    """通过 UNO 在常驻实例中打开文档并导出（阻塞调用）"""
+    ctx = _uno_context(port)
+    desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+    document = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(str(input_path.resolve())),
+        "_blank",
+        0,
+        _uno_props(Hidden=True, ReadOnly=True),
+    )
+    if document is None:
+        raise Exception("LibreOffice 无法打开文件")
+    try:
+        document.storeToURL(
+            uno.systemPathToFileUrl(str(output_path.resolve())),
+            _uno_props(FilterName=filter_name, Overwrite=True),
+        )
+    finally:
+        document.close(True)
+
+
+@dataclass
+class _Instance:
+    index: int
+    profile_dir: Path
+    port: int
+    process: Optional[subprocess.Popen] = None
+    jobs: int = 0  # 当前进程已执行的任务数
+    total_jobs: int = 0
+    failures: int = 0
+    restarts: int = 0
+    last_checked: float = 0.0
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+
+class SofficePool:
+    """LibreOffice 实例池"""
+
+    def __init__(self):
+        self._instances: List[_Instance] = []
+        self._idle: List[_Instance] = []
+        # 实例序号（决定配置目录和端口），在线程中并发创建实例时也不重复
+        self._indexes = itertools.count()
+        # 正在后台重启的实例，重启完成后才回到空闲列表
+        self._relaunching: Set[asyncio.Task] = set()
+        self._hangs = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SOFFICE_POOL_ENABLED
+
+    @property
+    def mode(self) -> str:
+        return "uno" if UNO_AVAILABLE and settings.SOFFICE_POOL_UNO else "cli"
+
+    @property
+    def _root(self) -> Path:
+        return Path(settings.SOFFICE_PROFILE_DIR)
+
+    def _prepare_template(self) -> Path:
+        """生成预初始化的模板配置（阻塞，仅首次执行）"""
+        template = self._root / "template"
+        if (template / "user").exists():
+            return template
+
+        template.mkdir(parents=True, exist_ok=True)
+        try:
+            subprocess.run(
+                [
+                    find_soffice(),
+                    _profile_arg(template),
+                    "--headless",
+                    "--norestore",
+                    "--nofirststartwizard",
+                    "--terminate_after_init",
+                ],
+                capture_output=True,
+                timeout=120,
+                env={**os.environ, "HOME": "/tmp"},
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            # 模板生成失败时实例配置为空目录，由 soffice 首次运行时自行初始化
+            print(f"⚠ LibreOffice 模板配置生成失败: {e}")
+        return template
+
+    def _copy_profile(self, profile_dir: Path) -> None:
+        template = self._prepare_template()
+        if not profile_dir.exists():
+            shutil.copytree(template, profile_dir)
+
+    def _new_instance(self) -> _Instance:
+        """创建实例（阻塞）：复制模板配置，UNO 模式下启动监听进程"""
+        index = next(self._indexes)
+        instance = _Instance(
+            index=index,
+            profile_dir=self._root / f"instance_{index}",
+            port=settings.SOFFICE_POOL_BASE_PORT + index,
+        )
+        self._copy_profile(instance.profile_dir)
+        self._instances.append(instance)
+        if self.mode == "uno":
+            self._launch(instance)
+        return instance
+
+    def _launch(self, instance: _Instance) -> None:
+        """启动常驻监听进程并等待 UNO 可连接（阻塞）"""
+        # 常驻进程的 CPU 时间随任务累积，只限制内存和输出文件大小（卡死由转换超时处理）
+        limits = replace(process_supervisor.limits("libreoffice"), cpu_seconds=0)
+        instance.process = subprocess.Popen(
+            limits.wrap(
+                [
+                    find_soffice(),
+                    _profile_arg(instance.profile_dir),
+                    "--headless",
+                    "--invisible",
+                    "--norestore",
+                    "--nologo",
+                    "--nodefault",
+                    "--nofirststartwizard",
+                    f"--accept=socket,host=127.0.0.1,port={instance.port};"
+                    "urp;StarOffice.ComponentContext",
+                ]
+            ),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env={**os.environ, "HOME": "/tmp"},
+            start_new_session=True,
+        )
+        instance.jobs = 0
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and instance.alive():
+            if _uno_ping(instance.port):
+                instance.last_checked = time.monotonic()
+                print(f"📄 LibreOffice 实例 {instance.index} 已就绪 (端口 {instance.port})")
+                return
+            time.sleep(0.2)
+        print(f"⚠ LibreOffice 实例 {instance.index} 启动超时")
+
+    def _stop(self, instance: _Instance) -> None:
+        if instance.process is not None:
+            kill_process_group(instance.process.pid)
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                instance.process.wait(timeout=5)
+            instance.process = None
+
+    def _restart(self, instance: _Instance) -> None:
+        self._stop(instance)
+        instance.restarts += 1
+        self._launch(instance)
+
+    def _idle_when_done(self, work: Awaitable, instance: Optional[_Instance] = None) -> None:
+        """后台等待实例的启动 / 重启完成，完成后实例才回到空闲列表"""
+
+        async def wait():
+            ready = instance
+            try:
+                ready = await work or instance
+            except Exception as e:
+                # 下次分配时的健康检查会再次重启
+                print(f"⚠ LibreOffice 实例启动失败: {e}")
+            if ready is not None:
+                self._idle.append(ready)
+
+        task = asyncio.create_task(wait())
+        self._relaunching.add(task)
+        task.add_done_callback(self._relaunching.discard)
+
+    def _relaunch_in_background(self, instance: _Instance) -> None:
+        """立即杀掉实例的进程组，在后台重启；重启完成后实例才回到空闲列表"""
+        if instance.process is not None:
+            kill_process_group(instance.process.pid)
+        self._idle_when_done(asyncio.to_thread(self._restart, instance), instance)
+
+    def _check_health(self, instance: _Instance) -> None:
+        """分配前检查常驻实例（阻塞），异常或任务数达到上限时重启"""
+        if not instance.alive():
+            print(f"⚠ LibreOffice 实例 {instance.index} 已退出，重新启动")
+            self._restart(instance)
+        elif instance.jobs >= settings.SOFFICE_MAX_JOBS:
+            self._restart(instance)
+        elif time.monotonic() - instance.last_checked > settings.SOFFICE_HEALTH_INTERVAL:
+            if not _uno_ping(instance.port):
+                print(f"⚠ LibreOffice 实例 {instance.index} 无响应，重新启动")
+                self._restart(instance)
+            instance.last_checked = time.monotonic()
+
+    async def start(self) -> None:
+        """预先创建 SOFFICE_POOL_SIZE 个实例（应用启动时调用）"""
+        if not self.enabled:
+            return
+        while len(self._instances) < settings.SOFFICE_POOL_SIZE:
+            self._idle.append(await asyncio.to_thread(self._new_instance))
+        print(f"📄 LibreOffice 实例池已就绪: {len(self._instances)} 个实例 ({self.mode})")
+
+    async def close(self) -> None:
+        """结束所有常驻实例（应用关闭时调用）"""
+        if self._relaunching:
+            await asyncio.gather(*self._relaunching, return_exceptions=True)
+        for instance in self._instances:
+            await asyncio.to_thread(self._stop, instance)
+
+    def _prepare(self, instance: Optional[_Instance]) -> _Instance:
+        """检查取出的空闲实例，没有空闲实例时创建新实例（阻塞）"""
+        if instance is None:
+            return self._new_instance()
+        if self.mode == "uno":
+            self._check_health(instance)
+        return instance
+
+    async def _acquire(self) -> _Instance:
+        while not self._idle and self._relaunching:
+            # 实例正在后台重启：等待其完成，而不是额外创建实例
+            await asyncio.wait(set(self._relaunching), return_when=asyncio.FIRST_COMPLETED)
+        instance = self._idle.pop(0) if self._idle else None
+        preparing = asyncio.ensure_future(asyncio.to_thread(self._prepare, instance))
+        try:
+            return await asyncio.shield(preparing)
+        except asyncio.CancelledError:
+            # 线程中的健康检查 / 启动（最长 30 秒）无法中断，完成后实例回到空闲列表
+            self._idle_when_done(preparing, instance)
+            raise
+        except Exception:
+            if instance is not None:
+                self._idle.append(instance)
+            raise
+
+    async def convert(self, input_path: str, output_dir: str, target_format: str) -> str:
+        """
+        在空闲实例上转换文档
+
+        返回:
+            输出文件路径（输出目录下与输入同名、扩展名为目标格式的文件）
+        """
+        source = Path(input_path)
+        output_path = Path(output_dir) / f"{source.stem}.{target_format}"
+        filter_name = export_filter(source.suffix, target_format)
+
+        instance = await self._acquire()
+        restart = False
+        try:
+            if self.mode == "uno" and filter_name and instance.alive():
+                print(f"📄 LibreOffice 实例 {instance.index} (UNO): {source.name} -> {filter_name}")
+                await asyncio.wait_for(
+                    asyncio.to_thread(
+                        _uno_convert, instance.port, source, output_path, filter_name
+                    ),
+                    timeout=settings.CONVERSION_TIMEOUT,
+                )
+            else:
+                await self._convert_cli(instance, input_path, output_dir, target_format)
+            instance.jobs += 1
+            instance.total_jobs += 1
+        except asyncio.TimeoutError:
+            restart = True
+            self._hangs += 1
+            instance.failures += 1
+            print(f"⚠ LibreOffice 实例 {instance.index} 转换超时，重启实例")
+            raise
+        except asyncio.CancelledError:
+            # 任务被取消：进行中的 UNO 调用无法中断，重启实例以停止转换
+            restart = True
+            raise
+        except Exception:
+            instance.failures += 1
+            raise
+        finally:
+            if restart and self.mode == "uno":
+                # 不等待新进程启动（最长 30 秒），取消请求和调度槽位立即释放
+                self._relaunch_in_background(instance)
+            else:
+                self._idle.append(instance)
+
+        if not output_path.exists():
+            raise Exception(f"LibreOffice 转换失败，未生成 .{target_format} 文件")
+        print(f"✓ LibreOffice 转换完成: {output_path}")
+        return str(output_path)
+
+    async def _convert_cli(
+        self, instance: _Instance, input_path: str, output_dir: str, target_format: str
+    ) -> None:
+        """以 --convert-to 执行单次转换，使用实例独立的配置目录"""
+        profile_dir = instance.profile_dir
+        if self.mode == "uno":
+            # 常驻进程占用了实例配置，单次转换使用旁路配置
+            profile_dir = profile_dir.with_name(f"{profile_dir.name}_cli")
+            await asyncio.to_thread(self._copy_profile, profile_dir)
+
+        args = [
+            find_soffice(),
+            _profile_arg(profile_dir),
+            "--headless",
+            "--norestore",
+            "--nofirststartwizard",
+            "--nologo",
+            "--nodefault",
+            "--view",
+            "--convert-to",
+            target_format,
+            "--outdir",
+            output_dir,
+            input_path,
+        ]
+        print(f"📄 Running LibreOffice (实例 {instance.index}): {' '.join(args)}")
+
+        result = await process_supervisor.run(
+            args, "libreoffice", settings.CONVERSION_TIMEOUT, env={**os.environ, "HOME": "/tmp"}
+        )
+        if result.stdout:
+            print(f"LibreOffice output: {result.stdout.decode(errors='replace')}")
+        if result.stderr:
+            print(f"LibreOffice warnings: {result.stderr.decode(errors='replace')}")
+
+    def get_stats(self) -> dict:
+        """获取实例池统计"""
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "idle": len(self._idle),
+            "restarting": len(self._relaunching),
+            "hangs": self._hangs,
+            "instances": [
+                {
+                    "index": instance.index,
+                    "alive": instance.alive() if self.mode == "uno" else None,
+                    "jobs": instance.total_jobs,
+                    "failures": instance.failures,
+                    "restarts": instance.restarts,
+                }
+                for instance in self._instances
+            ],
+        }
+
+
+# 全局 LibreOffice 实例池
+soffice_pool = SofficePool()
@@ -0,0 +1,454 @@
+"""
+转换进程监管 - 所有转换引擎启动外部程序的统一入口
+
+原来 FFmpeg、LibreOffice、Python 脚本各自以 create_subprocess_shell + communicate()
+启动进程，没有任何资源限制，一个异常的 PDF 就可能耗尽整个容器的内存。监管器：
+- 直接 exec 程序（参数列表，不经过 shell）；
+- 每个任务在独立的进程组中运行，超时、被取消或结束后杀掉整个进程组；
+- 配置 CONVERSION_CGROUP_DIR 且可用时，每个任务一个 cgroup v2 子组（memory.max），
+  否则用 RLIMIT_AS 限制内存；CPU 时间（RLIMIT_CPU）和单个输出文件大小
+  （RLIMIT_FSIZE）总是由 rlimit 限制。限制由 exec 包装程序（limited_exec.py）在
+  子进程中设置，不使用多线程进程中不安全的 preexec_fn；
+- 进程在线程中启动，fork + exec 不阻塞事件循环；
+- 增量读取 stdout / stderr，只保留最近 CONVERSION_OUTPUT_TAIL_KB 的内容；
+- 用 wait4 回收进程，记录每个任务的 CPU 时间和峰值内存（见 track_usage）。
+
+Python worker 池在常驻进程内执行脚本，不经过 run()，但使用同样的限制和用量记录。
+"""
+
+import asyncio
+import contextlib
+import errno
+import itertools
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from app.config import settings
+from app.utils import limited_exec
+
+MB = 1024 * 1024
+
+
+class ConversionLimitError(Exception):
+    """转换进程超出资源限制"""
+
+
+@dataclass
+class ProcessResult:
+    """进程执行结果"""
+
+    returncode: int
+    stdout: bytes  # 输出尾部
+    stderr: bytes
+    cpu_time: float  # 秒（用户态 + 内核态，含已回收的子进程）
+    max_rss_kb: int
+
+
+@dataclass
+class ResourceUsage:
+    """一个任务的资源用量（可能包含多个进程）"""
+
+    cpu_time: float = 0.0
+    max_rss_kb: int = 0
+    processes: int = 0
+
+    def add(self, cpu_time: float, max_rss_kb: int) -> None:
+        self.cpu_time += cpu_time
+        self.max_rss_kb = max(self.max_rss_kb, max_rss_kb)
+        self.processes += 1
+
+
+# 当前转换任务的用量汇总（由 track_usage 设置，随协程上下文传递到各转换函数）
+_current_usage: ContextVar[Optional[ResourceUsage]] = ContextVar("current_usage", default=None)
+
+
+@contextlib.contextmanager
+def track_usage() -> Iterator[ResourceUsage]:
+    """汇总上下文内所有转换进程的资源用量"""
+    usage = ResourceUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+class TailBuffer:
+    """只保留最近 limit 字节的输出缓冲"""
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._data = bytearray()
+        self.total = 0
+
+    def append(self, data: bytes) -> None:
+        self.total += len(data)
+        self._data += data
+        if len(self._data) > self._limit:
+            del self._data[: len(self._data) - self._limit]
+
+    def getvalue(self) -> bytes:
+        return bytes(self._data)
+
+
+@dataclass
+class ProcessLimits:
+    """单个转换进程的资源限制（0 为不限制）"""
+
+    memory_mb: int
+    cpu_seconds: int
+    file_size_mb: int
+
+    def apply(self) -> None:
+        """在当前进程设置 rlimit（worker 启动时调用）"""
+        limited_exec.apply_limits(self.memory_mb, self.cpu_seconds, self.file_size_mb)
+
+    def wrap(self, args: Sequence[str], cgroup: Optional[Path] = None) -> List[str]:
+        """
+        经 exec 包装程序启动 args 的命令行：包装程序设置 rlimit 后 exec 目标程序
+
+        参数:
+            cgroup: 任务的 cgroup 子组，指定时包装程序先加入该组，内存由 cgroup 限制
+        """
+        wrapper = [sys.executable, "-S", limited_exec.__file__]
+        if self.memory_mb and cgroup is None:
+            wrapper += ["--memory-mb", str(self.memory_mb)]
+        if self.cpu_seconds:
+            wrapper += ["--cpu-seconds", str(self.cpu_seconds)]
+        if self.file_size_mb:
+            wrapper += ["--file-size-mb", str(self.file_size_mb)]
+        if cgroup is not None:
+            wrapper += ["--cgroup", os.fspath(cgroup)]
+        return [*wrapper, "--", *args]
+
+
+def limit_error(returncode: Optional[int], limits: ProcessLimits) -> Optional[str]:
+    """根据进程退出信号判断是否超出 rlimit，返回错误信息"""
+    if returncode == -signal.SIGXCPU:
+        return f"转换超出 CPU 时间限制（{limits.cpu_seconds} 秒）"
+    if returncode == -signal.SIGXFSZ:
+        return f"转换输出超出文件大小限制（{limits.file_size_mb}MB）"
+    return None
+
+
+def kill_process_group(pid: int) -> None:
+    """杀掉以 start_new_session=True 启动的进程所在的整个进程组"""
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(pid, signal.SIGKILL)
+
+
+async def spawn(args: Sequence[str], **kwargs) -> subprocess.Popen:
+    """
+    在线程中启动进程（subprocess.Popen 参数），fork + exec 不阻塞事件循环
+
+    等待期间被取消时，进程可能已经启动：启动完成后杀掉其进程组并回收。
+    """
+    started = asyncio.ensure_future(asyncio.to_thread(subprocess.Popen, list(args), **kwargs))
+    try:
+        return await asyncio.shield(started)
+    except asyncio.CancelledError:
+        started.add_done_callback(_kill_spawned)
+        raise
+
+
+def _kill_spawned(started: asyncio.Future) -> None:
+    if started.cancelled() or started.exception() is not None:
+        return
+    proc = started.result()
+    kill_process_group(proc.pid)
+    for pipe in (proc.stdout, proc.stderr):
+        if pipe is not None:
+            pipe.close()
+    proc.wait()
+
+
+class _JobCgroup:
+    """单个任务的 cgroup v2 子组"""
+
+    def __init__(self, path: Path, memory_mb: int):
+        self.path = path
+        path.mkdir()
+        if memory_mb:
+            (path / "memory.max").write_text(str(memory_mb * MB))
+            with contextlib.suppress(OSError):
+                (path / "memory.swap.max").write_text("0")
+
+    def oom_killed(self) -> bool:
+        with contextlib.suppress(OSError, ValueError):
+            for line in (self.path / "memory.events").read_text().splitlines():
+                key, _, value = line.partition(" ")
+                if key == "oom_kill":
+                    return int(value) > 0
+        return False
+
+    def usage(self) -> Optional[tuple]:
+        """(CPU 秒, 峰值内存 KB)，内核不支持 memory.peak 时返回 None"""
+        try:
+            stat = dict(
+                line.split(" ", 1) for line in (self.path / "cpu.stat").read_text().splitlines()
+            )
+            peak = int((self.path / "memory.peak").read_text())
+            return int(stat["usage_usec"]) / 1_000_000, peak // 1024
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def remove(self) -> None:
+        # 杀掉组内残留的进程（包括脱离了进程组的后代进程）后删除子组
+        with contextlib.suppress(OSError):
+            (self.path / "cgroup.kill").write_text("1")
+        for _ in range(50):
+            try:
+                self.path.rmdir()
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.01)
+
+
+class ProcessSupervisor:
+    """转换进程监管器"""
+
+    def __init__(self):
+        self._cgroup_root: Optional[Path] = None
+        self._cgroup_checked = False
+        self._job_ids = itertools.count()
+        self._running = 0
+        self._jobs = 0
+        self._killed = 0
+        self._limit_exceeded = 0
+        self._cpu_time = 0.0
+        self._max_rss_kb = 0
+
+    def limits(self, engine: str) -> ProcessLimits:
+        """引擎对应的资源限制"""
+        return ProcessLimits(
+            memory_mb=settings.ENGINE_MEMORY_LIMITS_MB.get(engine, 0),
+            cpu_seconds=settings.CONVERSION_CPU_LIMIT,
+            file_size_mb=settings.CONVERSION_MAX_OUTPUT_MB,
+        )
+
+    @property
+    def cgroup_root(self) -> Optional[Path]:
+        """可用的 cgroup v2 目录（首次使用时检测，启用 memory / cpu 控制器）"""
+        if self._cgroup_checked:
+            return self._cgroup_root
+        self._cgroup_checked = True
+        if not settings.CONVERSION_CGROUP_DIR:
+            return None
+        root = Path(settings.CONVERSION_CGROUP_DIR)
+        try:
+            if "memory" not in (root / "cgroup.controllers").read_text().split():
+                raise OSError("memory 控制器不可用")
+            (root / "cgroup.subtree_control").write_text("+memory +cpu")
+        except OSError as e:
+            print(f"⚠ cgroup {root} 不可用，使用 rlimit 限制转换进程: {e}")
+            return None
+        self._cgroup_root = root
+        print(f"🧱 转换进程使用 cgroup v2: {root}")
+        return root
+
+    def record_usage(self, cpu_time: float, max_rss_kb: int) -> None:
+        """记录一个转换进程的资源用量（同时计入当前任务）"""
+        self._cpu_time += cpu_time
+        self._max_rss_kb = max(self._max_rss_kb, max_rss_kb)
+        usage = _current_usage.get()
+        if usage is not None:
+            usage.add(cpu_time, max_rss_kb)
+
+    def record_limit_exceeded(self) -> None:
+        self._limit_exceeded += 1
+
+    def _new_cgroup(self, limits: ProcessLimits) -> Optional[_JobCgroup]:
+        root = self.cgroup_root
+        if root is None:
+            return None
+        try:
+            return _JobCgroup(root / f"job-{os.getpid()}-{next(self._job_ids)}", limits.memory_mb)
+        except OSError as e:
+            print(f"⚠ 创建任务 cgroup 失败，使用 rlimit: {e}")
+            return None
+
+    async def run(
+        self,
+        args: Sequence[str],
+        engine: str,
+        timeout: float,
+        env: Optional[Dict[str, str]] = None,
+        pass_fds: Sequence[int] = (),
+        on_stdout: Optional[Callable[[bytes], None]] = None,
+    ) -> ProcessResult:
+        """
+        在资源限制下运行外部程序，等待其结束
+
+        参数:
+            engine: 转换引擎（libreoffice / python / ffmpeg），决定内存上限
+            on_stdout: 每收到一段标准输出时调用（如解析 FFmpeg 进度）
+
+        异常:
+            asyncio.TimeoutError: 超时（进程组已被杀掉）
+            ConversionLimitError: 超出 CPU 时间、输出文件大小或内存（cgroup）限制
+        """
+        # 包装程序 exec 失败只能以退出码报告，先按原来的方式对不存在的程序抛出异常
+        path = (env if env is not None else os.environ).get("PATH")
+        if shutil.which(args[0], path=path) is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), args[0])
+
+        limits = self.limits(engine)
+        cgroup = await asyncio.to_thread(self._new_cgroup, limits)
+
+        loop = asyncio.get_running_loop()
+        tail = settings.CONVERSION_OUTPUT_TAIL_KB * 1024
+        stdout, stderr = TailBuffer(tail), TailBuffer(tail)
+        try:
+            proc = await spawn(
+                limits.wrap(args, cgroup.path if cgroup is not None else None),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                pass_fds=tuple(pass_fds),
+                start_new_session=True,
+            )
+        except BaseException:
+            if cgroup is not None:
+                await asyncio.to_thread(cgroup.remove)
+            raise
+
+        self._jobs += 1
+        self._running += 1
+        readers = [
+            _PipeReader(loop, proc.stdout, stdout, on_stdout),
+            _PipeReader(loop, proc.stderr, stderr),
+        ]
+        status = None
+        try:
+            try:
+                status, rusage = await asyncio.wait_for(_wait4(loop, proc.pid), timeout)
+            finally:
+                # 正常结束时清理残留的后代进程，超时或被取消时终止整个任务
+                kill_process_group(proc.pid)
+                if status is None:
+                    self._killed += 1
+                    status, rusage = await _wait4(loop, proc.pid)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # 进程组已结束，管道很快读到 EOF；脱离进程组的后代进程可能仍持有写端
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(asyncio.gather(*(r.eof for r in readers)), 1)
+        finally:
+            self._running -= 1
+            for reader in readers:
+                reader.close()
+            if cgroup is not None:
+                usage = cgroup.usage()
+                oom_killed = cgroup.oom_killed()
+                await asyncio.to_thread(cgroup.remove)
+
+        cpu_time = rusage.ru_utime + rusage.ru_stime
+        max_rss_kb = rusage.ru_maxrss
+        if cgroup is not None and usage is not None:
+            cpu_time, max_rss_kb = usage
+        self.record_usage(cpu_time, max_rss_kb)
+
+        error = limit_error(proc.returncode, limits)
+        if error is None and cgroup is not None and oom_killed:
+            error = f"转换超出内存限制（{limits.memory_mb}MB）"
+        if error:
+            self.record_limit_exceeded()
+            raise ConversionLimitError(error)
+
+        return ProcessResult(
+            returncode=proc.returncode,
+            stdout=stdout.getvalue(),
+            stderr=stderr.getvalue(),
+            cpu_time=cpu_time,
+            max_rss_kb=max_rss_kb,
+        )
+
+    def get_stats(self) -> dict:
+        """获取监管统计"""
+        return {
+            "cgroup": str(self._cgroup_root) if self._cgroup_root else None,
+            "limits": {
+                "memoryMb": dict(settings.ENGINE_MEMORY_LIMITS_MB),
+                "cpuSeconds": settings.CONVERSION_CPU_LIMIT,
+                "maxOutputMb": settings.CONVERSION_MAX_OUTPUT_MB,
+            },
+            "running": self._running,
+            "processes": self._jobs,
+            "killed": self._killed,
+            "limitExceeded": self._limit_exceeded,
+            "cpuSeconds": round(self._cpu_time, 3),
+            "maxRssKb": self._max_rss_kb,
+        }
+
+
+class _PipeReader:
+    """通过事件循环增量读取子进程管道"""
+
+    def __init__(self, loop, pipe, buffer: TailBuffer, callback=None):
+        self._loop = loop
+        self._pipe = pipe
+        self._fd = pipe.fileno()
+        self._buffer = buffer
+        self._callback = callback
+        self.eof = loop.create_future()
+        os.set_blocking(self._fd, False)
+        loop.add_reader(self._fd, self._on_readable)
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+            if not data:
+                self._loop.remove_reader(self._fd)
+                if not self.eof.done():
+                    self.eof.set_result(None)
+                return
+            self._buffer.append(data)
+            if self._callback is not None:
+                self._callback(data)
+
+    def close(self) -> None:
+        if not self.eof.done():
+            self._loop.remove_reader(self._fd)
+            self.eof.cancel()
+        self._pipe.close()
+
+
+async def _wait4(loop: asyncio.AbstractEventLoop, pid: int):
+    """等待子进程退出并回收，返回 (wait 状态, rusage)；不占用线程池"""
+    if not hasattr(os, "pidfd_open"):
+        _, status, rusage = await asyncio.to_thread(os.wait4, pid, 0)
+        return status, rusage
+
+    pidfd = os.pidfd_open(pid)
+    try:
+        while True:
+            waited, status, rusage = os.wait4(pid, os.WNOHANG)
+            if waited:
+                return status, rusage
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+    finally:
+        os.close(pidfd)
+
+
+# 全局转换进程监管器实例
+process_supervisor = ProcessSupervisor()
@@ -0,0 +1,106 @@
+"""
+任务状态本地缓存 - 位于 Redis 任务存储之前
+
+小程序每秒轮询一次任务状态，绝大多数读取的是没有变化的任务。
+每个实例在本地缓存最近读取的任务：
+- 进行中的任务缓存 TASK_CACHE_TTL 秒，任务更新时通过 Redis 发布/订阅
+  通知所有实例失效（TTL 只是消息丢失时的兜底）；
+- 已结束的任务不会再变化，缓存到任务在 Redis 中过期为止；
+- 读取 Redis 期间收到同一任务的失效通知时，读到的结果可能已过时，不写入缓存。
+
+缓存只在订阅连接正常时使用，由 RedisTaskManager 负责订阅和调用 invalidate。
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.models import TERMINAL_STATES, ConvertTask
+
+
+class TaskStatusCache:
+    """任务状态本地缓存（LRU + TTL）"""
+
+    def __init__(self, task_ttl: int):
+        self._task_ttl = task_ttl  # 任务在 Redis 中的过期时间
+        self._entries: "OrderedDict[str, Tuple[float, ConvertTask]]" = OrderedDict()
+        # 正在从 Redis 读取的任务 -> 并发读取数；读取期间失效过的任务 -> 失效序号
+        self._reading: Dict[str, int] = {}
+        self._dirty: Dict[str, int] = {}
+        self._seq = 0
+        self._epoch = 0
+        self.active = False
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.TASK_CACHE_ENABLED and self.active
+
+    def get(self, task_id: str) -> Optional[ConvertTask]:
+        """读取缓存，返回副本（调用方可能修改任务对象）"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(task_id)
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                del self._entries[task_id]
+            self._misses += 1
+            return None
+        self._entries.move_to_end(task_id)
+        self._hits += 1
+        return entry[1].model_copy()
+
+    def begin_read(self, task_id: str) -> Tuple[int, int]:
+        """开始从 Redis 读取任务，返回用于 end_read 的读取令牌"""
+        self._reading[task_id] = self._reading.get(task_id, 0) + 1
+        return self._seq, self._epoch
+
+    def end_read(self, task_id: str, token: Tuple[int, int], task: Optional[ConvertTask]):
+        """读取完成：读取期间没有失效、订阅没有中断时写入缓存"""
+        remaining = self._reading.pop(task_id) - 1
+        if remaining:
+            self._reading[task_id] = remaining
+            dirty = self._dirty.get(task_id, -1)
+        else:
+            dirty = self._dirty.pop(task_id, -1)
+
+        seq, epoch = token
+        if task is None or not self.enabled or dirty > seq or epoch != self._epoch:
+            return
+        if task.state in TERMINAL_STATES:
+            expires_at = task.created_at.timestamp() + self._task_ttl
+        else:
+            expires_at = time.time() + settings.TASK_CACHE_TTL
+        self._entries[task_id] = (expires_at, task.model_copy())
+        self._entries.move_to_end(task_id)
+        while len(self._entries) > settings.TASK_CACHE_MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, task_id: str) -> None:
+        """任务已更新（本实例写入或收到其他实例的通知）"""
+        self._seq += 1
+        self._invalidations += 1
+        self._entries.pop(task_id, None)
+        if task_id in self._reading:
+            self._dirty[task_id] = self._seq
+
+    def set_active(self, active: bool) -> None:
+        """订阅建立或中断：中断期间的更新收不到通知，清空缓存并使进行中的读取作废"""
+        self.active = active
+        self._epoch += 1
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hitRate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self._invalidations,
+        }
@@ -0,0 +1,177 @@
+"""
+任务紧凑编码 - Redis 任务 Hash 的 v2 格式
+
+v1 格式每个字段一个 Hash 字段，字段名即属性名，时间为 ISO 字符串，
+url / download_url / preview_url 三个完整 URL 都由输出文件名生成。v2 格式：
+- 创建后不再变化的字段编码为一个定长 JSON 数组，存在字段 c 中；
+- 会更新的字段使用单字母字段名，状态存为序号，时间存为微秒数；
+- 任务 ID 取自键名，不重复存储；
+- 三个 URL 与由输出文件名生成的结果一致时不存储，读取时重新生成。
+
+格式版本体现在键名中（converteasy:tasks:v2:<id>）。同一版本内字段和
+定长数组的顺序固定，增删字段时升级版本并使用新的键名；只新增可为空的
+可变字段时旧实例忽略新字段、新实例读取旧数据得到空值，不需要升级版本。
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.models import ConvertTask, TaskState
+from app.utils.file_utils import build_download_url, build_preview_url, build_public_url
+
+FORMAT_VERSION = 2
+
+# 定长数组中的字段（创建后不再变化）
+IMMUTABLE_FIELDS = (
+    "category",
+    "target",
+    "source",
+    "input_path",
+    "original_filename",
+    "content_hash",
+    "created_at",
+)
+# 会更新的字段 -> Hash 字段名
+MUTABLE_FIELDS = {
+    "state": "s",
+    "output_path": "o",
+    "error": "e",
+    "updated_at": "t",
+    "started_at": "b",
+    "queue_wait_ms": "w",
+    "progress": "g",
+    "stage": "a",
+    "cpu_time_ms": "m",
+    "max_rss_kb": "k",
+}
+# 与输出文件名不一致时才存储的 URL 字段
+URL_FIELDS = {"url": "u", "download_url": "d", "preview_url": "p"}
+
+_STATES = tuple(TaskState)
+_STATE_CODES = {state: str(i) for i, state in enumerate(_STATES)}
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value: datetime) -> int:
+    """本地时间 -> 自 1970 年起的微秒数（可精确还原）"""
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    return _EPOCH + value * _MICROSECOND
+
+
+def derived_urls(output_path: Optional[str]) -> Dict[str, Optional[str]]:
+    """由输出文件路径生成任务的三个 URL（与 mark_task_finished 一致）"""
+    if not output_path:
+        return dict.fromkeys(URL_FIELDS)
+    name = os.path.basename(output_path)
+    return {
+        "url": build_public_url(f"/public/{name}"),
+        "download_url": build_download_url(name),
+        "preview_url": build_preview_url(name),
+    }
+
+
+def task_from_fields(fields: dict) -> ConvertTask:
+    """由已还原为 Python 类型的字段构造任务对象（各存储后端共用）"""
+    # pydantic v2 的校验由 pydantic-core 完成，比 model_construct 更快
+    return ConvertTask.model_validate(fields)
+
+
+def encode_task(
+    task: ConvertTask, fields: Optional[Iterable[str]] = None
+) -> Tuple[Dict[str, str], List[str]]:
+    """
+    编码任务字段
+
+    参数:
+        task: 任务对象
+        fields: 需要编码的属性名，为 None 时编码全部字段
+
+    返回:
+        (需要 HSET 的字段映射, 值为空、需要 HDEL 的字段名)
+    """
+    names = set(fields) if fields is not None else None
+    mapping: Dict[str, str] = {}
+    removed: List[str] = []
+
+    if names is None or not names.isdisjoint(IMMUTABLE_FIELDS):
+        mapping["c"] = json.dumps(
+            [
+                task.category.value,
+                task.target,
+                task.source,
+                task.input_path,
+                task.original_filename,
+                task.content_hash,
+                to_micros(task.created_at),
+            ],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    for name, key in MUTABLE_FIELDS.items():
+        if names is not None and name not in names:
+            continue
+        value = getattr(task, name)
+        if value is None:
+            removed.append(key)
+        elif name == "state":
+            mapping[key] = _STATE_CODES[value]
+        elif isinstance(value, datetime):
+            mapping[key] = str(to_micros(value))
+        else:
+            mapping[key] = str(value)
+
+    if names is None or not names.isdisjoint(("output_path", *URL_FIELDS)):
+        derived = derived_urls(task.output_path)
+        for name, key in URL_FIELDS.items():
+            value = getattr(task, name)
+            if value is None or value == derived[name]:
+                removed.append(key)
+            else:
+                mapping[key] = value
+
+    return mapping, removed
+
+
+def decode_task(task_id: str, data: Dict[str, str]) -> Optional[ConvertTask]:
+    """解码任务 Hash；缺少定长数组（任务过期后仍有更新写入）时视为不存在"""
+    packed = data.get("c")
+    if packed is None:
+        return None
+    category, target, source, input_path, original_filename, content_hash, created = json.loads(
+        packed
+    )
+    output_path = data.get("o")
+    fields = derived_urls(output_path)
+    for name, key in URL_FIELDS.items():
+        if key in data:
+            fields[name] = data[key]
+    created_at = from_micros(created)
+    updated, started, wait = data.get("t"), data.get("b"), data.get("w")
+    fields.update(
+        id=task_id,
+        state=_STATES[int(data["s"])],
+        created_at=created_at,
+        updated_at=from_micros(int(updated)) if updated else created_at,
+        category=category,
+        target=target,
+        source=source,
+        input_path=input_path,
+        output_path=output_path,
+        error=data.get("e"),
+        original_filename=original_filename,
+        content_hash=content_hash,
+        started_at=from_micros(int(started)) if started else None,
+        queue_wait_ms=int(wait) if wait else None,
+        progress=int(data["g"]) if "g" in data else None,
+        stage=data.get("a"),
+        cpu_time_ms=int(data["m"]) if "m" in data else None,
+        max_rss_kb=int(data["k"]) if "k" in data else None,
+    )
+    return task_from_fields(fields)
@@ -0,0 +1,68 @@
+"""
+任务更新广播 - 向 SSE / WebSocket 连接推送任务状态变化
+
+订阅者按任务 ID 登记一个 asyncio.Event，任务更新时置位。通知只表示
+"任务有变化"，订阅者收到后重新读取任务，多次更新合并为一次读取。
+
+- 内存 / SQLite 存储：update_task / delete_task 直接通知本进程的订阅者；
+- Redis 存储：写入时在同一个 MULTI 中发布到任务更新频道，各实例的订阅
+  连接收到后通知本实例的订阅者，转换在其他实例上完成时也能推送。
+"""
+
+import asyncio
+from contextlib import contextmanager
+from typing import Dict, Iterator, Set, Tuple
+
+
+class TaskEventBroadcaster:
+    """进程内任务更新广播"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._notifications = 0
+
+    @contextmanager
+    def subscribe(self, task_id: str) -> Iterator[asyncio.Event]:
+        """订阅任务更新，返回任务有变化时置位的事件（由订阅者清除）"""
+        entry = (asyncio.get_running_loop(), asyncio.Event())
+        self._subscribers.setdefault(task_id, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(entry)
+                if not subscribers:
+                    del self._subscribers[task_id]
+
+    def notify(self, task_id: str) -> None:
+        """任务已更新"""
+        subscribers = self._subscribers.get(task_id)
+        if not subscribers:
+            return
+        self._notifications += 1
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for loop, event in list(subscribers):
+            if loop is current:
+                event.set()
+            else:
+                # 订阅者在其他线程的事件循环中
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    pass  # 事件循环已关闭
+
+    def get_stats(self) -> dict:
+        """获取广播统计"""
+        return {
+            "tasks": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "notifications": self._notifications,
+        }
+
+
+# 全局任务更新广播实例
+task_events = TaskEventBroadcaster()
@@ -0,0 +1,350 @@
+"""
+Python 转换 worker 池 - 常驻进程执行转换脚本
+
+每次转换都启动 python script.py 时，解释器启动和 pdf2docx / pandas / fitz 等
+重量级依赖的导入耗时往往超过小文件的转换本身。worker 池改为：
+- worker 由 forkserver 进程 fork 而来，forkserver 已预加载全部转换脚本并
+  gc.freeze()（见 worker_preload），worker 无需重复导入，并以写时复制共享内存页；
+- worker 在进程内以命令行参数调用脚本的 main()，输出与退出码和子进程方式一致；
+- 每个 worker 有一条专用的进度管道（CONVERT_PROGRESS_FD），转换过程中
+  增量读取脚本上报的进度（见 progress）；
+- worker 执行 PY_WORKER_MAX_TASKS 个任务或 RSS 超过 PY_WORKER_MAX_RSS_MB 后回收，
+  超时或异常退出的 worker 直接杀掉（连同其子进程），不再复用；
+- worker 启动时设置与子进程方式相同的内存、输出文件大小 rlimit（见 supervisor），
+  CPU 时间限制在每个任务开始时按已用时间顺延；每个任务的 CPU 时间和峰值内存
+  由 worker 统计后随结果返回；
+- 调度器分配的线程预算随任务传入，worker 在执行前设置 CONVERT_THREADS（见 cpu_budget）。
+
+并发由调度器的 python 引擎池限制，池本身只负责复用空闲 worker：
+没有空闲 worker 时即时创建，空闲 worker 最多保留 PY_WORKER_POOL_SIZE 个。
+"""
+
+import asyncio
+import atexit
+import contextlib
+import importlib
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import traceback
+from dataclasses import replace
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import List, Optional, Sequence, Set, Tuple
+
+import psutil
+
+from app.config import settings
+from app.utils.cpu_budget import THREADS_ENV
+from app.utils.progress import PROGRESS_FD_ENV, ProgressCallback, ProgressParser, drain_fd
+from app.utils.supervisor import (
+    ConversionLimitError,
+    ProcessLimits,
+    limit_error,
+    process_supervisor,
+)
+
+PRELOAD_MODULE = "app.utils.worker_preload"
+
+
+class WorkerCrashedError(Exception):
+    """worker 进程在转换过程中异常退出"""
+
+
+def _run_script(script_path: str, args: Sequence[str]) -> Tuple[int, str, str]:
+    """在 worker 内调用脚本的 main()，模拟 python script.py args 的命令行调用"""
+    script_dir = str(Path(script_path).parent)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    saved_argv = sys.argv
+    sys.argv = [script_path, *args]
+    code = 0
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                module = importlib.import_module(Path(script_path).stem)
+                module.main()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    finally:
+        sys.argv = saved_argv
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+def _cpu_time() -> float:
+    """本进程及已回收子进程的 CPU 时间（秒）"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _reset_peak_rss() -> None:
+    # Linux 4.0+ 可重置 VmHWM，使峰值内存按任务而不是按 worker 生命周期统计
+    with contextlib.suppress(OSError):
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+
+
+def _peak_rss_kb() -> int:
+    with contextlib.suppress(OSError):
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_measured(script_path: str, args: Sequence[str], threads: int, cpu_limit: int) -> tuple:
+    """执行一个任务，返回 (退出码, 标准输出, 标准错误, CPU 秒, 峰值内存 KB)"""
+    os.environ[THREADS_ENV] = str(threads)
+    cpu_before = _cpu_time()
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if cpu_limit:
+        # RLIMIT_CPU 按进程累计：只调整软限制，本任务最多再使用 cpu_limit 秒
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_before) + 1 + cpu_limit, hard))
+    _reset_peak_rss()
+
+    code, stdout, stderr = _run_script(script_path, args)
+
+    max_rss = _peak_rss_kb()
+    # 子进程（如 pdf2docx 的进程池）的峰值只有生命周期最大值，增长时才计入
+    after_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if after_children > children_rss:
+        max_rss = max(max_rss, after_children)
+    return code, stdout, stderr, _cpu_time() - cpu_before, max_rss
+
+
+def _worker_main(conn: Connection, progress: Connection, limits: ProcessLimits) -> None:
+    """worker 主循环：收到 (脚本路径, 参数, 线程数) 执行转换，收到 None 或管道关闭时退出"""
+    # forkserver 中已导入时为空操作；spawn 方式下在此完成预加载
+    import app.utils.worker_preload  # noqa: F401
+
+    # 脚本（及其 fork 出的子进程）向该 fd 写入进度 JSON 行
+    os.environ[PROGRESS_FD_ENV] = str(progress.fileno())
+    # 内存和输出文件大小限制对整个 worker 生效，CPU 时间按任务设置
+    replace(limits, cpu_seconds=0).apply()
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        conn.send(_run_measured(*request, limits.cpu_seconds))
+
+
+class _Worker:
+    def __init__(self, process: multiprocessing.Process, conn: Connection, progress: Connection):
+        self.process = process
+        self.conn = conn
+        self.progress = progress  # 进度管道读端（非阻塞）
+        self.tasks = 0
+
+    def rss(self) -> int:
+        try:
+            return psutil.Process(self.process.pid).memory_info().rss
+        except psutil.Error:
+            return 0
+
+    def stop(self, graceful: bool = True) -> None:
+        """结束 worker：空闲时通知其退出，否则连同子进程（如 pdf2docx 进程池）一起杀掉"""
+        if graceful:
+            with contextlib.suppress(OSError):
+                self.conn.send(None)
+            self.process.join(timeout=5)
+        if self.process.is_alive():
+            with contextlib.suppress(psutil.Error):
+                for child in psutil.Process(self.process.pid).children(recursive=True):
+                    child.kill()
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+        self.progress.close()
+
+
+class PythonWorkerPool:
+    """常驻 Python 转换 worker 池"""
+
+    def __init__(self):
+        self._idle: List[_Worker] = []
+        self._workers: Set[_Worker] = set()
+        self._busy = 0
+        self._context = None
+        self._spawned = 0
+        self._recycled = 0
+        self._crashed = 0
+        self._tasks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.PY_WORKER_POOL_ENABLED
+
+    def _get_context(self):
+        if self._context is None:
+            # worker 为非守护进程，解释器退出时 multiprocessing 会等待其结束；
+            # 在此之前（atexit 后注册先执行）杀掉所有 worker，避免进程无法退出
+            atexit.register(self._kill_all)
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                self._context = multiprocessing.get_context("forkserver")
+                self._context.set_forkserver_preload([PRELOAD_MODULE])
+            else:
+                self._context = multiprocessing.get_context("spawn")
+        return self._context
+
+    def _spawn(self) -> _Worker:
+        """启动新 worker（阻塞，首次调用时还会启动 forkserver 并预加载）"""
+        parent_conn, child_conn = multiprocessing.Pipe()
+        progress_reader, progress_writer = multiprocessing.Pipe(duplex=False)
+        # 非守护进程：pdf2docx 的 multi_processing 需要在 worker 内创建子进程
+        process = self._get_context().Process(
+            target=_worker_main,
+            args=(child_conn, progress_writer, process_supervisor.limits("python")),
+            name="py-converter",
+            daemon=False,
+        )
+        process.start()
+        child_conn.close()
+        progress_writer.close()
+        os.set_blocking(progress_reader.fileno(), False)
+        self._spawned += 1
+        worker = _Worker(process, parent_conn, progress_reader)
+        self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker, graceful: bool) -> None:
+        self._workers.discard(worker)
+        worker.stop(graceful=graceful)
+
+    def _kill_all(self) -> None:
+        self._idle = []
+        for worker in list(self._workers):
+            self._retire(worker, graceful=False)
+
+    async def start(self) -> None:
+        """预热 PY_WORKER_MIN_IDLE 个空闲 worker（应用启动时调用）"""
+        if not self.enabled:
+            return
+        while len(self._idle) < settings.PY_WORKER_MIN_IDLE:
+            self._idle.append(await asyncio.to_thread(self._spawn))
+        print(f"🐍 Python 转换 worker 池已就绪: {len(self._idle)} 个空闲 worker")
+
+    async def close(self) -> None:
+        """结束所有空闲 worker（应用关闭时调用）"""
+        idle, self._idle = self._idle, []
+        for worker in idle:
+            await asyncio.to_thread(self._retire, worker, True)
+
+    @staticmethod
+    async def _recv(conn: Connection):
+        """等待管道可读后读取结果，不占用线程池"""
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(conn.fileno(), lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(conn.fileno())
+        return conn.recv()
+
+    def _should_recycle(self, worker: _Worker) -> bool:
+        if worker.tasks >= settings.PY_WORKER_MAX_TASKS:
+            return True
+        if worker.rss() > settings.PY_WORKER_MAX_RSS_MB * 1024 * 1024:
+            return True
+        return len(self._idle) >= settings.PY_WORKER_POOL_SIZE
+
+    async def run(
+        self,
+        script_path: Path,
+        args: Sequence[str],
+        timeout: float,
+        on_progress: Optional[ProgressCallback] = None,
+        threads: int = 1,
+    ) -> Tuple[int, str, str]:
+        """
+        在 worker 中执行转换脚本
+
+        参数:
+            on_progress: 收到脚本上报的进度事件时调用
+            threads: 脚本可使用的线程 / 进程数（CPU 预算）
+
+        返回:
+            (退出码, 标准输出, 标准错误)
+
+        异常:
+            asyncio.TimeoutError: 超时（worker 被杀掉）
+            ConversionLimitError: 超出 CPU 时间或输出文件大小限制（worker 被系统终止）
+            WorkerCrashedError: worker 异常退出
+        """
+        worker = self._idle.pop() if self._idle else await asyncio.to_thread(self._spawn)
+        self._busy += 1
+        healthy = False
+        # 没有回调时也要读取，否则管道写满后脚本会阻塞
+        parser = ProgressParser(on_progress or (lambda event: None))
+        progress_fd = worker.progress.fileno()
+        loop = asyncio.get_running_loop()
+
+        def on_readable():
+            # 读到 EOF（worker 已退出）后停止监听，避免反复触发
+            if drain_fd(progress_fd, parser):
+                loop.remove_reader(progress_fd)
+
+        loop.add_reader(progress_fd, on_readable)
+        try:
+            worker.conn.send((str(script_path), [str(arg) for arg in args], threads))
+            code, stdout, stderr, cpu_time, max_rss_kb = await asyncio.wait_for(
+                self._recv(worker.conn), timeout
+            )
+            # 结果发出前进度已全部写入管道
+            drain_fd(progress_fd, parser)
+            healthy = True
+            process_supervisor.record_usage(cpu_time, max_rss_kb)
+            return code, stdout, stderr
+        except asyncio.TimeoutError:
+            # Python 3.11 起 TimeoutError 是 OSError 的子类，需先于下面的分支处理
+            raise
+        except (EOFError, OSError) as e:
+            self._crashed += 1
+            await asyncio.to_thread(worker.process.join, 1)
+            error = limit_error(worker.process.exitcode, process_supervisor.limits("python"))
+            if error:
+                process_supervisor.record_limit_exceeded()
+                raise ConversionLimitError(error)
+            raise WorkerCrashedError(f"Python 转换进程异常退出: {e}")
+        finally:
+            loop.remove_reader(progress_fd)
+            self._busy -= 1
+            self._tasks += 1
+            worker.tasks += 1
+            if healthy and not self._should_recycle(worker):
+                self._idle.append(worker)
+            else:
+                if healthy:
+                    self._recycled += 1
+                # 等待 worker 退出最多需要数秒，在线程中执行，不阻塞事件循环
+                await asyncio.to_thread(self._retire, worker, healthy)
+
+    def get_stats(self) -> dict:
+        """获取 worker 池统计"""
+        return {
+            "enabled": self.enabled,
+            "idle": len(self._idle),
+            "busy": self._busy,
+            "spawned": self._spawned,
+            "recycled": self._recycled,
+            "crashed": self._crashed,
+            "tasks": self._tasks,
+        }
+
+
+# 全局 Python 转换 worker 池实例
+python_worker_pool = PythonWorkerPool()
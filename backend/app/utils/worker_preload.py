@@ -0,0 +1,43 @@
+"""
+Python 转换 worker 预加载模块
+
+由 forkserver 进程导入：提前导入所有转换脚本（pdf2docx、pandas、fitz、
+python-docx、PIL 等重量级依赖随之加载），随后 gc.freeze() 将这些对象移入
+永久代。worker 从 forkserver fork 出来后与其以写时复制方式共享这些内存页，
+垃圾回收不再扫描（写入）它们，共享页不会被逐渐复制。
+"""
+
+import gc
+import importlib
+import sys
+from pathlib import Path
+
+from app.config import settings, PYTHON_CONVERSIONS
+
+# 图片转换脚本不在 PYTHON_CONVERSIONS 映射中
+IMAGE_SCRIPT = "image_convert.py"
+
+
+def script_modules() -> list:
+    """所有转换脚本的模块名"""
+    scripts = {info["script"] for info in PYTHON_CONVERSIONS.values()} | {IMAGE_SCRIPT}
+    return sorted(Path(script).stem for script in scripts)
+
+
+def preload() -> None:
+    scripts_dir = str(settings.SCRIPTS_DIR)
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+
+    for name in script_modules():
+        try:
+            importlib.import_module(name)
+        except (Exception, SystemExit) as e:
+            # 缺少可选依赖的脚本（部分脚本导入失败时直接 sys.exit）留到执行时再报错
+            print(f"⚠ 预加载转换脚本失败: {name} - {e}")
+
+    gc.collect()
+    gc.freeze()
+
+
+preload()
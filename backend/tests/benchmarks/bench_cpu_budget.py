@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+并发转换吞吐基准测试：CPU 预算协调器 vs 各引擎自行占满所有核
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_cpu_budget.py --pages 30 --jobs 1 2 4 8
+    python tests/benchmarks/bench_cpu_budget.py --kind pdf->pptx   # 需要 poppler
+    python tests/benchmarks/bench_cpu_budget.py --kind wav->mp3    # 需要 ffmpeg
+
+每轮同时提交 N 个相同的转换任务，经调度器放行（分类池 / 引擎池上限设为 N）后
+执行实际转换，输出墙钟时间、吞吐（任务/分钟）和每个任务分到的线程数：
+- budget: 协调器按总核数和运行中的任务数分配（CPU_BUDGET_ENABLED=true）；
+- greedy: 每个任务都分配全部核数，相当于 pdf2docx multi_processing 使用 cpu_count()、
+  FFmpeg -threads 0 的原有行为（CPU_BUDGET_ENABLED=false）。
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from nanoid import generate as nanoid  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.models import Category, ConvertTask  # noqa: E402
+from app.utils import converter  # noqa: E402
+from app.utils.cpu_budget import cpu_budget  # noqa: E402
+from app.utils.scheduler import JobScheduler, engine_for  # noqa: E402
+from app.utils.worker_pool import python_worker_pool  # noqa: E402
+
+
+def _make_pdf(workdir: Path, pages: int) -> Path:
+    import fitz
+
+    pdf = workdir / "sample.pdf"
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"第 {number + 1} 页 benchmark", fontname="china-s")
+        # 带边框的表格，pdf2docx 需要做表格和线条检测
+        for row in range(12):
+            y = 90 + row * 24
+            page.draw_line((72, y), (520, y))
+            for col in range(4):
+                page.insert_text((78 + col * 112, y + 16), f"R{row}C{col} {number}")
+        for col in range(5):
+            x = 72 + col * 112
+            page.draw_line((x, 90), (x, 90 + 11 * 24))
+    doc.save(pdf)
+    return pdf
+
+
+def _make_wav(workdir: Path, seconds: int) -> Path:
+    import math
+    import struct
+    import wave
+
+    wav = workdir / "sample.wav"
+    with wave.open(str(wav), "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(44100)
+        frames = (
+            struct.pack("<hh", int(8000 * math.sin(i / 20)), int(8000 * math.cos(i / 30)))
+            for i in range(44100 * seconds)
+        )
+        f.writeframes(b"".join(frames))
+    return wav
+
+
+async def _convert(task: ConvertTask, output: Path) -> None:
+    if task.category == Category.AUDIO:
+        await converter.run_ffmpeg(task.input_path, str(output), task.target)
+    else:
+        await converter.run_document_conversion(
+            task.input_path, str(output), f".{task.source}", task.target
+        )
+
+
+async def _round(kind: str, src: Path, workdir: Path, jobs: int) -> tuple:
+    """同时提交 jobs 个任务，返回 (墙钟秒, 各任务线程数)"""
+    source, target = kind.split("->")
+    category = Category.AUDIO if source == "wav" else Category.DOCUMENT
+    tasks = [
+        ConvertTask(
+            id=nanoid(), category=category, source=source, target=target, input_path=str(src)
+        )
+        for _ in range(jobs)
+    ]
+    engine = engine_for(tasks[0])
+    settings.SCHEDULER_CATEGORY_LIMITS = {category.value: jobs}
+    settings.SCHEDULER_ENGINE_LIMITS = {engine: jobs}
+    scheduler = JobScheduler()
+    threads = []
+
+    async def run(task: ConvertTask) -> None:
+        async with scheduler.slot(task) as job:
+            threads.append(job.threads)
+            await _convert(task, workdir / f"{task.id}.{target}")
+
+    # 与上传接口一致：先全部入队，再由转换协程等待调度
+    for task in tasks:
+        scheduler.enqueue(task)
+    start = time.perf_counter()
+    await asyncio.gather(*(run(task) for task in tasks))
+    elapsed = time.perf_counter() - start
+    for output in workdir.glob(f"*.{target}"):
+        output.unlink()
+    return elapsed, threads
+
+
+async def run(kind: str, pages: int, seconds: int, job_counts: list, runs: int) -> None:
+    workdir = Path(tempfile.mkdtemp(prefix="bench_cpu_budget_"))
+    src = _make_wav(workdir, seconds) if kind.startswith("wav") else _make_pdf(workdir, pages)
+    print(f"{kind}, 输入 {src.stat().st_size / 1024:.0f} KB, 可用核数 {cpu_budget.cores}")
+
+    await python_worker_pool.start()
+    try:
+        # 预热：首次转换的导入和 worker 启动不计入
+        await _round(kind, src, workdir, 1)
+        print(f"{'并发':>4} {'模式':>8} {'墙钟':>9} {'吞吐':>12} {'线程/任务':>10}")
+        for jobs in job_counts:
+            for mode, enabled in (("greedy", False), ("budget", True)):
+                settings.CPU_BUDGET_ENABLED = enabled
+                results = [await _round(kind, src, workdir, jobs) for _ in range(runs)]
+                elapsed = statistics.median(r[0] for r in results)
+                threads = sorted(results[0][1])
+                print(
+                    f"{jobs:>6} {mode:>10} {elapsed:>9.2f}s "
+                    f"{jobs / elapsed * 60:>9.1f}/min  {threads}"
+                )
+    finally:
+        await python_worker_pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发转换吞吐基准测试")
+    parser.add_argument(
+        "--kind", default="pdf->docx", choices=["pdf->docx", "pdf->pptx", "wav->mp3"]
+    )
+    parser.add_argument("--pages", type=int, default=30, help="PDF 页数")
+    parser.add_argument("--seconds", type=int, default=120, help="音频时长（秒）")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--runs", type=int, default=1, help="每种配置重复次数，取中位数")
+    args = parser.parse_args()
+    asyncio.run(run(args.kind, args.pages, args.seconds, args.jobs, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Python 转换延迟基准测试：常驻 worker 池 vs 每个任务启动独立进程
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_python_worker.py --runs 10
+
+对小文件分别执行 txt->docx、pdf->txt、png->jpg 转换，
+输出两种方式的单任务延迟（p50 / 最大值）。worker 池首个任务的冷启动
+（启动 forkserver 并预加载）单独列出，不计入 p50。
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.config import settings  # noqa: E402
+from app.utils import converter  # noqa: E402
+from app.utils.worker_pool import python_worker_pool  # noqa: E402
+
+
+def _make_inputs(workdir: Path) -> dict:
+    from PIL import Image
+    import fitz
+
+    txt = workdir / "sample.txt"
+    txt.write_text("基准测试\n" * 50, encoding="utf-8")
+
+    png = workdir / "sample.png"
+    Image.new("RGB", (64, 64), (200, 80, 40)).save(png)
+
+    pdf = workdir / "sample.pdf"
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "benchmark")
+    doc.save(pdf)
+    return {"txt->docx": txt, "pdf->txt": pdf, "png->jpg": png}
+
+
+async def _convert(kind: str, src: Path, dest: Path) -> None:
+    target = kind.split("->")[1]
+    if kind == "png->jpg":
+        await converter.run_image_conversion(str(src), str(dest), target)
+    else:
+        await converter.run_python_conversion(str(src), str(dest), kind)
+
+
+async def _measure(kind: str, src: Path, workdir: Path, runs: int) -> list:
+    timings = []
+    for i in range(runs):
+        dest = workdir / f"{kind.replace('->', '_')}_{i}.{kind.split('->')[1]}"
+        start = time.perf_counter()
+        await _convert(kind, src, dest)
+        timings.append(time.perf_counter() - start)
+        dest.unlink(missing_ok=True)
+    return timings
+
+
+def _report(label: str, timings: list) -> None:
+    print(
+        f"  {label:>10}: p50 {statistics.median(timings) * 1000:7.1f} ms, "
+        f"max {max(timings) * 1000:7.1f} ms"
+    )
+
+
+async def run(runs: int) -> None:
+    workdir = Path(tempfile.mkdtemp(prefix="bench_pyworker_"))
+    inputs = _make_inputs(workdir)
+
+    # 冷启动：forkserver 启动 + 预加载全部转换脚本
+    settings.PY_WORKER_POOL_ENABLED = True
+    start = time.perf_counter()
+    await python_worker_pool.start()
+    print(f"worker 池冷启动: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    try:
+        for kind, src in inputs.items():
+            print(f"{kind}（{runs} 次）")
+            settings.PY_WORKER_POOL_ENABLED = False
+            _report("subprocess", await _measure(kind, src, workdir, runs))
+            settings.PY_WORKER_POOL_ENABLED = True
+            _report("worker", await _measure(kind, src, workdir, runs))
+    finally:
+        await python_worker_pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python 转换延迟基准测试")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.runs))
+
+
+if __name__ == "__main__":
+    main()
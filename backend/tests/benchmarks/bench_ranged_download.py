@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+分段并发下载基准测试：不同 Range 并发数下的下载耗时
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_ranged_download.py --size-mb 64 --stream-mbps 16
+
+本地源站支持 Range，并把每个连接限速到 stream-mbps（模拟云存储单连接带宽），
+分别以 1/2/4/8 个分段并发下载同一文件，输出墙钟耗时。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.config import settings  # noqa: E402
+from app.utils.downloader import RemoteDownloader  # noqa: E402
+
+WRITE_BLOCK = 64 * 1024
+
+
+def _make_app(payload: bytes, stream_bytes_per_sec: float) -> web.Application:
+    async def handler(request: web.Request) -> web.StreamResponse:
+        total = len(payload)
+        start, end, status = 0, total - 1, 200
+        range_header = request.headers.get("Range")
+        if range_header and range_header.startswith("bytes="):
+            first, _, last = range_header[6:].partition("-")
+            start = int(first)
+            end = min(int(last), total - 1) if last else total - 1
+            status = 206
+
+        resp = web.StreamResponse(status=status)
+        resp.headers["Accept-Ranges"] = "bytes"
+        resp.headers["ETag"] = '"bench"'
+        resp.content_length = end - start + 1
+        if status == 206:
+            resp.headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        await resp.prepare(request)
+
+        # 按单连接带宽限速发送
+        offset = start
+        while offset <= end:
+            block = payload[offset : min(offset + WRITE_BLOCK, end + 1)]
+            await resp.write(block)
+            offset += len(block)
+            await asyncio.sleep(len(block) / stream_bytes_per_sec)
+        await resp.write_eof()
+        return resp
+
+    app = web.Application()
+    app.router.add_get("/file.bin", handler)
+    return app
+
+
+async def run(size_mb: int, stream_mbps: float, levels: list) -> None:
+    payload = os.urandom(size_mb * 1024 * 1024)
+    server = TestServer(_make_app(payload, stream_mbps * 1024 * 1024))
+    await server.start_server()
+    url = str(server.make_url("/file.bin"))
+    workdir = Path(tempfile.mkdtemp(prefix="bench_ranged_"))
+
+    settings.DOWNLOAD_RANGE_MIN_SIZE_MB = 1
+    downloader = RemoteDownloader()
+    await downloader.start()
+
+    print(f"文件: {size_mb}MB, 单连接限速: {stream_mbps}MB/s")
+    try:
+        for concurrency in levels:
+            settings.DOWNLOAD_RANGE_CONCURRENCY = concurrency
+            dest = workdir / f"out_{concurrency}.bin"
+            start = time.perf_counter()
+            result = await downloader.download(url, dest, len(payload) + 1)
+            assert result.size == len(payload)
+            elapsed = time.perf_counter() - start
+            assert dest.read_bytes() == payload
+            dest.unlink()
+            print(f"并发分段 {concurrency}: {elapsed:.2f}s, {size_mb / elapsed:.1f} MB/s")
+    finally:
+        await downloader.close()
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分段并发下载基准测试")
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--stream-mbps", type=float, default=16)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    asyncio.run(run(args.size_mb, args.stream_mbps, args.levels))
+
+
+if __name__ == "__main__":
+    main()
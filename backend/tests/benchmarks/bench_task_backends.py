@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+任务存储后端基准测试：内存 vs SQLite vs Redis
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_task_backends.py --tasks 5000 --concurrency 50
+    python tests/benchmarks/bench_task_backends.py --redis-url redis://localhost:6379/15
+
+每个后端依次执行：并发创建任务、并发更新状态、并发读取任务，
+输出各阶段吞吐、读取延迟（p50 / p99）、统计与分页列表耗时，
+以及写入阶段事件循环的最大阻塞时间。
+sqlite-1 为写线程每个事务只提交一个写入（不合并）的对照。
+
+未指定 --redis-url 时使用 bench_task_store 中的 fakeredis TCP 服务
+（Python 实现，吞吐远低于真实 Redis，绝对数值仅供参考）。
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.config import settings  # noqa: E402
+from app.models import Category, ConvertTask, TaskState  # noqa: E402
+from app.utils.task_manager import (  # noqa: E402
+    MemoryTaskManager,
+    RedisTaskManager,
+    SQLiteTaskManager,
+)
+from bench_task_store import _start_fake_server  # noqa: E402
+
+
+def _task(i: int) -> ConvertTask:
+    return ConvertTask(
+        id=f"bench{i:08d}",
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path=f"uploads/bench{i:08d}.docx",
+        original_filename=f"基准测试文档_{i}",
+    )
+
+
+async def _concurrently(concurrency: int, items, fn) -> None:
+    items = iter(items)
+
+    async def worker():
+        for item in items:
+            await fn(item)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+
+async def _bench(label: str, manager, n: int, concurrency: int) -> None:
+    tasks = [_task(i) for i in range(n)]
+    lags = [0.0]
+
+    async def watch_loop():
+        # 每 1ms 醒来一次，记录实际醒来时间比预期晚了多久
+        while True:
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - expected)
+
+    watcher = asyncio.create_task(watch_loop())
+    start = time.perf_counter()
+    await _concurrently(concurrency, tasks, manager.create_task)
+    create = n / (time.perf_counter() - start)
+
+    async def finish(task):
+        task.state = TaskState.FINISHED
+        await manager.update_task(task, "state")
+
+    start = time.perf_counter()
+    await _concurrently(concurrency, tasks, finish)
+    update = n / (time.perf_counter() - start)
+    watcher.cancel()
+
+    latencies = []
+
+    async def read(task_id):
+        start = time.perf_counter()
+        assert await manager.get_task(task_id) is not None
+        latencies.append(time.perf_counter() - start)
+
+    ids = [random.choice(tasks).id for _ in range(n)]
+    start = time.perf_counter()
+    await _concurrently(concurrency, ids, read)
+    reads = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    stats = await manager.get_stats()
+    stats_ms = (time.perf_counter() - start) * 1000
+    assert stats["finished"] == n
+    start = time.perf_counter()
+    await manager.list_tasks(TaskState.FINISHED, offset=n // 2, limit=50)
+    list_ms = (time.perf_counter() - start) * 1000
+
+    latencies.sort()
+    print(
+        f"  {label:>8}: 创建 {create:7.0f}/s, 更新 {update:7.0f}/s, 读取 {reads:7.0f}/s "
+        f"(p50 {statistics.median(latencies) * 1000:5.2f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:5.2f} ms), "
+        f"统计 {stats_ms:6.2f} ms, 列表 {list_ms:6.2f} ms, "
+        f"写入时事件循环最大阻塞 {max(lags) * 1000:5.1f} ms"
+    )
+
+
+async def run(args) -> None:
+    print(f"{args.tasks} 个任务, 并发 {args.concurrency}")
+    await _bench("memory", MemoryTaskManager(), args.tasks, args.concurrency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, batch_size in (("sqlite", settings.TASK_DB_BATCH_SIZE), ("sqlite-1", 1)):
+            settings.TASK_DB_BATCH_SIZE = batch_size
+            manager = SQLiteTaskManager(str(Path(tmp) / f"{label}.db"))
+            try:
+                await _bench(label, manager, args.tasks, args.concurrency)
+                db = manager.get_db_stats()
+                print(f"            {db['writes']} 次写入合并为 {db['batches']} 个事务")
+            finally:
+                await manager.close()
+
+    redis_url = args.redis_url or _start_fake_server(args.rtt_ms / 1000)
+    manager = RedisTaskManager(redis_url)
+    try:
+        await manager._redis.flushdb()
+        await _bench("redis", manager, args.tasks, args.concurrency)
+    finally:
+        await manager._redis.flushdb()
+        await manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务存储后端基准测试")
+    parser.add_argument("--redis-url", default="", help="默认启动 fakeredis TCP 服务（会清空该库）")
+    parser.add_argument(
+        "--rtt-ms", type=float, default=0.2, help="fakeredis 模拟的网络往返延迟（毫秒）"
+    )
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
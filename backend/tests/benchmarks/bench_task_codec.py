@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+任务编码微基准：v2 紧凑编码 vs v1 Hash vs 最早的 JSON 字符串
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_task_codec.py --runs 20000
+
+对一个已完成的任务分别测量编码、解码的单次耗时和每个任务写入 Redis 的
+字节数（Hash 为各字段名与值的 UTF-8 长度之和，不含键名和 Redis 内部开销）。
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.models import Category, ConvertTask  # noqa: E402
+from app.routers.convert import mark_task_finished  # noqa: E402
+from app.utils.task_codec import decode_task, encode_task  # noqa: E402
+from app.utils.task_manager import RedisTaskManager  # noqa: E402
+from bench_task_store import legacy_task_dict  # noqa: E402
+
+
+def _task() -> ConvertTask:
+    task = ConvertTask(
+        id="V1StGXR8_Z5jdHi6B-myT",
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path="uploads/V1StGXR8_Z5jdHi6B-myT.docx",
+        original_filename="2025年第三季度经营分析报告",
+        content_hash="9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+        started_at=datetime.now(),
+        queue_wait_ms=37,
+    )
+    mark_task_finished(task, Path("public/2025年第三季度经营分析报告_2510161230.pdf"))
+    return task
+
+
+def _hash_bytes(mapping: dict) -> int:
+    return sum(len(k.encode()) + len(v.encode()) for k, v in mapping.items())
+
+
+def _timeit(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务编码微基准")
+    parser.add_argument("--runs", type=int, default=20000)
+    args = parser.parse_args()
+
+    task = _task()
+    manager = RedisTaskManager("redis://localhost:6379/0")
+
+    def json_encode():
+        return json.dumps(legacy_task_dict(task), ensure_ascii=False)
+
+    def v1_encode():
+        return {k: str(v) for k, v in legacy_task_dict(task).items() if v is not None}
+
+    def v2_encode():
+        return encode_task(task)[0]
+
+    blob, v1, v2 = json_encode(), v1_encode(), v2_encode()
+    codecs = [
+        ("json", json_encode, lambda: manager._dict_to_task(json.loads(blob)), len(blob.encode())),
+        ("v1", v1_encode, lambda: manager._hash_to_task(v1), _hash_bytes(v1)),
+        ("v2", v2_encode, lambda: decode_task(task.id, v2), _hash_bytes(v2)),
+    ]
+
+    # 旧格式没有进度、资源统计等后来增加的字段，只比较其包含的字段
+    legacy_fields = set(legacy_task_dict(task))
+    print(f"单次耗时（{args.runs} 次平均）与每个任务的存储字节数")
+    for label, encode, decode, size in codecs:
+        fields = None if label == "v2" else legacy_fields
+        assert decode().model_dump(include=fields) == task.model_dump(include=fields)
+        print(
+            f"  {label:>4}: 编码 {_timeit(encode, args.runs):6.2f} µs, "
+            f"解码 {_timeit(decode, args.runs):6.2f} µs, {size:4d} 字节"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+任务完成通知负载测试：轮询 vs 长轮询 vs SSE vs WebSocket
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_task_events.py --clients 200 --duration 10
+
+在本进程内启动 uvicorn（只挂载转换路由，内存任务存储），每个客户端等待一个任务，
+任务在 --duration 秒内的随机时刻完成。依次测量四种等待方式：
+- poll: 每 --interval 秒查询一次 GET /convert/task/{id}（与小程序 pollTaskUntilComplete 一致）
+- long: GET /convert/task/{id}?wait=--wait，返回后立即再次请求
+- sse:  GET /convert/task/{id}/events
+- ws:   /convert/task/{id}/ws
+输出服务端收到的 HTTP 请求 / WebSocket 连接数，以及从任务完成到客户端
+得知完成的通知延迟（p50 / p99 / 最大）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+import websockets
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.models import Category, ConvertTask, TaskState  # noqa: E402
+from app.routers import convert as convert_router  # noqa: E402
+from app.utils.task_manager import task_manager  # noqa: E402
+
+requests_served = 0
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def count_requests(request, call_next):
+        global requests_served
+        requests_served += 1
+        return await call_next(request)
+
+    app.include_router(convert_router.router, prefix="/convert")
+    return app
+
+
+async def _wait_poll(client, base, task_id, interval, wait):
+    while True:
+        resp = await client.get(f"{base}/convert/task/{task_id}")
+        if resp.json()["state"] == "finished":
+            return time.perf_counter()
+        await asyncio.sleep(interval)
+
+
+async def _wait_long(client, base, task_id, interval, wait):
+    while True:
+        resp = await client.get(f"{base}/convert/task/{task_id}", params={"wait": wait})
+        if resp.json()["state"] == "finished":
+            return time.perf_counter()
+
+
+async def _wait_sse(client, base, task_id, interval, wait):
+    async with client.stream("GET", f"{base}/convert/task/{task_id}/events") as resp:
+        async for line in resp.aiter_lines():
+            if line.startswith("data: ") and json.loads(line[6:])["state"] == "finished":
+                return time.perf_counter()
+
+
+async def _wait_ws(client, base, task_id, interval, wait):
+    async with websockets.connect(f"ws{base[4:]}/convert/task/{task_id}/ws") as ws:
+        async for message in ws:
+            if json.loads(message).get("state") == "finished":
+                return time.perf_counter()
+
+
+async def _run(mode, waiter, base, clients, duration, interval, wait):
+    global requests_served
+    requests_served = 0
+    tasks = []
+    for i in range(clients):
+        task = ConvertTask(
+            id=f"{mode}{i}",
+            category=Category.DOCUMENT,
+            target="pdf",
+            source="docx",
+            input_path=f"uploads/{mode}{i}.docx",
+        )
+        await task_manager.create_task(task)
+        tasks.append(task)
+
+    finished_at = {}
+
+    async def finish(task):
+        await asyncio.sleep(random.uniform(0.5, duration))
+        task.state = TaskState.FINISHED
+        await task_manager.update_task(task, "state")
+        finished_at[task.id] = time.perf_counter()
+
+    limits = httpx.Limits(max_connections=clients + 10)
+
+    async def join(client, task):
+        # 客户端在一个轮询间隔内陆续到达，不同时建立连接
+        await asyncio.sleep(random.uniform(0, min(interval, 0.4)))
+        return await waiter(client, base, task.id, interval, wait)
+
+    async with httpx.AsyncClient(limits=limits, timeout=duration + 30) as client:
+        waiters = [join(client, task) for task in tasks]
+        noticed = await asyncio.gather(*waiters, *[finish(task) for task in tasks])
+
+    latencies = sorted(
+        max(seen - finished_at[task.id], 0) for task, seen in zip(tasks, noticed[:clients])
+    )
+    connections = clients if mode == "ws" else requests_served
+    unit = "个 WebSocket 连接" if mode == "ws" else "个 HTTP 请求"
+    return (
+        f"  {mode:>4}: {connections:6d} {unit}, 通知延迟 "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms, "
+        f"最大 {latencies[-1] * 1000:7.1f} ms"
+    )
+
+
+async def run(args) -> None:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    base = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    config = uvicorn.Config(_app(), log_level="warning", access_log=False, lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    print(
+        f"{args.clients} 个客户端, 任务在 {args.duration} 秒内随机完成, 轮询间隔 {args.interval} 秒"
+    )
+    try:
+        # 路由中逐次打印查询日志，计时期间丢弃输出
+        modes = (("poll", _wait_poll), ("long", _wait_long), ("sse", _wait_sse), ("ws", _wait_ws))
+        for mode, waiter in modes:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = await _run(
+                    mode, waiter, base, args.clients, args.duration, args.interval, args.wait
+                )
+            print(result)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务完成通知负载测试")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10.0, help="任务完成时间范围（秒）")
+    parser.add_argument("--interval", type=float, default=1.0, help="轮询间隔（秒）")
+    parser.add_argument("--wait", type=float, default=25.0, help="长轮询等待时间（秒）")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+内存任务管理器基准测试：__slots__ 记录 + 有序索引 vs 改造前的 ConvertTask 字典
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_task_memory.py --tasks 1000000
+
+每种实现在独立子进程中写入相同数量的已完成任务，输出常驻内存增量、
+每个任务占用的字节数，以及获取过期任务（无过期任务时）和统计的耗时。
+改造前的实现 100 万任务约需 2GB 内存，内存不足时减小 --tasks。
+"""
+
+import argparse
+import asyncio
+import gc
+import multiprocessing
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import psutil
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.models import Category, ConvertTask, TaskState  # noqa: E402
+from app.routers.convert import mark_task_finished  # noqa: E402
+from app.utils.task_manager import MemoryTaskManager  # noqa: E402
+
+
+class LegacyMemoryTaskManager:
+    """改造前的实现：pydantic 对象字典，过期和统计都遍历全部任务"""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def create_task(self, task):
+        self._tasks[task.id] = task
+
+    async def get_expired_tasks(self, expire_time):
+        now = datetime.now()
+        return [
+            t for t in self._tasks.values() if (now - t.created_at).total_seconds() > expire_time
+        ]
+
+    async def get_stats(self):
+        tasks = list(self._tasks.values())
+        return {state.value: sum(1 for t in tasks if t.state == state) for state in TaskState}
+
+
+def _task(i: int) -> ConvertTask:
+    task_id = f"{i:021d}"
+    task = ConvertTask(
+        id=task_id,
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path=f"uploads/{task_id}.docx",
+        original_filename=f"报告_{i}",
+        content_hash=f"{i:064x}",
+        started_at=datetime.now(),
+        queue_wait_ms=12,
+    )
+    mark_task_finished(task, Path(f"public/报告_{i}_2510161230.pdf"))
+    return task
+
+
+async def _fill_and_measure(label: str, tasks: int, queue) -> None:
+    manager = LegacyMemoryTaskManager() if label == "legacy" else MemoryTaskManager(tasks)
+    gc.collect()
+    rss_before = psutil.Process().memory_info().rss
+
+    start = time.perf_counter()
+    for i in range(tasks):
+        await manager.create_task(_task(i))
+    fill = time.perf_counter() - start
+
+    gc.collect()
+    rss = psutil.Process().memory_info().rss - rss_before
+
+    start = time.perf_counter()
+    await manager.get_expired_tasks(3600)
+    expire = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await manager.get_stats()
+    stats = time.perf_counter() - start
+
+    queue.put((label, rss, fill, expire, stats))
+
+
+def _child(label: str, tasks: int, queue) -> None:
+    asyncio.run(_fill_and_measure(label, tasks, queue))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="内存任务管理器基准测试")
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"{args.tasks} 个已完成任务")
+    queue = multiprocessing.Queue()
+    for label in ("legacy", "slots"):
+        process = multiprocessing.Process(target=_child, args=(label, args.tasks, queue))
+        process.start()
+        label, rss, fill, expire, stats = queue.get()
+        process.join()
+        print(
+            f"  {label:>6}: 内存 {rss / 1024 / 1024:7.1f} MB "
+            f"({rss / args.tasks:6.0f} B/任务), 写入 {fill:6.2f} s, "
+            f"过期检查 {expire * 1000:8.2f} ms, 统计 {stats * 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
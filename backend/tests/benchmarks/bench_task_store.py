@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+任务状态轮询基准测试：异步 Hash 存储（含本地缓存）vs 改造前的同步 JSON 存储
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_task_store.py --tasks 1000 --pollers 50 --polls 200
+    python tests/benchmarks/bench_task_store.py --redis-url redis://localhost:6379/15
+
+大量客户端并发轮询 GET /convert/task/{id}，同时有任务在更新状态，
+输出轮询吞吐、轮询延迟（p50 / p99）和单次更新耗时。
+同时记录事件循环的最大阻塞时间：同步客户端等待 Redis 回复期间，
+同一进程内的上传、下载等其他请求都无法被处理。
+cached 为开启本地缓存的异步存储，额外输出缓存命中率和实际发往 Redis 的读取次数。
+
+未指定 --redis-url 时在独立进程中启动 fakeredis 的 TCP 服务代替 Redis，
+前置代理模拟 --rtt-ms 的网络往返（fakeredis 为 Python 实现，
+吞吐远低于真实 Redis，绝对数值仅用于对比两种实现）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import socket
+import statistics
+import multiprocessing
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import redis
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from app.models import Category, ConvertTask, TaskState  # noqa: E402
+from app.routers import convert as convert_router  # noqa: E402
+from app.utils.task_manager import RedisTaskManager  # noqa: E402
+
+
+def legacy_task_dict(task: ConvertTask) -> dict:
+    """改造前的任务字典（JSON 字符串和 v1 Hash 都按此编码）"""
+    return {
+        "id": task.id,
+        "state": task.state.value,
+        "category": task.category.value,
+        "target": task.target,
+        "source": task.source,
+        "input_path": task.input_path,
+        "output_path": task.output_path,
+        "original_filename": task.original_filename,
+        "content_hash": task.content_hash,
+        "started_at": task.started_at.isoformat() if task.started_at else None,
+        "queue_wait_ms": task.queue_wait_ms,
+        "url": task.url,
+        "download_url": task.download_url,
+        "preview_url": task.preview_url,
+        "error": task.error,
+        "created_at": task.created_at.isoformat() if task.created_at else None,
+        "updated_at": task.updated_at.isoformat() if task.updated_at else None,
+    }
+
+
+class LegacyRedisTaskManager(RedisTaskManager):
+    """改造前的实现：同步客户端，整个任务序列化为 JSON，更新时 TTL + SETEX 两次往返"""
+
+    def __init__(self, sync_client):
+        super().__init__("redis://localhost:6379/0")
+        self._sync = sync_client
+        self._prefix = "bench:legacy:"
+
+    async def create_task(self, task):
+        data = json.dumps(legacy_task_dict(task), ensure_ascii=False)
+        self._sync.set(f"{self._prefix}{task.id}", data, ex=self._ttl)
+
+    async def get_task(self, task_id):
+        data = self._sync.get(f"{self._prefix}{task_id}")
+        return self._dict_to_task(json.loads(data)) if data else None
+
+    async def update_task(self, task, *fields):
+        task.updated_at = datetime.now()
+        key = f"{self._prefix}{task.id}"
+        ttl = self._sync.ttl(key)
+        if ttl < 0:
+            ttl = self._ttl
+        self._sync.set(key, json.dumps(legacy_task_dict(task), ensure_ascii=False), ex=ttl)
+
+
+async def _delay_proxy(upstream_port: int, rtt: float, port_queue) -> None:
+    """转发到 fakeredis 的 TCP 代理，每个方向延迟 rtt/2，模拟网络往返"""
+    loop = asyncio.get_running_loop()
+
+    async def pump(reader, writer):
+        while data := await reader.read(65536):
+            # 相同延迟的 call_later 按调度顺序执行，数据不会乱序
+            loop.call_later(rtt / 2, writer.write, data)
+        loop.call_later(rtt / 2, writer.close)
+
+    async def handle(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection("127.0.0.1", upstream_port)
+        await asyncio.gather(pump(client_reader, server_writer), pump(server_reader, client_writer))
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port_queue.put(server.sockets[0].getsockname()[1])
+    await server.serve_forever()
+
+
+def _serve_fake_redis(rtt: float, port_queue) -> None:
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", 0))
+    # fakeredis 逐条写回复，关闭 Nagle（accept 的连接继承该选项），与真实 Redis 一致
+    server.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    asyncio.run(_delay_proxy(server.server_address[1], rtt, port_queue))
+
+
+def _start_fake_server(rtt: float) -> str:
+    """
+    在独立进程中启动 fakeredis TCP 服务（前置模拟网络往返延迟的代理），
+    两种实现都经过真实的 socket 往返
+    """
+    port_queue = multiprocessing.Queue()
+    multiprocessing.Process(target=_serve_fake_redis, args=(rtt, port_queue), daemon=True).start()
+    return f"redis://127.0.0.1:{port_queue.get(timeout=10)}/0"
+
+
+def _task(i: int) -> ConvertTask:
+    return ConvertTask(
+        id=f"bench{i}",
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path=f"/tmp/bench{i}.docx",
+        original_filename=f"基准测试文档_{i}",
+    )
+
+
+async def _run(label, manager, tasks, pollers, polls, updaters):
+    for task in tasks:
+        await manager.create_task(task)
+    convert_router.task_manager = manager
+
+    latencies, update_times = [], []
+    # 只挂载转换路由，不经过限流中间件
+    app = FastAPI()
+    app.include_router(convert_router.router, prefix="/convert")
+    transport = httpx.ASGITransport(app=app)
+
+    async def poll(client):
+        for _ in range(polls):
+            task_id = random.choice(tasks).id
+            start = time.perf_counter()
+            resp = await client.get(f"/convert/task/{task_id}")
+            latencies.append(time.perf_counter() - start)
+            assert resp.status_code == 200
+
+    async def update():
+        for _ in range(polls):
+            task = random.choice(tasks)
+            task.state = random.choice([TaskState.PROCESSING, TaskState.FINISHED])
+            task.url = f"/public/{task.id}.pdf"
+            start = time.perf_counter()
+            await manager.update_task(task, "state", "url")
+            update_times.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    lags = [0.0]
+
+    async def watch_loop():
+        # 每 1ms 醒来一次，记录实际醒来时间比预期晚了多久
+        while True:
+            expected = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - expected)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        watcher = asyncio.create_task(watch_loop())
+        # 路由中逐次打印查询日志，计时期间丢弃输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            await asyncio.gather(
+                *[poll(client) for _ in range(pollers)], *[update() for _ in range(updaters)]
+            )
+            elapsed = time.perf_counter() - start
+        watcher.cancel()
+
+    latencies.sort()
+    print(
+        f"  {label:>6}: {len(latencies) / elapsed:8.0f} 次轮询/秒, "
+        f"p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms, "
+        f"更新 p50 {statistics.median(update_times) * 1000:6.2f} ms, "
+        f"事件循环最大阻塞 {max(lags) * 1000:6.1f} ms"
+    )
+
+
+async def run(args) -> None:
+    redis_url = args.redis_url or _start_fake_server(args.rtt_ms / 1000)
+    sync_client = redis.from_url(redis_url, decode_responses=True)
+    tasks = [_task(i) for i in range(args.tasks)]
+
+    legacy = LegacyRedisTaskManager(sync_client)
+    current = RedisTaskManager(redis_url)
+    current._prefix = "bench:hash:"
+    cached = RedisTaskManager(redis_url)
+    cached._prefix = "bench:cached:"
+
+    print(
+        f"{args.tasks} 个任务, {args.pollers} 个轮询客户端 x {args.polls} 次, "
+        f"{args.updaters} 个更新协程"
+    )
+    try:
+        await _run("legacy", legacy, tasks, args.pollers, args.polls, args.updaters)
+        await _run("async", current, tasks, args.pollers, args.polls, args.updaters)
+
+        await cached.start()
+        while not cached._cache.enabled:
+            await asyncio.sleep(0.01)
+        await _run("cached", cached, tasks, args.pollers, args.polls, args.updaters)
+        stats = cached.get_cache_stats()
+        print(
+            f"          缓存命中率 {stats['hitRate']:.1%}, "
+            f"Redis 读取 {stats['misses']} / {args.pollers * args.polls} 次轮询, "
+            f"失效通知 {stats['invalidations']} 次"
+        )
+    finally:
+        for prefix in ("bench:legacy:*", "bench:hash:*", "bench:cached:*"):
+            keys = list(sync_client.scan_iter(prefix, count=1000))
+            if keys:
+                sync_client.delete(*keys)
+        await current.close()
+        await cached.close()
+        sync_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务状态轮询基准测试")
+    parser.add_argument("--redis-url", default="", help="默认启动 fakeredis TCP 服务")
+    parser.add_argument(
+        "--rtt-ms", type=float, default=1.0, help="fakeredis 模拟的网络往返延迟（毫秒）"
+    )
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--pollers", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--updaters", type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
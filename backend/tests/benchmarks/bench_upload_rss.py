@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+上传内存基准测试：N 个并发大文件上传时服务进程的峰值 RSS
+
+用法（在 backend 目录下）:
+    python tests/benchmarks/bench_upload_rss.py --concurrency 8 --size-mb 100
+
+启动一个独立的 uvicorn 服务进程，并发上传 N 个 size-mb 大小的文件，
+同时以 50ms 间隔采样服务进程（含子进程）的 RSS，输出基线与峰值。
+上传使用 txt -> mp3 这一不支持的转换：文件会被完整写入 UPLOAD_DIR，
+随后在校验阶段被拒绝并删除，只测量上传路径本身，不触发实际转换。
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+import psutil
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+CHUNK = b"0123456789abcdef" * 4096  # 64KB
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _tree_rss(proc: psutil.Process) -> int:
+    total = 0
+    for p in [proc, *proc.children(recursive=True)]:
+        try:
+            total += p.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+async def _payload(size: int):
+    sent = 0
+    while sent < size:
+        chunk = CHUNK[: min(len(CHUNK), size - sent)]
+        sent += len(chunk)
+        yield chunk
+
+
+async def _upload(session: aiohttp.ClientSession, url: str, size: int) -> int:
+    form = aiohttp.FormData()
+    form.add_field("category", "document")
+    form.add_field("target", "mp3")
+    form.add_field(
+        "file", _payload(size), filename="bench.txt", content_type="application/octet-stream"
+    )
+    async with session.post(url, data=form) as resp:
+        await resp.read()
+        return resp.status
+
+
+async def _sample(proc: psutil.Process, stop: asyncio.Event, peaks: list) -> None:
+    while not stop.is_set():
+        peaks[0] = max(peaks[0], _tree_rss(proc))
+        await asyncio.sleep(0.05)
+
+
+async def run(concurrency: int, size_mb: int) -> None:
+    port = _free_port()
+    workdir = Path(tempfile.mkdtemp(prefix="bench_upload_"))
+    env = {
+        **os.environ,
+        "UPLOAD_DIR": str(workdir / "uploads"),
+        "PUBLIC_DIR": str(workdir / "public"),
+    }
+    (workdir / "uploads").mkdir()
+    (workdir / "public").mkdir()
+
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "error",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None)) as session:
+            for _ in range(100):
+                try:
+                    async with session.get(f"{base_url}/health") as resp:
+                        if resp.status == 200:
+                            break
+                except aiohttp.ClientError:
+                    await asyncio.sleep(0.1)
+
+            proc = psutil.Process(server.pid)
+            baseline = _tree_rss(proc)
+            peaks = [baseline]
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(_sample(proc, stop, peaks))
+
+            size = size_mb * 1024 * 1024
+            start = time.perf_counter()
+            statuses = await asyncio.gather(
+                *[_upload(session, f"{base_url}/convert/upload", size) for _ in range(concurrency)]
+            )
+            elapsed = time.perf_counter() - start
+            stop.set()
+            await sampler
+
+        mb = 1024 * 1024
+        print(f"并发数: {concurrency}, 单文件: {size_mb}MB, 状态码: {sorted(set(statuses))}")
+        print(f"耗时: {elapsed:.2f}s, 吞吐: {concurrency * size_mb / elapsed:.1f} MB/s")
+        print(f"基线 RSS: {baseline / mb:.1f} MB")
+        print(f"峰值 RSS: {peaks[0] / mb:.1f} MB (增量 {(peaks[0] - baseline) / mb:.1f} MB)")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发上传峰值 RSS 基准测试")
+    parser.add_argument("--concurrency", "-n", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency, args.size_mb))
+
+
+if __name__ == "__main__":
+    main()
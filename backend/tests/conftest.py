@@ -3,6 +3,7 @@ from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
+from nanoid import generate as nanoid
 
 # Ensure backend/app is importable
 BASE_DIR = Path(__file__).resolve().parents[1]
@@ -11,21 +12,32 @@ sys.path.insert(0, str(BASE_DIR))
 sys.path.insert(0, str(APP_DIR))
 
 from app.config import settings  # noqa: E402
+from app.models import Category, ConvertTask  # noqa: E402
 
 TMP_UPLOAD = None
 TMP_PUBLIC = None
+TMP_CACHE = None
+TMP_INPUT_CACHE = None
+TMP_SCRATCH = None
 
 
 def _prepare_temp_dirs(tmp_path_factory):
-    global TMP_UPLOAD, TMP_PUBLIC
+    global TMP_UPLOAD, TMP_PUBLIC, TMP_CACHE, TMP_INPUT_CACHE, TMP_SCRATCH
     base_tmp = tmp_path_factory.mktemp("be_tmp")
     TMP_UPLOAD = base_tmp / "uploads"
     TMP_PUBLIC = base_tmp / "public"
+    TMP_CACHE = base_tmp / "cache"
+    TMP_INPUT_CACHE = base_tmp / "input_cache"
+    TMP_SCRATCH = base_tmp / "scratch"
     TMP_UPLOAD.mkdir(parents=True, exist_ok=True)
     TMP_PUBLIC.mkdir(parents=True, exist_ok=True)
+    TMP_CACHE.mkdir(parents=True, exist_ok=True)
     # Patch settings to point to temp dirs
     setattr(settings, "UPLOAD_DIR", str(TMP_UPLOAD))
     setattr(settings, "PUBLIC_DIR", str(TMP_PUBLIC))
+    setattr(settings, "RESULT_CACHE_DIR", str(TMP_CACHE))
+    setattr(settings, "INPUT_CACHE_DIR", str(TMP_INPUT_CACHE))
+    setattr(settings, "SCRATCH_DIR", str(TMP_SCRATCH))
     setattr(settings, "CLEANUP_INTERVAL", 1)
 
 
@@ -49,6 +61,8 @@ def setup_dirs(monkeypatch):
     """Per-test: keep settings pointing to session temp dirs."""
     monkeypatch.setattr(settings, "UPLOAD_DIR", str(TMP_UPLOAD))
     monkeypatch.setattr(settings, "PUBLIC_DIR", str(TMP_PUBLIC))
+    monkeypatch.setattr(settings, "RESULT_CACHE_DIR", str(TMP_CACHE))
+    monkeypatch.setattr(settings, "INPUT_CACHE_DIR", str(TMP_INPUT_CACHE))
     monkeypatch.setattr(settings, "CLEANUP_INTERVAL", 1)
     yield
 
@@ -57,3 +71,25 @@ def setup_dirs(monkeypatch):
 def client():
     assert app is not None, "FastAPI app not initialized"
     return TestClient(app)
+
+
+@pytest.fixture()
+def make_task(tmp_path):
+    """
+    创建转换任务的工厂：make_task(分类, 源格式, 目标格式, size=输入字节数)
+
+    未指定 input_path 时在 tmp_path 下写入 size 字节的输入文件
+    """
+
+    def make(
+        category: Category, source: str, target: str, size: int = 1, input_path: str = None
+    ) -> ConvertTask:
+        if input_path is None:
+            path = tmp_path / f"{nanoid()}.{source}"
+            path.write_bytes(b"x" * size)
+            input_path = str(path)
+        return ConvertTask(
+            id=nanoid(), category=category, source=source, target=target, input_path=input_path
+        )
+
+    return make
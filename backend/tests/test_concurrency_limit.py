@@ -0,0 +1,170 @@
+"""
+自适应并发上限测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.models import Category
+from app.utils.concurrency_limit import MIN_LATENCY_SAMPLES, AdaptiveConcurrencyLimiter
+from app.utils.scheduler import JobScheduler
+
+IDLE = {"cpuPercent": 20.0, "memoryAvailablePercent": 60.0}
+BUSY = {"cpuPercent": 97.0, "memoryAvailablePercent": 60.0}
+
+
+@pytest.fixture(autouse=True)
+def bounds(monkeypatch):
+    monkeypatch.setattr(settings, "ADAPTIVE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "MAX_CONCURRENT", 2)
+    monkeypatch.setattr(settings, "ADAPTIVE_LIMIT_MIN", 1)
+    monkeypatch.setattr(settings, "ADAPTIVE_LIMIT_MAX", 4)
+
+
+def test_increases_only_when_saturated_with_queue():
+    limiter = AdaptiveConcurrencyLimiter()
+    assert limiter.limit == 2
+
+    assert not limiter.adjust(running=1, queued=0, signals=IDLE)
+    assert limiter.get_status()["lastDecision"]["action"] == "hold"
+
+    assert limiter.adjust(running=2, queued=3, signals=IDLE)
+    assert limiter.limit == 3
+    # CPU 未低于目标值时不增大
+    assert not limiter.adjust(running=3, queued=3, signals={**IDLE, "cpuPercent": 80.0})
+
+
+def test_respects_ceiling_and_floor():
+    limiter = AdaptiveConcurrencyLimiter()
+    for _ in range(5):
+        limiter.adjust(running=limiter.limit, queued=5, signals=IDLE)
+    assert limiter.limit == 4
+    assert "已达上下限" in limiter.get_status()["lastDecision"]["reason"]
+
+    for _ in range(5):
+        limiter.adjust(running=limiter.limit, queued=5, signals=BUSY)
+    assert limiter.limit == 1
+
+    status = limiter.get_status()
+    assert (status["floor"], status["ceiling"]) == (1, 4)
+    # 最近的决策在前，保持不变也记录，连续相同的保持合并计数
+    decisions = [(d["action"], d["from"], d["to"], d["count"]) for d in status["decisions"]]
+    assert decisions == [
+        ("hold", 1, 1, 2),
+        ("decrease", 2, 1, 1),
+        ("decrease", 3, 2, 1),
+        ("decrease", 4, 3, 1),
+        ("hold", 4, 4, 3),
+        ("increase", 3, 4, 1),
+        ("increase", 2, 3, 1),
+    ]
+    assert status["lastDecision"] is status["decisions"][0]
+
+
+def test_idle_holds_do_not_evict_adjustments():
+    limiter = AdaptiveConcurrencyLimiter()
+    limiter.adjust(running=2, queued=3, signals=IDLE)
+    for _ in range(500):
+        limiter.adjust(running=0, queued=0, signals=IDLE)
+    decisions = limiter.get_status()["decisions"]
+    assert [(d["action"], d["count"]) for d in decisions] == [("hold", 500), ("increase", 1)]
+
+
+def test_memory_pressure_decreases():
+    limiter = AdaptiveConcurrencyLimiter()
+    assert limiter.adjust(running=2, queued=0, signals={**IDLE, "memoryAvailablePercent": 5.0})
+    assert limiter.limit == 1
+    assert "可用内存" in limiter.get_status()["decisions"][0]["reason"]
+
+
+def test_latency_growth_decreases():
+    limiter = AdaptiveConcurrencyLimiter()
+    limiter.limit = 4
+    for _ in range(MIN_LATENCY_SAMPLES * 4):
+        limiter.record_latency("python", 1.0, 100)
+    assert not limiter.adjust(running=4, queued=0, signals=IDLE)
+
+    # 每 MB 耗时：10MB 用 60 秒，明显高于此前的 1 秒
+    for _ in range(3):
+        limiter.record_latency("python", 60.0, 10 * 1024 * 1024)
+    assert limiter.latency_ratio() >= settings.ADAPTIVE_LATENCY_TOLERANCE
+    assert limiter.adjust(running=4, queued=0, signals=IDLE)
+    assert limiter.limit == 3
+    # 减小后重新积累短期延迟，不会连续减小
+    assert not limiter.adjust(running=3, queued=0, signals=IDLE)
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_CATEGORY_LIMITS", {"document": 4, "image": 4})
+    monkeypatch.setattr(settings, "SCHEDULER_ENGINE_LIMITS", {"libreoffice": 4, "python": 4})
+    monkeypatch.setattr(settings, "MEMORY_ADMISSION_ENABLED", False)
+
+
+async def test_scheduler_applies_limit(monkeypatch, pools, make_task):
+    monkeypatch.setattr(settings, "MAX_CONCURRENT", 1)
+    scheduler = JobScheduler()
+    release = asyncio.Event()
+    started = []
+
+    async def run(task):
+        async with scheduler.slot(task):
+            started.append(task.id)
+            await release.wait()
+
+    tasks = [make_task(Category.DOCUMENT, "docx", "pdf") for _ in range(2)]
+    runs = [asyncio.create_task(run(task)) for task in tasks]
+    await asyncio.sleep(0.01)
+    assert len(started) == 1
+    assert scheduler.get_stats()["limits"]["total"] == 1
+
+    # 排队且 CPU 空闲：上限加 1 后立即放行等待的任务
+    monkeypatch.setattr(settings, "ADAPTIVE_LIMIT_INTERVAL", 0.01)
+    monkeypatch.setattr(scheduler.limiter, "sample", lambda: dict(IDLE))
+    await scheduler.start()
+    try:
+        for _ in range(100):
+            if len(started) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert len(started) == 2
+        assert scheduler.limiter.limit == 2
+    finally:
+        await scheduler.close()
+        release.set()
+        await asyncio.gather(*runs)
+    assert scheduler.limiter.get_status()["latency"]["libreoffice"]["samples"] == 2
+
+
+async def test_image_not_blocked_by_document_limit(pools, make_task):
+    scheduler = JobScheduler()
+    assert scheduler.limiter.limit == 2
+    release = asyncio.Event()
+    started = []
+
+    async def run(task):
+        async with scheduler.slot(task):
+            started.append(task.category)
+            await release.wait()
+
+    # 两个文档任务占满上限，第三个文档排队，图片任务不受上限限制
+    runs = [asyncio.create_task(run(make_task(Category.DOCUMENT, "docx", "pdf"))) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    runs.append(asyncio.create_task(run(make_task(Category.IMAGE, "png", "jpg"))))
+    await asyncio.sleep(0.01)
+    assert started == [Category.DOCUMENT, Category.DOCUMENT, Category.IMAGE]
+    assert scheduler.get_stats()["queued"]["document"] == 1
+
+    release.set()
+    await asyncio.gather(*runs)
+    assert len(started) == 4
+
+
+def test_concurrency_endpoint(client):
+    resp = client.get("/server-status/concurrency")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["floor"] <= data["limit"] <= data["ceiling"]
+    assert {"decisions", "lastDecision", "running", "queued", "categories"} <= set(data)
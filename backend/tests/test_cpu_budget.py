@@ -0,0 +1,112 @@
+"""
+CPU 预算协调器测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.models import Category, ConvertTask
+from app.utils.cpu_budget import CpuBudgetCoordinator, cpu_budget
+from app.utils.scheduler import JobScheduler, is_parallel
+from app.utils.worker_pool import PythonWorkerPool
+
+SCRIPT = """
+import os
+
+
+def main():
+    print(f"threads={os.environ.get('CONVERT_THREADS')}")
+"""
+
+
+@pytest.fixture(autouse=True)
+def cores(monkeypatch):
+    monkeypatch.setattr(settings, "CPU_BUDGET_CORES", 8)
+
+
+def test_lone_job_gets_all_cores():
+    budget = CpuBudgetCoordinator()
+    assert budget.allocate({"a": True}) == {"a": 8}
+    budget.release("a")
+    assert budget.allocated == 0
+
+
+def test_pending_jobs_reserve_share():
+    budget = CpuBudgetCoordinator()
+    assert budget.allocate({"a": True}, pending=3) == {"a": 2}
+
+
+def test_disabled_grants_all_cores(monkeypatch):
+    monkeypatch.setattr(settings, "CPU_BUDGET_ENABLED", False)
+    budget = CpuBudgetCoordinator()
+    assert budget.allocate({"a": True, "b": True, "c": False}) == {"a": 8, "b": 8, "c": 1}
+
+
+def test_batch_shares_cores():
+    budget = CpuBudgetCoordinator()
+    assert budget.allocate({"a": True, "b": True, "c": False}) == {"a": 2, "b": 2, "c": 1}
+    assert budget.allocated == 5
+
+
+def test_later_job_gets_remaining_cores():
+    budget = CpuBudgetCoordinator()
+    budget.allocate({"a": False, "b": False})
+    # 两个单线程任务占用 2 个核，新任务最多按 3 个运行任务平分
+    assert budget.allocate({"c": True}) == {"c": 2}
+    # 核数已分完时仍至少 1 个线程
+    budget.allocate({"d": True, "e": True, "f": True})
+    assert budget.allocate({"g": True}) == {"g": 1}
+    budget.release("c")
+    assert budget.allocated == 6
+
+
+def test_is_parallel():
+    def task(category, source, target):
+        return ConvertTask(id="t", category=category, source=source, target=target, input_path="")
+
+    assert is_parallel(task(Category.AUDIO, "wav", "mp3"))
+    assert is_parallel(task(Category.DOCUMENT, "pdf", "docx"))
+    assert is_parallel(task(Category.DOCUMENT, "pdf", "pptx"))
+    assert not is_parallel(task(Category.DOCUMENT, "txt", "docx"))
+    assert not is_parallel(task(Category.DOCUMENT, "docx", "pdf"))
+    assert not is_parallel(task(Category.IMAGE, "png", "jpg"))
+
+
+async def test_scheduler_grants_budget_to_running_jobs(monkeypatch, make_task):
+    monkeypatch.setattr(settings, "SCHEDULER_CATEGORY_LIMITS", {"document": 2})
+    monkeypatch.setattr(settings, "SCHEDULER_ENGINE_LIMITS", {"python": 2})
+    scheduler = JobScheduler()
+    release = asyncio.Event()
+    seen = []
+
+    async def run(task):
+        async with scheduler.slot(task) as job:
+            seen.append((job.threads, cpu_budget.current()))
+            await release.wait()
+
+    tasks = [make_task(Category.DOCUMENT, "pdf", "docx") for _ in range(2)]
+    for task in tasks:
+        scheduler.enqueue(task)
+    # 两个任务都已入队：先开始的任务为另一个预留份额，两者平分 8 个核
+    runs = [asyncio.create_task(run(task)) for task in tasks]
+    await asyncio.sleep(0.05)
+    assert seen == [(4, 4), (4, 4)]
+    assert cpu_budget.allocated == sum(threads for threads, _ in seen)
+
+    release.set()
+    await asyncio.gather(*runs)
+    assert cpu_budget.allocated == 0
+
+
+async def test_worker_receives_budget(tmp_path):
+    script = tmp_path / "fake_budget.py"
+    script.write_text(SCRIPT)
+    pool = PythonWorkerPool()
+    try:
+        code, stdout, _ = await pool.run(script, [], 30, threads=3)
+        assert code == 0
+        assert "threads=3" in stdout
+    finally:
+        await pool.close()
@@ -0,0 +1,169 @@
+"""
+远程下载器测试（本地 aiohttp 服务器模拟云存储源站）
+"""
+
+import hashlib
+import os
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.config import settings
+from app.utils.downloader import DownloadError, RemoteDownloader, split_ranges
+from app.utils.file_utils import FileTooLargeError
+
+PAYLOAD = bytes(range(256)) * 4096  # 1MB
+
+
+async def _fixed(request):
+    return web.Response(body=PAYLOAD)
+
+
+async def _chunked(request):
+    resp = web.StreamResponse()
+    resp.enable_chunked_encoding()
+    await resp.prepare(request)
+    for _ in range(8):
+        await resp.write(PAYLOAD)
+    await resp.write_eof()
+    return resp
+
+
+async def _missing(request):
+    return web.Response(status=404)
+
+
+@pytest.fixture()
+async def origin():
+    app = web.Application()
+    app.router.add_get("/file.pdf", _fixed)
+    app.router.add_get("/chunked.pdf", _chunked)
+    app.router.add_get("/missing.pdf", _missing)
+    server = TestServer(app)
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest.fixture()
+async def downloader():
+    instance = RemoteDownloader()
+    await instance.start()
+    yield instance
+    await instance.close()
+
+
+async def test_download_writes_file_and_hash(origin, downloader, tmp_path):
+    dest = tmp_path / "file.pdf"
+    hasher = hashlib.sha256()
+    result = await downloader.download(str(origin.make_url("/file.pdf")), dest, 10**8, hasher)
+
+    assert result.size == len(PAYLOAD)
+    assert dest.read_bytes() == PAYLOAD
+    assert hasher.hexdigest() == hashlib.sha256(PAYLOAD).hexdigest()
+
+
+async def test_download_rejects_by_content_length(origin, downloader, tmp_path):
+    dest = tmp_path / "file.pdf"
+    with pytest.raises(FileTooLargeError):
+        await downloader.download(str(origin.make_url("/file.pdf")), dest, 1024)
+    assert not dest.exists()
+
+
+async def test_download_enforces_running_cap_without_length(origin, downloader, tmp_path):
+    dest = tmp_path / "chunked.pdf"
+    with pytest.raises(FileTooLargeError):
+        await downloader.download(str(origin.make_url("/chunked.pdf")), dest, 3 * len(PAYLOAD))
+    assert not dest.exists()
+
+
+async def test_download_http_error(origin, downloader, tmp_path):
+    with pytest.raises(DownloadError):
+        await downloader.download(str(origin.make_url("/missing.pdf")), tmp_path / "x.pdf", 10**8)
+
+
+async def test_session_is_reused(origin, downloader, tmp_path):
+    await downloader.download(str(origin.make_url("/file.pdf")), tmp_path / "a.pdf", 10**8)
+    session = downloader._session
+    await downloader.download(str(origin.make_url("/file.pdf")), tmp_path / "b.pdf", 10**8)
+    assert downloader._session is session
+
+
+def test_split_ranges():
+    assert split_ranges(0, 10, 3) == [(0, 4), (4, 4), (8, 2)]
+    assert split_ranges(5, 5, 3) == []
+    assert split_ranges(0, 2, 4) == [(0, 1), (1, 1)]
+
+
+@pytest.fixture()
+async def range_origin(tmp_path):
+    """支持 Range 的源站（web.FileResponse），记录收到的 Range 头"""
+    big_file = tmp_path / "big.bin"
+    big_file.write_bytes(os.urandom(10 * 1024 * 1024))
+    seen_ranges = []
+
+    async def handler(request):
+        seen_ranges.append(request.headers.get("Range"))
+        return web.FileResponse(big_file)
+
+    app = web.Application()
+    app.router.add_get("/big.bin", handler)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, big_file, seen_ranges
+    await server.close()
+
+
+async def test_ranged_download_matches_source(range_origin, downloader, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DOWNLOAD_RANGE_MIN_SIZE_MB", 1)
+    monkeypatch.setattr(settings, "DOWNLOAD_RANGE_CONCURRENCY", 4)
+    server, big_file, seen_ranges = range_origin
+
+    dest = tmp_path / "out.bin"
+    hasher = hashlib.sha256()
+    result = await downloader.download(str(server.make_url("/big.bin")), dest, 10**8, hasher)
+
+    data = big_file.read_bytes()
+    assert result.size == len(data)
+    assert result.etag
+    assert dest.read_bytes() == data
+    assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+    assert len(seen_ranges) == 5  # 首段 + 剩余部分均分 4 段
+    assert all(r and r.startswith("bytes=") for r in seen_ranges)
+
+
+async def test_ranged_download_rejects_oversize_total(
+    range_origin, downloader, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "DOWNLOAD_RANGE_MIN_SIZE_MB", 1)
+    server, _, seen_ranges = range_origin
+
+    dest = tmp_path / "out.bin"
+    with pytest.raises(FileTooLargeError):
+        await downloader.download(str(server.make_url("/big.bin")), dest, 5 * 1024 * 1024)
+    assert not dest.exists()
+    assert len(seen_ranges) == 1
+
+
+async def test_single_stream_when_concurrency_is_one(
+    range_origin, downloader, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(settings, "DOWNLOAD_RANGE_CONCURRENCY", 1)
+    server, big_file, seen_ranges = range_origin
+
+    dest = tmp_path / "out.bin"
+    await downloader.download(str(server.make_url("/big.bin")), dest, 10**8)
+    assert dest.read_bytes() == big_file.read_bytes()
+    assert seen_ranges == [None]
+
+
+async def test_conditional_request_not_modified(range_origin, downloader, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DOWNLOAD_RANGE_MIN_SIZE_MB", 1)
+    server, big_file, _ = range_origin
+    url = str(server.make_url("/big.bin"))
+
+    first = await downloader.download(url, tmp_path / "a.bin", 10**8)
+    again = await downloader.download(url, tmp_path / "b.bin", 10**8, etag=first.etag)
+    assert again.not_modified
+    assert not (tmp_path / "b.bin").exists()
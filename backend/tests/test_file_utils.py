@@ -15,3 +15,42 @@ def test_detect_ext_by_name():
 def test_build_public_url(settings=__import__("app.config", fromlist=["settings"]).settings):
     base = settings.PUBLIC_BASE_URL.rstrip("/")
     assert build_public_url("/preview/abc.pdf").startswith(base)
+
+
+def test_scratch_dir_is_isolated_and_removed():
+    from app.utils.file_utils import scratch_dir
+
+    with scratch_dir() as a, scratch_dir() as b:
+        assert a != b
+        (a / "out.pdf").write_text("a")
+        assert not (b / "out.pdf").exists()
+    assert not a.exists() and not b.exists()
+
+
+def test_move_into_place_across_filesystems(tmp_path, monkeypatch):
+    import errno
+    import os
+
+    from app.utils import file_utils
+
+    src = tmp_path / "scratch.pdf"
+    src.write_text("converted")
+    dest_dir = tmp_path / "public"
+    dest_dir.mkdir()
+    dest = dest_dir / "result.pdf"
+    dest.write_text("old")
+
+    real_replace = os.replace
+
+    def cross_device_replace(a, b):
+        # 模拟 tmpfs -> 磁盘：从 scratch 直接 rename 失败
+        if str(a) == str(src):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        real_replace(a, b)
+
+    monkeypatch.setattr(file_utils.os, "replace", cross_device_replace)
+    file_utils.move_into_place(src, dest)
+
+    assert dest.read_text() == "converted"
+    assert not src.exists()
+    assert [p.name for p in dest_dir.iterdir()] == ["result.pdf"]
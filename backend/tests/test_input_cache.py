@@ -0,0 +1,128 @@
+"""
+远程输入缓存测试（本地 aiohttp 服务器模拟带 ETag 的云存储源站）
+"""
+
+import hashlib
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.config import settings
+from app.utils.file_utils import FileTooLargeError
+from app.utils.input_cache import InputCache
+
+PAYLOAD = b"%PDF-1.4 cached input" * 1024
+
+
+@pytest.fixture()
+async def origin():
+    """支持 If-None-Match 的源站，记录每次请求的状态码"""
+    state = {"body": PAYLOAD, "etag": '"v1"', "statuses": []}
+
+    async def handler(request):
+        if request.headers.get("If-None-Match") == state["etag"]:
+            state["statuses"].append(304)
+            return web.Response(status=304, headers={"ETag": state["etag"]})
+        state["statuses"].append(200)
+        return web.Response(body=state["body"], headers={"ETag": state["etag"]})
+
+    app = web.Application()
+    app.router.add_get("/file.pdf", handler)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, state
+    await server.close()
+
+
+@pytest.fixture()
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INPUT_CACHE_DIR", str(tmp_path / "input_cache"))
+    monkeypatch.setattr(settings, "DOWNLOAD_RANGE_CONCURRENCY", 1)
+    return InputCache()
+
+
+async def test_fresh_entry_skips_origin(origin, cache, tmp_path):
+    server, state = origin
+    url = str(server.make_url("/file.pdf"))
+
+    first = await cache.fetch(url, tmp_path / "a.pdf", 10**8)
+    second = await cache.fetch(url, tmp_path / "b.pdf", 10**8)
+
+    assert first == second == hashlib.sha256(PAYLOAD).hexdigest()
+    assert (tmp_path / "b.pdf").read_bytes() == PAYLOAD
+    assert state["statuses"] == [200]
+    stats = cache.get_stats()
+    assert (stats["misses"], stats["hits"], stats["hitRate"]) == (1, 1, 0.5)
+
+
+async def test_stale_entry_revalidates(origin, cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INPUT_CACHE_FRESHNESS", 0)
+    server, state = origin
+    url = str(server.make_url("/file.pdf"))
+
+    await cache.fetch(url, tmp_path / "a.pdf", 10**8)
+    await cache.fetch(url, tmp_path / "b.pdf", 10**8)
+    assert state["statuses"] == [200, 304]
+    assert (tmp_path / "b.pdf").read_bytes() == PAYLOAD
+    assert cache.get_stats()["revalidated"] == 1
+
+    # 源站内容变化：重新下载，已链接出去的旧文件不受影响
+    state["body"], state["etag"] = b"new version", '"v2"'
+    content_hash = await cache.fetch(url, tmp_path / "c.pdf", 10**8)
+    assert state["statuses"] == [200, 304, 200]
+    assert content_hash == hashlib.sha256(b"new version").hexdigest()
+    assert (tmp_path / "c.pdf").read_bytes() == b"new version"
+    assert (tmp_path / "a.pdf").read_bytes() == PAYLOAD
+
+
+async def test_lru_eviction_by_disk_budget(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INPUT_CACHE_MAX_MB", 1)
+    big = b"x" * (600 * 1024)
+
+    async def handler(request):
+        return web.Response(body=big)
+
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        for name in ["a", "b", "c"]:
+            await cache.fetch(str(server.make_url(f"/{name}")), tmp_path / name, 10**8)
+    finally:
+        await server.close()
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 1
+    assert stats["evictions"] == 2
+    assert stats["bytes"] == len(big)
+
+
+async def test_cached_entry_respects_size_limit(origin, cache, tmp_path):
+    server, _ = origin
+    url = str(server.make_url("/file.pdf"))
+    await cache.fetch(url, tmp_path / "a.pdf", 10**8)
+
+    with pytest.raises(FileTooLargeError):
+        await cache.fetch(url, tmp_path / "b.pdf", 1024)
+    assert not (tmp_path / "b.pdf").exists()
+
+
+async def test_startup_removes_only_cache_files(origin, cache, tmp_path):
+    server, _ = origin
+    cache_dir = tmp_path / "input_cache"
+    cache_dir.mkdir()
+    stale = cache_dir / hashlib.sha256(b"old").hexdigest()
+    partial = cache_dir / ("x" * 21 + ".part")
+    unrelated = cache_dir / "report.pdf"
+    nested = cache_dir / "keep"
+    for path in (stale, partial, unrelated):
+        path.write_bytes(b"data")
+    nested.mkdir()
+
+    await cache.fetch(str(server.make_url("/file.pdf")), tmp_path / "a.pdf", 10**8)
+
+    # INPUT_CACHE_DIR 指向已有目录时，只删除缓存自己生成的遗留文件
+    assert not stale.exists() and not partial.exists()
+    assert unrelated.exists() and nested.is_dir()
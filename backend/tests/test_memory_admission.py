@@ -0,0 +1,209 @@
+"""
+按内存加权的准入控制测试
+"""
+
+import asyncio
+import threading
+
+import fitz
+import pytest
+from nanoid import generate as nanoid
+
+from app.config import settings
+from app.models import Category
+from app.utils import memory_admission as memory_admission_module
+from app.utils.memory_admission import MemoryAdmission, MemoryEstimate, memory_admission
+from app.utils.scheduler import JobScheduler
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(autouse=True)
+def budget(monkeypatch):
+    monkeypatch.setattr(settings, "MEMORY_ADMISSION_ENABLED", True)
+    monkeypatch.setattr(settings, "MEMORY_BUDGET_MB", 1000)
+    monkeypatch.setattr(settings, "ADAPTIVE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "SCHEDULER_CATEGORY_LIMITS", {"document": 4, "image": 4})
+    monkeypatch.setattr(settings, "SCHEDULER_ENGINE_LIMITS", {"python": 4, "libreoffice": 4})
+    monkeypatch.setattr(
+        settings,
+        "MEMORY_ESTIMATES",
+        {
+            "pdf->pptx": (100, 1, 50),
+            "txt->docx": (100, 0, 0),
+            "image": (100, 0, 0),
+            "png->webp": (400, 0, 0),
+            "libreoffice": (300, 10, 0),
+        },
+    )
+    # 全局实例的校准会影响后续估计，每个测试从头开始
+    monkeypatch.setattr(memory_admission, "_calibration", {})
+
+
+def _pdf(tmp_path, pages: int) -> str:
+    path = tmp_path / f"{nanoid()}.pdf"
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    doc.save(path)
+    return str(path)
+
+
+async def test_estimate_from_size_and_pages(tmp_path, make_task):
+    admission = MemoryAdmission()
+    pdf = _pdf(tmp_path, 6)
+    estimate = admission.estimate(
+        make_task(Category.DOCUMENT, "pdf", "pptx", input_path=pdf), "python", 20 * MB
+    )
+    # 入队时只按大小估计，页数在调度前补充
+    assert (estimate.key, estimate.pages) == ("pdf->pptx", None)
+    assert admission.calibrated_mb(estimate) == 100 + 20
+    await admission.add_pages(estimate, pdf)
+    await admission.add_pages(estimate, pdf)
+    assert estimate.pages == 6
+    assert admission.calibrated_mb(estimate) == 100 + 20 + 6 * 50
+
+    # 没有对应转换类型的系数时按引擎
+    docx = make_task(Category.DOCUMENT, "docx", "pdf")
+    estimate = admission.estimate(docx, "libreoffice", 5 * MB)
+    await admission.add_pages(estimate, docx.input_path)
+    assert (estimate.key, estimate.pages, admission.calibrated_mb(estimate)) == (
+        "libreoffice",
+        None,
+        350,
+    )
+
+
+def test_calibration_raises_fast_and_lowers_slowly():
+    admission = MemoryAdmission()
+    estimate = MemoryEstimate(key="txt->docx", prior_mb=100)
+
+    admission.observe(estimate, 300 * 1024)
+    assert admission.calibrated_mb(estimate) == 200
+    admission.observe(estimate, 100 * 1024)
+    assert admission.calibrated_mb(estimate) == 190
+    for _ in range(100):
+        admission.observe(estimate, 1024)
+    # 系数有下限，不会因为少量异常小的样本把估计压到接近 0
+    assert admission.calibrated_mb(estimate) == 25
+    assert admission.get_stats()["calibration"]["txt->docx"]["samples"] == 102
+
+
+def test_single_job_over_budget_is_admitted():
+    admission = MemoryAdmission()
+    big = MemoryEstimate(key="pdf->pptx", prior_mb=5000)
+    assert admission.fits(big)
+    admission.admit("a", big)
+    assert not admission.fits(MemoryEstimate(key="txt->docx", prior_mb=1))
+    admission.release("a")
+    assert admission.reserved_mb == 0
+
+
+async def test_scheduler_admits_by_memory(tmp_path, make_task):
+    scheduler = JobScheduler()
+    release = {}
+    started = []
+
+    async def run(task, label):
+        release[label] = asyncio.Event()
+        async with scheduler.slot(task):
+            started.append(label)
+            task.max_rss_kb = 700 * 1024
+            await release[label].wait()
+
+    # 两个 600MB 的任务不能同时运行，100MB 的小任务可以越过等待中的大任务
+    pdf = _pdf(tmp_path, 10)
+    big1, big2 = (make_task(Category.DOCUMENT, "pdf", "pptx", input_path=pdf) for _ in range(2))
+    small = make_task(Category.DOCUMENT, "txt", "docx")
+    runs = [asyncio.create_task(run(big1, "big1"))]
+    await asyncio.sleep(0.01)
+    runs.append(asyncio.create_task(run(big2, "big2")))
+    runs.append(asyncio.create_task(run(small, "small")))
+    await asyncio.sleep(0.01)
+    assert started == ["big1", "small"]
+    assert memory_admission.reserved_mb == 700
+    assert memory_admission.get_stats()["deferred"] >= 1
+
+    release["big1"].set()
+    await asyncio.sleep(0.01)
+    assert started == ["big1", "small", "big2"]
+    # 按 big1 的实际峰值内存（700MB，估计 600MB）上调了 pdf->pptx 的估计
+    assert memory_admission.get_stats()["calibration"]["pdf->pptx"]["factor"] > 1
+
+    release["small"].set()
+    release["big2"].set()
+    await asyncio.gather(*runs)
+    assert memory_admission.reserved_mb == 0
+
+
+async def test_aged_job_holds_memory(tmp_path, monkeypatch, make_task):
+    scheduler = JobScheduler()
+    release = asyncio.Event()
+    started = []
+
+    async def run(task, label):
+        async with scheduler.slot(task):
+            started.append(label)
+            await release.wait()
+
+    runs = [asyncio.create_task(run(make_task(Category.DOCUMENT, "docx", "pdf"), "office"))]
+    await asyncio.sleep(0.01)
+    monkeypatch.setattr(settings, "SCHEDULER_AGING_SECONDS", 0)
+    # 750MB 的 PDF 等待过久，与运行中的 300MB 任务合计超出预算
+    big = make_task(Category.DOCUMENT, "pdf", "pptx", input_path=_pdf(tmp_path, 13))
+    runs.append(asyncio.create_task(run(big, "big")))
+    while scheduler.enqueue(big).waiter is None:
+        await asyncio.sleep(0.01)
+    # 同一分类的小任务不放行；400MB 的图片放得下，但单独就会让大任务无法放行，也不放行；
+    # 100MB 的图片照常放行
+    runs.append(asyncio.create_task(run(make_task(Category.DOCUMENT, "txt", "docx"), "small")))
+    runs.append(asyncio.create_task(run(make_task(Category.IMAGE, "png", "webp"), "huge")))
+    runs.append(asyncio.create_task(run(make_task(Category.IMAGE, "png", "jpg"), "image")))
+    await asyncio.sleep(0.01)
+    assert started == ["office", "image"]
+
+    release.set()
+    await asyncio.gather(*runs)
+    assert started[2] == "big"
+
+
+async def test_pages_counted_off_event_loop(tmp_path, monkeypatch, make_task):
+    threads = []
+    count_pages = memory_admission_module.count_pages
+
+    def counting(path):
+        threads.append(threading.current_thread())
+        return count_pages(path)
+
+    monkeypatch.setattr(memory_admission_module, "count_pages", counting)
+    scheduler = JobScheduler()
+    task = make_task(Category.DOCUMENT, "pdf", "pptx", input_path=_pdf(tmp_path, 4))
+    # 上传请求中入队不解析文件
+    job = scheduler.enqueue(task)
+    assert threads == [] and job.memory.pages is None
+
+    async with scheduler.slot(task) as job:
+        assert job.memory.pages == 4
+    assert threads and threads[0] is not threading.main_thread()
+
+
+async def test_disabled_ignores_memory(tmp_path, monkeypatch, make_task):
+    monkeypatch.setattr(settings, "MEMORY_ADMISSION_ENABLED", False)
+    scheduler = JobScheduler()
+    release = asyncio.Event()
+    started = []
+
+    async def run(task):
+        async with scheduler.slot(task):
+            started.append(task.id)
+            await release.wait()
+
+    pdf = _pdf(tmp_path, 10)
+    runs = [
+        asyncio.create_task(run(make_task(Category.DOCUMENT, "pdf", "pptx", input_path=pdf)))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0.01)
+    assert len(started) == 3
+    release.set()
+    await asyncio.gather(*runs)
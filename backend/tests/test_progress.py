@@ -0,0 +1,141 @@
+"""
+转换进度协议测试
+"""
+
+import asyncio
+import importlib
+import json
+
+import pytest
+
+from app.config import settings
+from app.models import Category, ConvertTask
+from app.routers.convert import TaskProgress
+from app.utils import converter
+from app.utils.progress import FfmpegProgressParser, ProgressParser
+from app.utils.task_manager import task_manager
+from app.utils.worker_pool import PythonWorkerPool
+
+SCRIPT = """
+import argparse
+
+from app.scripts.convert_progress import Progress
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", required=True)
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+    progress = Progress(["render", "save"])
+    for i in range(3):
+        progress.update("render", i + 1, 3)
+    progress.update("save", 1, 1, 42)
+    with open(args.output, "w") as f:
+        f.write("done")
+"""
+
+
+def test_parser_handles_split_and_invalid_lines():
+    events = []
+    parser = ProgressParser(events.append)
+    line = json.dumps({"stage": "render", "current": 1, "total": 2}).encode()
+
+    parser.feed(line[:5])
+    parser.feed(line[5:] + b"\nnot json\n[1]\n" + b'{"no_stage": 1}\n{"stage": "sa')
+    parser.feed(b've"}\n')
+    assert events == [{"stage": "render", "current": 1, "total": 2}, {"stage": "save"}]
+
+
+def test_ffmpeg_progress_blocks():
+    events = []
+    parser = FfmpegProgressParser(events.append, duration=10.0)
+    output = (
+        b"total_size=1024\nout_time_us=2500000\nspeed=2.5x\nprogress=continue\n"
+        b"total_size=4096\nout_time_us=N/A\nspeed=N/A\nprogress=continue\n"
+        b"total_size=8192\nout_time_us=9999000\nspeed=2x\nprogress=end\n"
+    )
+    for line in output.splitlines(keepends=True):
+        parser.feed_line(line)
+
+    assert events[0] == {
+        "stage": "transcode",
+        "bytes": 1024,
+        "current": 2.5,
+        "total": 10.0,
+        "progress": 25,
+        "eta": 3.0,
+    }
+    assert events[1] == {"stage": "transcode", "bytes": 4096}
+    assert events[2]["progress"] == 100 and events[2]["eta"] == 0.0
+
+
+async def test_worker_streams_progress_per_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PY_WORKER_POOL_SIZE", 1)
+    script = tmp_path / "fake_progress.py"
+    script.write_text(SCRIPT)
+    pool = PythonWorkerPool()
+    try:
+        for run in range(2):
+            events = []
+            code, _, stderr = await pool.run(
+                script, ["-i", script, "-o", tmp_path / f"out{run}"], 30, events.append
+            )
+            assert code == 0, stderr
+            # 阶段完成（current == total）和阶段切换不受上报间隔限制
+            assert [e["stage"] for e in events] == ["render", "render", "save"]
+            assert events[-1]["progress"] == 100 and events[-1]["bytes"] == 42
+        assert pool.get_stats()["spawned"] == 1
+    finally:
+        await pool.close()
+
+
+@pytest.mark.parametrize("use_pool", [True, False])
+async def test_pdf_rendering_reports_pages(tmp_path, monkeypatch, use_pool):
+    fitz = pytest.importorskip("fitz")
+    monkeypatch.setattr(settings, "PY_WORKER_POOL_ENABLED", use_pool)
+    src = tmp_path / "three.pdf"
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page()
+    doc.save(src)
+
+    events = []
+    await converter.run_image_conversion(str(src), str(tmp_path / "out.png"), "png", events.append)
+    if use_pool:
+        await converter.python_worker_pool.close()
+
+    assert events[0]["stage"] == "render" and events[0]["progress"] == 0
+    assert events[-1]["current"] == events[-1]["total"] == 3
+    assert events[-1]["progress"] == 100 and events[-1]["bytes"] > 0
+
+
+async def test_task_progress_throttles_store_writes(monkeypatch):
+    monkeypatch.setattr(settings, "TASK_PROGRESS_INTERVAL", 60)
+    task = ConvertTask(id="prog1", category=Category.DOCUMENT, target="pdf", input_path="in.pdf")
+    await task_manager.create_task(task)
+    writes = []
+    update = task_manager.update_task
+
+    async def counting_update(t, *fields):
+        writes.append(fields)
+        await update(t, *fields)
+
+    monkeypatch.setattr(task_manager, "update_task", counting_update)
+    progress = TaskProgress(task)
+    for i in range(1, 11):
+        progress({"stage": "render", "current": i, "total": 10})
+        await asyncio.sleep(0)
+    progress({"stage": "save", "progress": 100})
+    await progress.flush()
+
+    assert len(writes) == 2  # 第一个事件和阶段切换
+    stored = await task_manager.get_task("prog1")
+    assert (stored.stage, stored.progress) == ("save", 99)
+
+
+@pytest.mark.parametrize("script", ["image_convert", "pdf_to_doc", "pdf_to_ppt"])
+def test_scripts_import_as_package(script):
+    # 脚本目录不在 sys.path 中时也能作为 app.scripts 的模块导入
+    module = importlib.import_module(f"app.scripts.{script}")
+    assert module.Progress.__module__ == "app.scripts.convert_progress"
@@ -0,0 +1,159 @@
+"""
+转换结果缓存测试
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.models import TaskState
+from app.utils.result_cache import ResultCache, result_cache
+from app.utils.task_manager import task_manager
+
+
+@pytest.fixture()
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_CACHE_DIR", str(tmp_path / "cache"))
+    return ResultCache()
+
+
+def _artifact(directory: Path, name: str, size: int) -> Path:
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_key_depends_on_all_parts():
+    base = ResultCache.make_key("abc", ".pdf", "docx")
+    assert base == ResultCache.make_key("abc", "pdf", "DOCX")
+    assert base != ResultCache.make_key("abd", ".pdf", "docx")
+    assert base != ResultCache.make_key("abc", ".pdf", "doc")
+    assert base != ResultCache.make_key("abc", ".pdf", "docx", {"quality": "high"})
+
+
+def test_store_and_materialize(cache, tmp_path):
+    artifact = _artifact(tmp_path, "out.docx", 100)
+    cache.store("k1", artifact)
+
+    dest = cache.materialize("k1", tmp_path / "copy.docx")
+    assert dest == tmp_path / "copy.docx"
+    assert dest.read_bytes() == artifact.read_bytes()
+    assert cache.materialize("missing", tmp_path / "none.docx") is None
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_deleting_public_link_keeps_cache_entry(cache, tmp_path):
+    artifact = _artifact(tmp_path, "out.pdf", 10)
+    cache.store("k1", artifact)
+    artifact.unlink()  # 模拟任务过期时删除输出文件
+    assert cache.lookup("k1") is not None
+
+
+def test_lru_eviction_by_disk_budget(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_CACHE_MAX_MB", 1)
+    size = 400 * 1024
+    cache.store("a", _artifact(tmp_path, "a.pdf", size))
+    cache.store("b", _artifact(tmp_path, "b.pdf", size))
+    assert cache.lookup("a") is not None  # a 变为最近使用
+    cache.store("c", _artifact(tmp_path, "c.pdf", size))
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") is not None
+    assert cache.lookup("c") is not None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_evict_expired(cache, tmp_path, monkeypatch):
+    cache.store("old", _artifact(tmp_path, "old.pdf", 10))
+    old_path = cache.lookup("old")
+    past = time.time() - settings.FILE_EXPIRE_TIME - 10
+    os.utime(old_path, (past, past))
+
+    # 重新从磁盘加载索引，创建时间取自文件 mtime
+    reloaded = ResultCache()
+    assert reloaded.evict_expired() == 1
+    assert not old_path.exists()
+
+
+def test_upload_hits_cache_on_repeat(client, monkeypatch):
+    from app.routers import convert as convert_router
+
+    calls = []
+
+    async def fake_document_conversion(
+        input_path, output_path, source_ext, target_format, on_progress=None
+    ):
+        calls.append(input_path)
+        Path(output_path).write_bytes(b"converted")
+        return output_path
+
+    monkeypatch.setattr(convert_router, "run_document_conversion", fake_document_conversion)
+
+    body = f"cache me {time.time()}".encode()
+    data = {"category": "document", "target": "docx"}
+
+    first = client.post("/convert/upload", files={"file": ("t.txt", body, "text/plain")}, data=data)
+    assert first.status_code == 200
+    assert asyncio.run(task_manager.get_task(first.json()["taskId"])).state == TaskState.FINISHED
+
+    hits_before = result_cache.get_stats()["hits"]
+    second = client.post(
+        "/convert/upload", files={"file": ("t2.txt", body, "text/plain")}, data=data
+    )
+    assert second.status_code == 200
+    task = asyncio.run(task_manager.get_task(second.json()["taskId"]))
+    assert task.state == TaskState.FINISHED
+    assert Path(task.output_path).read_bytes() == b"converted"
+    assert not Path(task.input_path).exists()
+    assert len(calls) == 1
+    assert result_cache.get_stats()["hits"] == hits_before + 1
+
+
+def test_cache_hit_with_same_name_gets_own_output(client, monkeypatch):
+    from app.routers import convert as convert_router
+    from app.utils import result_cache as result_cache_module
+
+    async def fake_document_conversion(
+        input_path, output_path, source_ext, target_format, on_progress=None
+    ):
+        Path(output_path).write_bytes(b"converted")
+        return output_path
+
+    on_loop = []
+    link_or_copy = result_cache_module.link_or_copy
+
+    def recording_link_or_copy(src, dest):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        link_or_copy(src, dest)
+
+    monkeypatch.setattr(convert_router, "run_document_conversion", fake_document_conversion)
+    monkeypatch.setattr(result_cache_module, "link_or_copy", recording_link_or_copy)
+
+    # 同一分钟内上传同名文件：命中缓存的任务有自己的产物，不会覆盖前一个任务的文件
+    body = f"same name {time.time()}".encode()
+    data = {"category": "document", "target": "docx"}
+    tasks = []
+    for _ in range(2):
+        resp = client.post(
+            "/convert/upload", files={"file": ("同名.txt", body, "text/plain")}, data=data
+        )
+        tasks.append(asyncio.run(task_manager.get_task(resp.json()["taskId"])))
+    first, second = (Path(task.output_path) for task in tasks)
+    assert first != second and tasks[0].url != tasks[1].url
+
+    first.unlink()
+    assert second.read_bytes() == b"converted"
+    # 写入缓存和链接缓存产物都不在事件循环线程中执行
+    assert on_loop and not any(on_loop)
@@ -0,0 +1,135 @@
+"""
+转换任务调度器测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.models import Category, ConvertTask
+from app.utils.scheduler import JobScheduler, engine_for
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(
+        settings, "SCHEDULER_CATEGORY_LIMITS", {"document": 1, "audio": 1, "image": 2}
+    )
+    monkeypatch.setattr(
+        settings, "SCHEDULER_ENGINE_LIMITS", {"libreoffice": 1, "python": 3, "ffmpeg": 1}
+    )
+
+
+def test_engine_for():
+    def task(category, source, target):
+        return ConvertTask(id="t", category=category, source=source, target=target, input_path="")
+
+    assert engine_for(task(Category.AUDIO, "wav", "mp3")) == "ffmpeg"
+    assert engine_for(task(Category.IMAGE, "png", "jpg")) == "python"
+    assert engine_for(task(Category.DOCUMENT, "pdf", "docx")) == "python"
+    assert engine_for(task(Category.DOCUMENT, "docx", "pdf")) == "libreoffice"
+
+
+async def test_image_job_not_blocked_by_document_pool(make_task):
+    scheduler = JobScheduler()
+    order = []
+    release_docs = asyncio.Event()
+
+    async def run(task, label, hold=None):
+        async with scheduler.slot(task):
+            order.append(label)
+            if hold:
+                await hold.wait()
+
+    docs = [
+        asyncio.create_task(
+            run(make_task(Category.DOCUMENT, "docx", "pdf"), f"doc{i}", release_docs)
+        )
+        for i in range(2)
+    ]
+    await asyncio.sleep(0)
+    image = make_task(Category.IMAGE, "png", "jpg")
+    await asyncio.wait_for(run(image, "image"), timeout=1)
+
+    assert order == ["doc0", "image"]
+    assert image.queue_wait_ms is not None and image.started_at is not None
+    assert scheduler.get_stats()["queued"]["document"] == 1
+
+    release_docs.set()
+    await asyncio.gather(*docs)
+    stats = scheduler.get_stats()
+    assert order[-1] == "doc1"
+    assert stats["started"] == 3
+    assert stats["running"] == {"document": 0, "audio": 0, "image": 0}
+
+
+async def test_smaller_inputs_start_first(make_task):
+    scheduler = JobScheduler()
+    order = []
+    gate = asyncio.Event()
+
+    async def run(task, hold=None):
+        async with scheduler.slot(task):
+            order.append(task.target)
+            if hold:
+                await hold.wait()
+
+    blocker = asyncio.create_task(run(make_task(Category.AUDIO, "wav", "mp3"), gate))
+    await asyncio.sleep(0)
+    big = make_task(Category.AUDIO, "wav", "flac", size=10_000)
+    small = make_task(Category.AUDIO, "wav", "aac", size=10)
+    waiters = [asyncio.create_task(run(big)), asyncio.create_task(run(small))]
+    await asyncio.sleep(0)
+
+    gate.set()
+    await asyncio.gather(blocker, *waiters)
+    assert order == ["mp3", "aac", "flac"]
+
+
+async def test_aged_job_beats_smaller_job(monkeypatch, make_task):
+    monkeypatch.setattr(settings, "SCHEDULER_AGING_SECONDS", 0)
+    scheduler = JobScheduler()
+    order = []
+    gate = asyncio.Event()
+
+    async def run(task, hold=None):
+        async with scheduler.slot(task):
+            order.append(task.target)
+            if hold:
+                await hold.wait()
+
+    blocker = asyncio.create_task(run(make_task(Category.AUDIO, "wav", "mp3"), gate))
+    await asyncio.sleep(0)
+    big = make_task(Category.AUDIO, "wav", "flac", size=10_000)
+    small = make_task(Category.AUDIO, "wav", "aac", size=10)
+    waiters = [asyncio.create_task(run(big)), asyncio.create_task(run(small))]
+    await asyncio.sleep(0)
+
+    gate.set()
+    await asyncio.gather(blocker, *waiters)
+    assert order == ["mp3", "flac", "aac"]
+
+
+async def test_cancelled_waiter_frees_queue(make_task):
+    scheduler = JobScheduler()
+    gate = asyncio.Event()
+
+    async def run(task, hold=None):
+        async with scheduler.slot(task):
+            if hold:
+                await hold.wait()
+
+    blocker = asyncio.create_task(run(make_task(Category.AUDIO, "wav", "mp3"), gate))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(run(make_task(Category.AUDIO, "wav", "aac")))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    gate.set()
+    await blocker
+    stats = scheduler.get_stats()
+    assert stats["queued"]["audio"] == 0
+    assert stats["running"]["audio"] == 0
@@ -0,0 +1,171 @@
+"""
+相同转换合并（single-flight）测试
+"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from nanoid import generate as nanoid
+
+from app.config import settings
+from app.models import Category, ConvertTask, TaskState
+from app.utils.singleflight import SingleFlight
+from app.utils.task_manager import task_manager
+
+
+async def test_followers_share_leader_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*[flight.do("k", work) for _ in range(3)])
+
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["result"] * 3
+    assert sorted(is_leader for _, is_leader in results) == [False, False, True]
+    assert flight.get_stats() == {"inflight": 0, "leaders": 1, "coalesced": 2}
+
+
+async def test_followers_share_leader_error():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *[flight.do("k", work) for _ in range(2)], return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+    assert not flight.is_inflight("k")
+
+
+async def test_cancelled_caller_does_not_stop_shared_work():
+    flight = SingleFlight()
+    started, release = asyncio.Event(), asyncio.Event()
+    cancelled = []
+
+    async def work():
+        started.set()
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "result"
+
+    leader = asyncio.create_task(flight.do("k", work))
+    await started.wait()
+    followers = [asyncio.create_task(flight.do("k", work)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    followers[0].cancel()
+    await asyncio.sleep(0)
+    assert not cancelled and flight.is_inflight("k")
+
+    release.set()
+    assert await followers[1] == ("result", False)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_last_cancelled_caller_stops_shared_work():
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.create_task(flight.do("k", work)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    await asyncio.sleep(0)
+    assert not flight.is_inflight("k")
+
+
+async def _make_task(body: bytes, content_hash: str, name: str = "") -> ConvertTask:
+    input_path = Path(settings.UPLOAD_DIR) / f"{nanoid()}.txt"
+    input_path.write_bytes(body)
+    task = ConvertTask(
+        id=nanoid(),
+        category=Category.DOCUMENT,
+        target="docx",
+        source="txt",
+        input_path=str(input_path),
+        original_filename=name or f"file_{nanoid(size=6)}",
+        content_hash=content_hash,
+    )
+    await task_manager.create_task(task)
+    return task
+
+
+@pytest.mark.parametrize("fail", [False, True])
+async def test_identical_conversions_run_once(monkeypatch, fail):
+    from app.routers import convert as convert_router
+
+    calls = []
+
+    async def fake_document_conversion(
+        input_path, output_path, source_ext, target_format, on_progress=None
+    ):
+        calls.append(input_path)
+        await asyncio.sleep(0.05)
+        if fail:
+            raise Exception("转换失败")
+        Path(output_path).write_bytes(b"converted")
+        return output_path
+
+    monkeypatch.setattr(convert_router, "run_document_conversion", fake_document_conversion)
+
+    content_hash = nanoid(size=32)
+    tasks = [await _make_task(b"same content", content_hash) for _ in range(3)]
+    await asyncio.gather(*[convert_router.convert_async(t) for t in tasks])
+
+    assert len(calls) == 1
+    for task in tasks:
+        stored = await task_manager.get_task(task.id)
+        assert not Path(stored.input_path).exists()
+        if fail:
+            assert stored.state == TaskState.ERROR
+            assert stored.error == "转换失败"
+        else:
+            assert stored.state == TaskState.FINISHED
+            assert Path(stored.output_path).read_bytes() == b"converted"
+    if not fail:
+        assert len({(await task_manager.get_task(t.id)).output_path for t in tasks}) == 3
+
+
+async def test_followers_with_same_name_get_own_files(monkeypatch):
+    from app.routers import convert as convert_router
+
+    async def fake_document_conversion(
+        input_path, output_path, source_ext, target_format, on_progress=None
+    ):
+        await asyncio.sleep(0.05)
+        Path(output_path).write_bytes(b"converted")
+        return output_path
+
+    monkeypatch.setattr(convert_router, "run_document_conversion", fake_document_conversion)
+
+    # 同一分钟内上传的同名同内容文件：每个任务链接出自己的文件
+    content_hash = nanoid(size=32)
+    tasks = [await _make_task(b"template", content_hash, "群文件模板") for _ in range(3)]
+    await asyncio.gather(*[convert_router.convert_async(t) for t in tasks])
+
+    outputs = [Path((await task_manager.get_task(t.id)).output_path) for t in tasks]
+    assert len(set(outputs)) == 3
+    # 一个任务过期删除自己的文件，不影响其他任务
+    outputs[0].unlink()
+    assert all(path.read_bytes() == b"converted" for path in outputs[1:])
@@ -0,0 +1,225 @@
+"""
+LibreOffice 实例池测试（使用模拟 soffice 命令行的脚本）
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import psutil
+import pytest
+
+from app.config import settings
+from app.utils.soffice_pool import SofficePool, export_filter
+
+FAKE_SOFFICE = f"""#!{sys.executable}
+import sys, time
+from pathlib import Path
+from urllib.parse import urlparse
+
+args = sys.argv[1:]
+profile = Path(urlparse(args[0].split("=", 1)[1]).path)
+if "--terminate_after_init" in args:
+    (profile / "user").mkdir(parents=True, exist_ok=True)
+    (profile / "user" / "template.marker").write_text("ok")
+    sys.exit(0)
+
+target = args[args.index("--convert-to") + 1]
+outdir = Path(args[args.index("--outdir") + 1])
+source = Path(args[-1])
+if "hang" in source.name:
+    time.sleep(60)
+time.sleep(0.3)
+(outdir / f"{{source.stem}}.{{target}}").write_text(str(profile))
+"""
+
+
+@pytest.fixture()
+def pool(tmp_path, monkeypatch):
+    fake = tmp_path / "soffice"
+    fake.write_text(FAKE_SOFFICE)
+    fake.chmod(0o755)
+    monkeypatch.setattr(settings, "SOFFICE_PATH", str(fake))
+    monkeypatch.setattr(settings, "SOFFICE_PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(settings, "SOFFICE_POOL_UNO", False)
+    monkeypatch.setattr(settings, "SOFFICE_POOL_SIZE", 2)
+    return SofficePool()
+
+
+def _input(tmp_path: Path, name: str) -> str:
+    path = tmp_path / name
+    path.write_text("document")
+    return str(path)
+
+
+def test_export_filter():
+    assert export_filter(".docx", "pdf") == "writer_pdf_Export"
+    assert export_filter("xlsx", "pdf") == "calc_pdf_Export"
+    assert export_filter(".pptx", "pdf") == "impress_pdf_Export"
+    assert export_filter(".md", "pdf") is None
+
+
+async def test_instances_use_isolated_profiles(pool, tmp_path):
+    await pool.start()
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    outputs = await asyncio.gather(
+        pool.convert(_input(tmp_path, "a.docx"), str(out_dir), "pdf"),
+        pool.convert(_input(tmp_path, "b.docx"), str(out_dir), "pdf"),
+    )
+
+    assert outputs == [str(out_dir / "a.pdf"), str(out_dir / "b.pdf")]
+    profiles = {Path(Path(p).read_text()) for p in outputs}
+    assert len(profiles) == 2
+    for profile in profiles:
+        assert (profile / "user" / "template.marker").exists()
+    assert [i["jobs"] for i in pool.get_stats()["instances"]] == [1, 1]
+
+
+async def test_concurrent_growth_allocates_distinct_ports(pool, tmp_path):
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    # 空闲实例为空时各转换同时在线程中创建实例
+    await asyncio.gather(
+        *(pool.convert(_input(tmp_path, f"{n}.docx"), str(out_dir), "pdf") for n in range(4))
+    )
+
+    instances = pool._instances
+    assert len(instances) == 4
+    assert len({i.port for i in instances}) == len({i.profile_dir for i in instances}) == 4
+
+
+async def test_hung_conversion_is_killed(pool, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSION_TIMEOUT", 1)
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await pool.convert(_input(tmp_path, "hang.docx"), str(out_dir), "pdf")
+
+    stats = pool.get_stats()
+    assert stats["hangs"] == 1
+    assert stats["instances"][0]["failures"] == 1
+    assert stats["idle"] == 1
+    # 卡死的进程组已被杀掉，没有残留的 soffice 进程
+    await asyncio.sleep(0.2)
+    leftovers = [
+        p
+        for p in psutil.process_iter(["cmdline"])
+        if any(arg.endswith("hang.docx") for arg in p.info["cmdline"] or [])
+    ]
+    assert leftovers == []
+
+
+async def test_missing_output_raises(pool, tmp_path):
+    with pytest.raises(Exception, match="未生成"):
+        await pool.convert(_input(tmp_path, "a.docx"), str(tmp_path / "missing"), "pdf")
+
+
+async def test_document_conversions_do_not_race(pool, tmp_path, monkeypatch):
+    from app.utils import converter
+
+    monkeypatch.setattr(converter, "soffice_pool", pool)
+    public = tmp_path / "public"
+    public.mkdir()
+    # 公开目录中已有的同类型文件不会被误当作转换结果
+    (public / "stale.pdf").write_text("stale")
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+
+    # 两个任务的输入文件同名，LibreOffice 输出文件名也相同
+    results = await asyncio.gather(
+        converter.run_document_conversion(
+            _input(first, "report.docx"), str(public / "one.pdf"), ".docx", "pdf"
+        ),
+        converter.run_document_conversion(
+            _input(second, "report.docx"), str(public / "two.pdf"), ".docx", "pdf"
+        ),
+    )
+
+    assert results == [str(public / "one.pdf"), str(public / "two.pdf")]
+    assert sorted(p.name for p in public.iterdir()) == ["one.pdf", "stale.pdf", "two.pdf"]
+    assert (public / "stale.pdf").read_text() == "stale"
+    assert list(Path(settings.SCRATCH_DIR).iterdir()) == []
+
+
+async def test_cancelled_uno_conversion_restarts_in_background(pool, tmp_path, monkeypatch):
+    from app.utils import soffice_pool as soffice_module
+
+    launches = []
+
+    def fake_launch(instance):
+        # 首次启动立即完成，重启时模拟 LibreOffice 较慢的启动
+        if launches:
+            time.sleep(0.5)
+        launches.append(instance.index)
+        instance.process = subprocess.Popen(
+            [sys.executable, "-c", "import time; time.sleep(60)"], start_new_session=True
+        )
+        instance.jobs = 0
+        instance.last_checked = time.monotonic()
+
+    monkeypatch.setattr(SofficePool, "mode", property(lambda self: "uno"))
+    monkeypatch.setattr(pool, "_launch", fake_launch)
+    monkeypatch.setattr(soffice_module, "_uno_convert", lambda *args: time.sleep(2))
+    monkeypatch.setattr(settings, "SOFFICE_POOL_SIZE", 1)
+    await pool.start()
+    old_process = pool._instances[0].process
+
+    convert = asyncio.create_task(pool.convert(_input(tmp_path, "a.docx"), str(tmp_path), "pdf"))
+    await asyncio.sleep(0.1)
+    convert.cancel()
+    start = time.monotonic()
+    with pytest.raises(asyncio.CancelledError):
+        await convert
+    # 取消不等待新进程启动，旧进程已被杀掉
+    assert time.monotonic() - start < 0.3
+    assert old_process.wait(timeout=1) is not None
+    assert pool.get_stats()["restarting"] == 1 and pool.get_stats()["idle"] == 0
+
+    # 重启完成前实例不参与分配，下一个任务等待重启而不是创建新实例
+    instance = await pool._acquire()
+    assert instance is pool._instances[0] and len(pool._instances) == 1
+    assert instance.restarts == 1 and instance.alive()
+    pool._idle.append(instance)
+    await pool.close()
+
+
+async def test_cancel_during_health_check_keeps_instance(pool, tmp_path, monkeypatch):
+    from app.utils import soffice_pool as soffice_module
+
+    def fake_launch(instance):
+        instance.process = subprocess.Popen(
+            [sys.executable, "-c", "import time; time.sleep(60)"], start_new_session=True
+        )
+        instance.jobs = 0
+        instance.last_checked = time.monotonic()
+
+    def slow_ping(port):
+        # 无响应的实例：健康检查超时后重启
+        time.sleep(0.5)
+        return False
+
+    monkeypatch.setattr(SofficePool, "mode", property(lambda self: "uno"))
+    monkeypatch.setattr(pool, "_launch", fake_launch)
+    monkeypatch.setattr(soffice_module, "_uno_ping", slow_ping)
+    monkeypatch.setattr(settings, "SOFFICE_POOL_SIZE", 1)
+    await pool.start()
+    pool._instances[0].last_checked = 0
+
+    convert = asyncio.create_task(pool.convert(_input(tmp_path, "a.docx"), str(tmp_path), "pdf"))
+    await asyncio.sleep(0.1)
+    convert.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await convert
+
+    # 健康检查完成后实例回到空闲列表，下一个任务不会创建新实例
+    instance = await pool._acquire()
+    assert instance is pool._instances[0] and len(pool._instances) == 1
+    assert instance.restarts == 1
+    pool._idle.append(instance)
+    await pool.close()
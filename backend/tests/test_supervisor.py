@@ -0,0 +1,158 @@
+"""
+转换进程监管测试
+"""
+
+import asyncio
+import shutil
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from app.config import settings
+from app.utils.supervisor import ConversionLimitError, ProcessSupervisor, track_usage
+from app.utils.worker_pool import PythonWorkerPool
+
+BUSY = "import time\nend = time.process_time() + {seconds}\nwhile time.process_time() < end: pass\n"
+
+
+@pytest.fixture()
+def supervisor(monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSION_CGROUP_DIR", "")
+    return ProcessSupervisor()
+
+
+def _python(code: str, *args: str) -> list:
+    return [sys.executable, "-c", code, *args]
+
+
+async def test_output_is_streamed_with_bounded_tail(supervisor, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSION_OUTPUT_TAIL_KB", 1)
+    chunks = []
+    code = "import sys\nfor i in range(3000): print(f'line {i:04d}')\nsys.stderr.write('done')"
+
+    result = await supervisor.run(_python(code), "python", 10, on_stdout=chunks.append)
+
+    assert result.returncode == 0 and result.stderr == b"done"
+    assert b"".join(chunks).count(b"\n") == 3000
+    assert len(result.stdout) == 1024 and result.stdout.endswith(b"line 2999\n")
+
+
+async def test_usage_is_recorded(supervisor):
+    with track_usage() as usage:
+        result = await supervisor.run(_python(BUSY.format(seconds=0.3)), "python", 10)
+        await supervisor.run(_python("pass"), "python", 10)
+
+    assert result.cpu_time >= 0.25 and result.max_rss_kb > 1000
+    assert usage.processes == 2 and usage.cpu_time >= result.cpu_time
+    assert supervisor.get_stats()["processes"] == 2
+
+
+async def test_cpu_limit(supervisor, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSION_CPU_LIMIT", 1)
+    with pytest.raises(ConversionLimitError, match="CPU"):
+        await supervisor.run(_python(BUSY.format(seconds=30)), "python", 30)
+    assert supervisor.get_stats()["limitExceeded"] == 1
+
+
+async def test_memory_limit(supervisor, monkeypatch):
+    monkeypatch.setattr(settings, "ENGINE_MEMORY_LIMITS_MB", {"python": 256})
+    result = await supervisor.run(_python("b = bytearray(512 * 1024 * 1024)"), "python", 10)
+    assert result.returncode != 0 and b"MemoryError" in result.stderr
+
+    result = await supervisor.run(_python("b = bytearray(64 * 1024 * 1024)"), "python", 10)
+    assert result.returncode == 0
+
+
+async def test_file_size_limit(supervisor, monkeypatch, tmp_path):
+    dd = shutil.which("dd")
+    if dd is None:
+        pytest.skip("dd 不可用")
+    monkeypatch.setattr(settings, "CONVERSION_MAX_OUTPUT_MB", 1)
+    # 未忽略 SIGXFSZ 的程序（如 ffmpeg）被系统终止
+    args = [dd, "if=/dev/zero", f"of={tmp_path / 'big'}", "bs=1M", "count=2"]
+    with pytest.raises(ConversionLimitError, match="文件大小"):
+        await supervisor.run(args, "ffmpeg", 10)
+    assert (tmp_path / "big").stat().st_size == 1024 * 1024
+
+
+async def test_timeout_kills_and_reaps(supervisor):
+    with pytest.raises(asyncio.TimeoutError):
+        await supervisor.run(_python("import time; time.sleep(30)"), "python", 0.3)
+    stats = supervisor.get_stats()
+    assert stats["killed"] == 1 and stats["running"] == 0
+
+
+async def test_unusable_cgroup_falls_back_to_rlimit(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CONVERSION_CGROUP_DIR", str(tmp_path))
+    supervisor = ProcessSupervisor()
+    result = await supervisor.run(_python("print('ok')"), "python", 10)
+    assert result.stdout == b"ok\n"
+    assert supervisor.get_stats()["cgroup"] is None
+
+
+@pytest.fixture()
+def busy_script(tmp_path):
+    script = tmp_path / "busy_script.py"
+    script.write_text(
+        "import argparse\n"
+        "def main():\n"
+        "    parser = argparse.ArgumentParser()\n"
+        "    parser.add_argument('-s', type=float)\n"
+        "    args = parser.parse_args()\n"
+        + "".join(f"    {line}\n" for line in BUSY.format(seconds="args.s").splitlines())
+    )
+    return script
+
+
+async def test_worker_reports_usage_per_task(busy_script):
+    pool = PythonWorkerPool()
+    try:
+        for _ in range(2):
+            with track_usage() as usage:
+                code, _, stderr = await pool.run(busy_script, ["-s", "0.3"], 30)
+            assert code == 0, stderr
+            # 每个任务单独统计，不累计 worker 生命周期内的用量
+            assert 0.25 <= usage.cpu_time < 1 and usage.max_rss_kb > 1000
+    finally:
+        await pool.close()
+
+
+async def test_worker_cpu_limit(busy_script, monkeypatch):
+    monkeypatch.setattr(settings, "CONVERSION_CPU_LIMIT", 1)
+    pool = PythonWorkerPool()
+    try:
+        code, _, _ = await pool.run(busy_script, ["-s", "0.5"], 30)
+        assert code == 0
+        # CPU 时间限制按任务顺延，第二个任务不受第一个任务用量影响
+        code, _, _ = await pool.run(busy_script, ["-s", "0.8"], 30)
+        assert code == 0
+        with pytest.raises(ConversionLimitError, match="CPU"):
+            await pool.run(busy_script, ["-s", "30"], 30)
+    finally:
+        await pool.close()
+
+
+async def test_spawns_off_loop_without_preexec_fn(supervisor, monkeypatch):
+    calls = []
+    popen = subprocess.Popen
+
+    def recording_popen(args, **kwargs):
+        calls.append((threading.current_thread() is threading.main_thread(), kwargs))
+        return popen(args, **kwargs)
+
+    monkeypatch.setattr(subprocess, "Popen", recording_popen)
+    monkeypatch.setattr(settings, "CONVERSION_CPU_LIMIT", 30)
+    code = "import resource; print(resource.getrlimit(resource.RLIMIT_CPU)[0])"
+    result = await supervisor.run(_python(code), "python", 10)
+
+    # 在线程中启动，限制由 exec 包装程序设置
+    [(on_loop_thread, kwargs)] = calls
+    assert not on_loop_thread and "preexec_fn" not in kwargs
+    assert result.stdout.strip() == b"30"
+
+
+async def test_missing_program_raises(supervisor):
+    with pytest.raises(FileNotFoundError):
+        await supervisor.run(["/nonexistent/converter"], "python", 10)
@@ -0,0 +1,105 @@
+"""
+任务状态本地缓存测试（两个 RedisTaskManager 共享同一个 fakeredis，模拟两个实例）
+"""
+
+import asyncio
+
+import pytest
+
+from app.models import Category, ConvertTask, TaskState
+from app.utils.task_manager import RedisTaskManager
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+def _manager(server) -> RedisTaskManager:
+    manager = RedisTaskManager("redis://localhost:6379/0")
+    manager._redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    return manager
+
+
+async def _until(predicate) -> None:
+    for _ in range(200):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("等待超时")
+
+
+@pytest.fixture()
+async def instances():
+    server = fakeredis.FakeServer()
+    reader, writer = _manager(server), _manager(server)
+    await reader.start()
+    await _until(lambda: reader._cache.enabled)
+    yield reader, writer
+    await reader.close()
+    await writer.close()
+
+
+def _task() -> ConvertTask:
+    return ConvertTask(
+        id="t1", category=Category.DOCUMENT, target="pdf", source="docx", input_path="in.docx"
+    )
+
+
+async def test_polls_hit_local_cache(instances):
+    reader, writer = instances
+    await writer.create_task(_task())
+
+    for _ in range(10):
+        assert (await reader.get_task("t1")).state == TaskState.QUEUED
+    stats = reader.get_cache_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 9
+
+
+async def test_update_on_other_instance_invalidates(instances):
+    reader, writer = instances
+    task = _task()
+    await writer.create_task(task)
+    await reader.get_task("t1")
+
+    task.state = TaskState.FINISHED
+    await writer.update_task(task, "state")
+    await _until(lambda: reader.get_cache_stats()["invalidations"] == 1)
+
+    assert (await reader.get_task("t1")).state == TaskState.FINISHED
+    # 已结束的任务缓存到过期为止
+    assert reader._cache._entries["t1"][0] > task.created_at.timestamp() + 3600
+
+
+async def test_cached_copy_is_not_shared(instances):
+    reader, writer = instances
+    await writer.create_task(_task())
+
+    first = await reader.get_task("t1")
+    first.state = TaskState.ERROR
+    assert (await reader.get_task("t1")).state == TaskState.QUEUED
+
+
+async def test_read_racing_with_update_is_not_cached(instances):
+    reader, writer = instances
+    await writer.create_task(_task())
+    load = reader._load_task
+
+    async def load_then_invalidate(task_id):
+        task = await load(task_id)
+        # 读取结果返回前收到更新通知：读到的可能是旧状态
+        reader._cache.invalidate(task_id)
+        return task
+
+    reader._load_task = load_then_invalidate
+    await reader.get_task("t1")
+    assert "t1" not in reader._cache._entries
+
+
+async def test_cache_disabled_without_subscription():
+    manager = _manager(fakeredis.FakeServer())
+    await manager.create_task(_task())
+
+    await manager.get_task("t1")
+    await manager.get_task("t1")
+    assert manager.get_cache_stats()["entries"] == 0
+    await manager.close()
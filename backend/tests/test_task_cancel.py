@@ -0,0 +1,234 @@
+"""
+任务取消测试
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import psutil
+import pytest
+from fastapi import HTTPException
+from nanoid import generate as nanoid
+
+from app.config import settings
+from app.models import Category, ConvertTask, TaskState
+from app.routers import convert as convert_router
+from app.utils import converter
+from app.utils.scheduler import job_scheduler
+from app.utils.task_manager import task_manager
+
+# 启动一个孙进程并记录其 pid，模拟 soffice / ffmpeg 等会派生子进程的转换程序
+SPAWN = (
+    "import subprocess, sys, time\n"
+    "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+    "open(sys.argv[1], 'w').write(str(p.pid))\n"
+    "time.sleep(60)\n"
+)
+
+
+async def _pid_from(pid_file: Path) -> int:
+    for _ in range(500):
+        if pid_file.exists() and pid_file.read_text():
+            return int(pid_file.read_text())
+        await asyncio.sleep(0.01)
+    raise AssertionError("子进程未启动")
+
+
+async def _assert_dead(pid: int) -> None:
+    for _ in range(300):
+        try:
+            if psutil.Process(pid).status() == psutil.STATUS_ZOMBIE:
+                return
+        except psutil.NoSuchProcess:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"进程 {pid} 仍在运行")
+
+
+@pytest.fixture()
+def slow_conversion(monkeypatch, tmp_path):
+    """文档转换替换为长时间运行的子进程，返回各次转换的孙进程 pid 文件"""
+    pid_files = []
+
+    async def fake_document_conversion(
+        input_path, output_path, source_ext, target_format, on_progress=None
+    ):
+        pid_file = tmp_path / f"{len(pid_files)}.pid"
+        pid_files.append(pid_file)
+        Path(output_path).write_bytes(b"partial")
+        await converter._run_script([sys.executable, "-c", SPAWN, str(pid_file)], None)
+        return output_path
+
+    monkeypatch.setattr(convert_router, "run_document_conversion", fake_document_conversion)
+    monkeypatch.setattr(settings, "SCHEDULER_CATEGORY_LIMITS", {"document": 1})
+    monkeypatch.setattr(settings, "SCHEDULER_ENGINE_LIMITS", {"libreoffice": 1})
+    return pid_files
+
+
+async def _submit(content_hash=None) -> ConvertTask:
+    input_path = Path(settings.UPLOAD_DIR) / f"{nanoid()}.docx"
+    input_path.write_bytes(b"document")
+    task = ConvertTask(
+        id=nanoid(),
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path=str(input_path),
+        content_hash=content_hash,
+    )
+    await task_manager.create_task(task)
+    job_scheduler.enqueue(task)
+    return task
+
+
+async def _until(predicate) -> None:
+    for _ in range(500):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("等待超时")
+
+
+async def test_cancel_running_task_kills_process_group(slow_conversion):
+    task = await _submit()
+    runner = asyncio.create_task(convert_router.convert_async(task))
+    grandchild = await _pid_from(await _until_pid_file(slow_conversion, 0))
+
+    status = await convert_router.cancel_task(task.id)
+
+    assert (status.state, status.message) == (TaskState.ERROR, "任务已取消")
+    await _assert_dead(grandchild)
+    # 返回时槽位已释放
+    assert job_scheduler.get_stats()["running"]["document"] == 0
+    await runner
+    stored = await task_manager.get_task(task.id)
+    assert (stored.state, stored.error) == (TaskState.ERROR, "任务已取消")
+    assert not Path(task.input_path).exists()
+    assert not _outputs(task)
+    assert task.id not in convert_router.running_conversions
+
+
+def _outputs(task: ConvertTask) -> list:
+    # 与 build_output_path 一致：文件名中的 "-" 替换为 "_"
+    prefix = f"document_{task.id[:6]}".replace("-", "_")
+    return list(Path(settings.PUBLIC_DIR).glob(f"{prefix}_*"))
+
+
+async def _until_pid_file(pid_files, index: int) -> Path:
+    await _until(lambda: len(pid_files) > index)
+    return pid_files[index]
+
+
+async def test_cancel_queued_task_frees_queue(slow_conversion):
+    running, queued = await _submit(), await _submit()
+    runners = [asyncio.create_task(convert_router.convert_async(t)) for t in (running, queued)]
+    await _pid_from(await _until_pid_file(slow_conversion, 0))
+    assert job_scheduler.get_stats()["queued"]["document"] == 1
+
+    await convert_router.cancel_task(queued.id)
+    assert job_scheduler.get_stats()["queued"]["document"] == 0
+    assert len(slow_conversion) == 1
+
+    await convert_router.cancel_task(running.id)
+    await asyncio.gather(*runners)
+    assert job_scheduler.get_stats()["running"]["document"] == 0
+
+
+async def test_cancel_before_background_start(slow_conversion):
+    task = await _submit()
+    await convert_router.cancel_task(task.id)
+    assert job_scheduler.get_stats()["queued"]["document"] == 0
+
+    await convert_router.convert_async(task)
+    assert not slow_conversion
+    assert (await task_manager.get_task(task.id)).error == "任务已取消"
+
+
+async def test_cancel_from_other_instance(slow_conversion):
+    task = await _submit()
+    runner = asyncio.create_task(convert_router.convert_async(task))
+    grandchild = await _pid_from(await _until_pid_file(slow_conversion, 0))
+
+    # 其他实例的取消接口只写入任务状态，本实例收到更新通知后终止转换
+    other = await task_manager.get_task(task.id)
+    await convert_router.mark_task_cancelled(other)
+
+    await asyncio.wait_for(runner, 5)
+    await _assert_dead(grandchild)
+    assert job_scheduler.get_stats()["running"]["document"] == 0
+
+
+async def test_cancelled_leader_keeps_shared_conversion(slow_conversion):
+    content_hash = nanoid(size=32)
+    leader, follower = await _submit(content_hash), await _submit(content_hash)
+    runners = [asyncio.create_task(convert_router.convert_async(leader))]
+    grandchild = await _pid_from(await _until_pid_file(slow_conversion, 0))
+    runners.append(asyncio.create_task(convert_router.convert_async(follower)))
+    # coalesced 统计在测试之间累计，以 follower 的状态判断是否已合并
+    await _until(lambda: follower.state == TaskState.PROCESSING)
+
+    await convert_router.cancel_task(leader.id)
+    assert psutil.Process(grandchild).status() != psutil.STATUS_ZOMBIE
+    assert (await task_manager.get_task(follower.id)).state == TaskState.PROCESSING
+
+    # 最后一个等待的任务也取消后转换才终止
+    await convert_router.cancel_task(follower.id)
+    await _assert_dead(grandchild)
+    await asyncio.gather(*runners)
+    assert (await task_manager.get_task(leader.id)).error == "任务已取消"
+    # leader 写入的部分输出随转换终止删除
+    assert not _outputs(leader)
+
+
+async def test_cancelled_leader_output_follows_leader_task(monkeypatch):
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def fake_document_conversion(
+        input_path, output_path, source_ext, target_format, on_progress=None
+    ):
+        started.set()
+        await release.wait()
+        Path(output_path).write_bytes(b"converted")
+        return output_path
+
+    monkeypatch.setattr(convert_router, "run_document_conversion", fake_document_conversion)
+    content_hash = nanoid(size=32)
+    leader, follower = await _submit(content_hash), await _submit(content_hash)
+    runners = [asyncio.create_task(convert_router.convert_async(leader))]
+    await started.wait()
+    runners.append(asyncio.create_task(convert_router.convert_async(follower)))
+    await _until(lambda: follower.state == TaskState.PROCESSING)
+
+    await convert_router.cancel_task(leader.id)
+    release.set()
+    await asyncio.gather(*runners)
+
+    # 合并的任务链接了 leader 的产物，leader 的文件记录在已取消的任务上，随其过期清理
+    stored = await task_manager.get_task(leader.id)
+    assert stored.error == "任务已取消"
+    assert _outputs(leader) == [Path(stored.output_path)]
+    assert (await task_manager.get_task(follower.id)).state == TaskState.FINISHED
+
+
+async def test_cancel_rejects_missing_and_finished_tasks():
+    with pytest.raises(HTTPException) as missing:
+        await convert_router.cancel_task("missing")
+    assert missing.value.status_code == 404
+
+    task = await _submit()
+    job_scheduler.discard(task.id)
+    task.state = TaskState.FINISHED
+    await task_manager.update_task(task, "state")
+    with pytest.raises(HTTPException) as finished:
+        await convert_router.cancel_task(task.id)
+    assert finished.value.status_code == 409
+
+
+async def test_timeout_kills_process_group(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CONVERSION_TIMEOUT", 0.5)
+    pid_file = tmp_path / "timeout.pid"
+
+    with pytest.raises(asyncio.TimeoutError):
+        await converter._run_script([sys.executable, "-c", SPAWN, str(pid_file)], None)
+    await _assert_dead(await _pid_from(pid_file))
@@ -0,0 +1,70 @@
+"""
+任务紧凑编码测试
+"""
+
+from datetime import datetime
+from pathlib import Path
+
+from app.models import Category, ConvertTask, TaskState
+from app.routers.convert import mark_task_finished
+from app.utils.task_codec import decode_task, encode_task
+
+
+def _task() -> ConvertTask:
+    return ConvertTask(
+        id="abc",
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path="uploads/input.docx",
+        original_filename="季度报告",
+        content_hash="f" * 64,
+        started_at=datetime.now(),
+        queue_wait_ms=15,
+    )
+
+
+def test_roundtrip_is_exact():
+    task = _task()
+    mark_task_finished(task, Path("public/季度报告_2510161230.pdf"))
+    mapping, removed = encode_task(task)
+
+    assert decode_task("abc", mapping) == task
+    # 由文件名生成的 URL 和任务 ID 不存储
+    assert not {"u", "d", "p"} & mapping.keys()
+    assert "abc" not in "".join(mapping.values())
+    assert set(removed) == {"e", "u", "d", "p", "a", "m", "k"}
+
+
+def test_progress_roundtrip():
+    task = _task()
+    task.progress = 40
+    task.stage = "render"
+    mapping, removed = encode_task(task, ("progress", "stage"))
+
+    assert mapping == {"g": "40", "a": "render"} and not removed
+    decoded = decode_task("abc", encode_task(task)[0])
+    assert (decoded.progress, decoded.stage) == (40, "render")
+
+
+def test_custom_urls_are_kept():
+    task = _task()
+    task.output_path = "public/out.pdf"
+    task.url = "/public/out.pdf"
+    mapping, _ = encode_task(task)
+
+    decoded = decode_task("abc", mapping)
+    assert decoded.url == "/public/out.pdf"
+    assert decoded.download_url.endswith("/download/out.pdf")
+
+
+def test_partial_encode_only_touches_given_fields():
+    task = _task()
+    task.state = TaskState.ERROR
+    task.error = "转换失败"
+    mapping, removed = encode_task(task, {"state", "error", "updated_at"})
+
+    assert set(mapping) == {"s", "e", "t"}
+    assert removed == []
+    # 只有部分字段（没有定长数组）的 Hash 视为不存在
+    assert decode_task("abc", mapping) is None
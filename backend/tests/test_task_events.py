@@ -0,0 +1,156 @@
+"""
+任务状态推送测试（SSE / WebSocket / Redis 多实例广播）
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from app.models import Category, ConvertTask, TaskState
+from app.routers.convert import get_task_status, mark_task_finished, task_status_events
+from app.utils.task_events import task_events
+from app.utils.task_manager import RedisTaskManager, task_manager
+
+
+def _task(task_id: str) -> ConvertTask:
+    return ConvertTask(
+        id=task_id,
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path=f"/tmp/{task_id}-in.docx",
+    )
+
+
+async def test_event_stream_follows_state_changes():
+    task = _task("evt-flow")
+    await task_manager.create_task(task)
+    events = task_status_events(task.id)
+
+    assert await anext(events) == ("status", {"state": "queued"})
+    task.state = TaskState.PROCESSING
+    await task_manager.update_task(task, "state")
+    assert await anext(events) == ("status", {"state": "processing"})
+
+    mark_task_finished(task, Path("public/out.pdf"))
+    await task_manager.update_task(task, "state", "output_path", "url")
+    _, status = await anext(events)
+    assert status["state"] == "finished" and status["url"].endswith("/public/out.pdf")
+    # 任务结束后事件流结束，订阅被清理
+    with pytest.raises(StopAsyncIteration):
+        await anext(events)
+    assert task_events.get_stats()["subscribers"] == 0
+
+
+async def test_event_stream_heartbeat_and_deleted_task(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "TASK_EVENTS_HEARTBEAT", 0.01)
+    await task_manager.create_task(_task("evt-gone"))
+    events = task_status_events("evt-gone")
+
+    await anext(events)
+    assert await anext(events) == ("ping", None)
+    await task_manager.delete_task("evt-gone")
+    assert await anext(events) == ("error", {"message": "任务不存在"})
+
+
+async def test_long_poll_returns_on_state_change():
+    task = _task("evt-long")
+    await task_manager.create_task(task)
+
+    async def finish_later():
+        await asyncio.sleep(0.05)
+        task.state = TaskState.PROCESSING
+        await task_manager.update_task(task, "state")
+
+    start = time.perf_counter()
+    status, _ = await asyncio.gather(get_task_status(task.id, wait=10), finish_later())
+    assert status.state == TaskState.PROCESSING
+    assert time.perf_counter() - start < 1
+
+
+async def test_long_poll_times_out_with_current_state():
+    await task_manager.create_task(_task("evt-long-timeout"))
+
+    status = await get_task_status("evt-long-timeout", wait=0.05)
+    assert status.state == TaskState.QUEUED
+    assert task_events.get_stats()["subscribers"] == 0
+
+
+def test_long_poll_wait_is_bounded(client):
+    task = _task("evt-long-done")
+    task.state = TaskState.ERROR
+    asyncio.run(task_manager.create_task(task))
+
+    # 已结束的任务立即返回
+    assert client.get("/convert/task/evt-long-done?wait=25").json()["state"] == "error"
+    assert client.get("/convert/task/evt-long-done?wait=3600").status_code == 422
+    assert client.get("/convert/task/missing?wait=1").status_code == 404
+
+
+def test_sse_endpoint(client):
+    task = _task("evt-sse")
+    task.state = TaskState.ERROR
+    task.error = "转换失败"
+    asyncio.run(task_manager.create_task(task))
+
+    resp = client.get("/convert/task/evt-sse/events")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    event, data = resp.text.strip().split("\n")
+    assert event == "event: status"
+    assert json.loads(data.removeprefix("data: ")) == {"state": "error", "message": "转换失败"}
+
+    assert client.get("/convert/task/missing/events").status_code == 404
+
+
+def test_websocket_endpoint(client):
+    task = _task("evt-ws")
+    asyncio.run(task_manager.create_task(task))
+
+    with client.websocket_connect("/convert/task/evt-ws/ws") as ws:
+        assert ws.receive_json() == {"type": "status", "state": "queued"}
+        # 在另一个事件循环中更新任务（应用运行在 TestClient 的线程中）
+        task.state = TaskState.ERROR
+        asyncio.run(task_manager.update_task(task, "state"))
+        assert ws.receive_json() == {"type": "status", "state": "error"}
+
+    with client.websocket_connect("/convert/task/missing/ws") as ws:
+        assert ws.receive_json() == {"type": "error", "message": "任务不存在"}
+
+
+async def test_redis_updates_reach_subscribers_on_other_instances():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    instances = []
+    for _ in range(2):
+        manager = RedisTaskManager("redis://localhost:6379/0")
+        manager._redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        instances.append(manager)
+    reader, writer = instances
+    await reader.start()
+    try:
+        for _ in range(200):
+            if reader._cache.active:
+                break
+            await asyncio.sleep(0.01)
+        task = _task("evt-redis")
+        await writer.create_task(task)
+
+        with task_events.subscribe(task.id) as changed:
+            # 模拟另一个实例写入：只发布更新通知，本进程内没有直接通知
+            task.state = TaskState.PROCESSING
+            async with writer._redis.pipeline(transaction=True) as pipe:
+                await writer._write(pipe, task, {"state"})
+                pipe.publish(writer._channel, task.id)
+                await pipe.execute()
+            await asyncio.wait_for(changed.wait(), 2)
+        assert (await reader.get_task(task.id)).state == TaskState.PROCESSING
+    finally:
+        await reader.close()
+        await writer.close()
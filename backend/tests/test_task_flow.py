@@ -24,7 +24,7 @@ def patch_conversion(monkeypatch):
         from app.models import TaskState
 
         task.state = TaskState.FINISHED
-        task_manager.update_task(task)
+        await task_manager.update_task(task)
 
     monkeypatch.setattr(convert_router, "convert_async", fake_convert_async)
     yield
@@ -0,0 +1,283 @@
+"""
+任务管理器测试（fakeredis 模拟 Redis）
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Category, ConvertTask, TaskState
+from app.utils.task_manager import MemoryTaskManager, RedisTaskManager, SQLiteTaskManager
+
+fakeredis = pytest.importorskip("fakeredis")
+# 写入脚本需要 fakeredis 的 Lua 支持
+pytest.importorskip("lupa")
+
+# 模拟仍需支持的 Redis 6：不接受 EXPIRE 的 NX / XX / GT / LT 选项
+REDIS_VERSION = 6
+
+
+@pytest.fixture()
+async def manager():
+    manager = RedisTaskManager("redis://localhost:6379/0")
+    manager._redis = fakeredis.FakeAsyncRedis(decode_responses=True, version=REDIS_VERSION)
+    yield manager
+    await manager.close()
+
+
+@pytest.fixture(params=["redis", "memory", "sqlite"])
+async def any_manager(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryTaskManager()
+        return
+    if request.param == "sqlite":
+        manager = SQLiteTaskManager(str(tmp_path / "tasks.db"))
+        yield manager
+        await manager.close()
+        return
+    manager = RedisTaskManager("redis://localhost:6379/0")
+    manager._redis = fakeredis.FakeAsyncRedis(decode_responses=True, version=REDIS_VERSION)
+    yield manager
+    await manager.close()
+
+
+def _task(task_id: str = "t1") -> ConvertTask:
+    return ConvertTask(
+        id=task_id,
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path="/tmp/in.docx",
+        original_filename="报告",
+    )
+
+
+async def test_create_and_get_roundtrip(manager):
+    task = _task()
+    await manager.create_task(task)
+
+    stored = await manager.get_task("t1")
+    assert stored == task
+    assert await manager._redis.type(manager._key("t1")) == "hash"
+    assert await manager.get_task("missing") is None
+
+
+async def test_partial_update_writes_only_given_fields(manager):
+    task = _task()
+    await manager.create_task(task)
+    await manager._redis.expire(manager._key("t1"), 100)
+
+    task.state = TaskState.PROCESSING
+    task.queue_wait_ms = 42
+    task.url = "/public/not-written.pdf"
+    await manager.update_task(task, "state", "queue_wait_ms")
+
+    stored = await manager.get_task("t1")
+    assert stored.state == TaskState.PROCESSING
+    assert stored.queue_wait_ms == 42
+    assert stored.url is None
+    assert stored.updated_at == task.updated_at
+    # 更新不会重置剩余过期时间
+    assert 0 < await manager._redis.ttl(manager._key("t1")) <= 100
+
+
+async def test_write_path_sends_no_expire_options(manager):
+    sent = []
+    pipeline = manager._redis.pipeline
+
+    def recording_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def recording_execute(*a, **kw):
+            sent.extend(command for command, _ in pipe.command_stack)
+            return await execute(*a, **kw)
+
+        pipe.execute = recording_execute
+        return pipe
+
+    manager._redis.pipeline = recording_pipeline
+    task = _task()
+    await manager.create_task(task)
+    task.error = "失败"
+    await manager.update_task(task, "error")
+    task.error = None
+    await manager.update_task(task)
+
+    expires = [command for command in sent if str(command[0]).upper() == "EXPIRE"]
+    assert expires and all(len(command) == 3 for command in expires)
+    assert any(str(command[0]).upper() == "EVALSHA" for command in sent)
+
+
+async def test_update_clears_none_fields(manager):
+    task = _task()
+    task.error = "旧错误"
+    await manager.create_task(task)
+
+    task.error = None
+    await manager.update_task(task, "error")
+    assert (await manager.get_task("t1")).error is None
+
+
+async def test_update_after_expiry_does_not_resurrect_task(manager):
+    task = _task()
+    task.state = TaskState.FINISHED
+    await manager.update_task(task, "state")
+
+    assert await manager.get_task("t1") is None
+    assert await manager._redis.ttl(manager._key("t1")) > 0
+
+
+async def test_reads_legacy_json_tasks(manager):
+    task = _task("old")
+    legacy = task.model_dump_json(exclude_none=True)
+    await manager._redis.setex("converteasy:task:old", 60, legacy)
+
+    assert await manager.get_task("old") == task
+    await manager.delete_task("old")
+    assert await manager.get_task("old") is None
+
+
+async def test_reads_v1_hash_tasks(manager):
+    task = _task("v1")
+    data = {k: str(v) for k, v in task.model_dump(mode="json", exclude_none=True).items()}
+    await manager._redis.hset("converteasy:tasks:v1", mapping=data)
+
+    assert await manager.get_task("v1") == task
+    await manager.delete_task("v1")
+    assert await manager._redis.exists("converteasy:tasks:v1") == 0
+
+
+async def test_stats_follow_state_transitions(any_manager):
+    tasks = [_task(f"t{i}") for i in range(4)]
+    for task in tasks:
+        await any_manager.create_task(task)
+
+    tasks[0].state = TaskState.PROCESSING
+    await any_manager.update_task(tasks[0], "state")
+    tasks[0].state = TaskState.FINISHED
+    await any_manager.update_task(tasks[0], "state", "url")
+    tasks[1].state = TaskState.ERROR
+    await any_manager.update_task(tasks[1])
+    # 不含 state 的更新不影响统计
+    await any_manager.update_task(tasks[2], "url")
+    await any_manager.delete_task(tasks[3].id)
+
+    assert await any_manager.get_stats() == {
+        "total": 3,
+        "queued": 1,
+        "processing": 0,
+        "finished": 1,
+        "error": 1,
+    }
+
+
+async def test_list_tasks_newest_first_with_pagination(any_manager):
+    base = datetime.now()
+    for i in range(5):
+        task = _task(f"t{i}")
+        task.created_at = base + timedelta(seconds=i)
+        task.state = TaskState.FINISHED if i % 2 else TaskState.QUEUED
+        await any_manager.create_task(task)
+
+    page = await any_manager.list_tasks(offset=1, limit=2)
+    assert [t.id for t in page] == ["t3", "t2"]
+    finished = await any_manager.list_tasks(TaskState.FINISHED)
+    assert [t.id for t in finished] == ["t3", "t1"]
+    assert await any_manager.list_tasks(offset=10) == []
+
+
+async def test_expired_tasks_leave_the_indexes(manager):
+    old = _task("old")
+    old.created_at = datetime.fromtimestamp(time.time() - manager._ttl - 10)
+    await manager.create_task(old)
+    await manager.create_task(_task("new"))
+    # 模拟任务 Hash 已过期
+    await manager._redis.delete(manager._key("old"))
+
+    assert (await manager.get_stats())["total"] == 1
+    assert [t.id for t in await manager.list_tasks()] == ["new"]
+    assert await manager._redis.zcard(manager._index_key()) == 1
+
+
+def test_recent_tasks_endpoint(client):
+    resp = client.get("/server-status/tasks", params={"limit": 5})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["limit"] == 5
+    assert len(data["tasks"]) <= 5
+    assert data["total"] >= len(data["tasks"])
+
+    assert client.get("/server-status/tasks", params={"state": "bogus"}).status_code == 422
+
+
+async def test_memory_roundtrip_is_exact_copy():
+    manager = MemoryTaskManager()
+    task = _task()
+    task.started_at = datetime.now()
+    task.queue_wait_ms = 7
+    await manager.create_task(task)
+
+    stored = await manager.get_task("t1")
+    assert stored == task
+    assert stored is not task
+    # 修改副本不影响存储，需调用 update_task 写回
+    stored.state = TaskState.FINISHED
+    assert (await manager.get_task("t1")).state == TaskState.QUEUED
+
+
+async def test_memory_evicts_least_recently_used_terminal_tasks():
+    manager = MemoryTaskManager(max_tasks=3)
+    for i in range(3):
+        task = _task(f"t{i}")
+        task.state = TaskState.QUEUED if i == 0 else TaskState.FINISHED
+        await manager.create_task(task)
+    # t1 最近被查询过，t2 成为最久未访问的已结束任务
+    await manager.get_task("t1")
+
+    await manager.create_task(_task("t3"))
+    assert await manager.get_task("t2") is None
+    assert [t.id for t in await manager.list_tasks()] == ["t3", "t1", "t0"]
+
+    # 只剩进行中的任务时不再淘汰，允许暂时超出上限
+    t1 = await manager.get_task("t1")
+    t1.state = TaskState.PROCESSING
+    await manager.update_task(t1, "state")
+    await manager.create_task(_task("t4"))
+    assert (await manager.get_stats())["total"] == 4
+
+
+async def test_memory_expired_tasks_in_creation_order():
+    manager = MemoryTaskManager()
+    now = datetime.now()
+    for i, age in enumerate([7200, 3700, 10]):
+        task = _task(f"t{i}")
+        task.created_at = now - timedelta(seconds=age)
+        await manager.create_task(task)
+
+    assert [t.id for t in await manager.get_expired_tasks(3600)] == ["t0", "t1"]
+    assert await manager.get_expired_tasks(86400) == []
+
+
+async def test_memory_state_index_follows_updates():
+    manager = MemoryTaskManager()
+    base = datetime.now()
+    tasks = []
+    for i in range(4):
+        task = _task(f"t{i}")
+        task.created_at = base + timedelta(seconds=i)
+        await manager.create_task(task)
+        tasks.append(task)
+
+    # 状态变化后按创建时间（而非进入该状态的时间）排序
+    for task in (tasks[2], tasks[0], tasks[3]):
+        task.state = TaskState.FINISHED
+        await manager.update_task(task, "state")
+    await manager.delete_task("t3")
+
+    finished = await manager.list_tasks(TaskState.FINISHED)
+    assert [t.id for t in finished] == ["t2", "t0"]
+    assert [t.id for t in await manager.list_tasks(TaskState.FINISHED, offset=1)] == ["t0"]
+    assert [t.id for t in await manager.list_tasks(TaskState.QUEUED)] == ["t1"]
+    assert (await manager.get_stats())["finished"] == 2
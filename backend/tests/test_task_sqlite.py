@@ -0,0 +1,126 @@
+"""
+SQLite 任务管理器测试
+"""
+
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Category, ConvertTask, TaskState
+from app.utils.task_manager import SQLiteTaskManager
+
+
+def _task(task_id: str = "t1") -> ConvertTask:
+    return ConvertTask(
+        id=task_id,
+        category=Category.DOCUMENT,
+        target="pdf",
+        source="docx",
+        input_path="/tmp/in.docx",
+        original_filename="报告",
+    )
+
+
+@pytest.fixture()
+def db_path(tmp_path):
+    return str(tmp_path / "data" / "tasks.db")
+
+
+@pytest.fixture()
+async def manager(db_path):
+    manager = SQLiteTaskManager(db_path)
+    yield manager
+    await manager.close()
+
+
+async def test_roundtrip_is_exact_copy(manager):
+    task = _task()
+    task.started_at = datetime.now()
+    task.queue_wait_ms = 37
+    await manager.create_task(task)
+
+    assert await manager.get_task("t1") == task
+    assert await manager.get_task("missing") is None
+    with sqlite3.connect(manager._db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+async def test_partial_updates_do_not_overwrite_other_fields(manager):
+    await manager.create_task(_task())
+    worker, canceller = await manager.get_task("t1"), await manager.get_task("t1")
+
+    worker.output_path = "public/out.pdf"
+    canceller.error = "失败"
+    await asyncio.gather(
+        manager.update_task(worker, "output_path"), manager.update_task(canceller, "error")
+    )
+
+    stored = await manager.get_task("t1")
+    assert (stored.output_path, stored.error) == ("public/out.pdf", "失败")
+
+
+async def test_concurrent_writes_share_transactions(manager):
+    tasks = [_task(f"t{i}") for i in range(200)]
+    await asyncio.gather(*[manager.create_task(task) for task in tasks])
+
+    stats = manager.get_db_stats()
+    assert stats["writes"] == 200
+    assert stats["batches"] < 200
+    assert (await manager.get_stats())["total"] == 200
+
+
+async def test_update_after_delete_does_not_resurrect_task(manager):
+    task = _task()
+    await manager.create_task(task)
+    await manager.delete_task("t1")
+
+    task.state = TaskState.FINISHED
+    await manager.update_task(task, "state")
+    assert await manager.get_task("t1") is None
+
+
+async def test_tasks_survive_restart_and_interrupted_ones_fail(db_path):
+    manager = SQLiteTaskManager(db_path)
+    finished, running = _task("done"), _task("running")
+    finished.state = TaskState.FINISHED
+    running.state = TaskState.PROCESSING
+    for task in (finished, running, _task("queued")):
+        await manager.create_task(task)
+    await manager.close()
+
+    restarted = SQLiteTaskManager(db_path)
+    await restarted.start()
+    try:
+        assert await restarted.get_task("done") == finished
+        for task_id in ("running", "queued"):
+            task = await restarted.get_task(task_id)
+            assert task.state == TaskState.ERROR
+            assert "重启" in task.error
+    finally:
+        await restarted.close()
+
+
+async def test_expired_tasks_in_creation_order(manager):
+    now = datetime.now()
+    for i, age in enumerate((7200, 30, 3700)):
+        task = _task(f"t{i}")
+        task.created_at = now - timedelta(seconds=age)
+        await manager.create_task(task)
+
+    expired = await manager.get_expired_tasks(3600)
+    assert [t.id for t in expired] == ["t0", "t2"]
+
+
+async def test_adds_columns_for_new_task_fields(db_path, tmp_path):
+    (tmp_path / "data").mkdir()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, state TEXT)")
+
+    manager = SQLiteTaskManager(db_path)
+    try:
+        await manager.create_task(_task())
+        assert (await manager.get_task("t1")).original_filename == "报告"
+    finally:
+        await manager.close()
@@ -0,0 +1,92 @@
+"""
+原始请求体上传接口测试: PUT /convert/upload/raw
+"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.utils.task_manager import task_manager
+
+
+@pytest.fixture(autouse=True)
+def patch_conversion(monkeypatch):
+    """跳过实际转换，保留输入文件以便检查"""
+    from app.routers import convert as convert_router
+
+    async def fake_convert_async(task):
+        pass
+
+    monkeypatch.setattr(convert_router, "convert_async", fake_convert_async)
+    yield
+
+
+def test_raw_upload_creates_task(client):
+    body = b"hello raw upload\n" * 100
+    resp = client.put(
+        "/convert/upload/raw",
+        params={"category": "document", "target": "pdf", "filename": "notes.txt"},
+        content=body,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert resp.status_code == 200
+    task = asyncio.run(task_manager.get_task(resp.json()["taskId"]))
+    assert task is not None
+    assert task.source == "txt"
+    assert task.target == "pdf"
+    assert task.original_filename == "notes"
+    assert Path(task.input_path).parent == Path(settings.UPLOAD_DIR)
+    assert Path(task.input_path).read_bytes() == body
+
+
+def test_raw_upload_uses_source_when_no_filename(client):
+    resp = client.put(
+        "/convert/upload/raw",
+        params={"category": "document", "target": "pdf", "source": "txt"},
+        content=b"text",
+    )
+    assert resp.status_code == 200
+    task = asyncio.run(task_manager.get_task(resp.json()["taskId"]))
+    assert task.input_path.endswith(".txt")
+
+
+def test_raw_upload_requires_filename_or_source(client):
+    resp = client.put(
+        "/convert/upload/raw", params={"category": "document", "target": "pdf"}, content=b"x"
+    )
+    assert resp.status_code == 400
+
+
+def test_raw_upload_rejects_unsupported_before_writing(client):
+    before = set(Path(settings.UPLOAD_DIR).iterdir())
+    resp = client.put(
+        "/convert/upload/raw",
+        params={"category": "document", "target": "mp3", "filename": "a.txt"},
+        content=b"text",
+    )
+    assert resp.status_code == 400
+    assert set(Path(settings.UPLOAD_DIR).iterdir()) == before
+
+
+def test_raw_upload_oversize_returns_413(client, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_BYTES", 1024)
+    before = set(Path(settings.UPLOAD_DIR).iterdir())
+    resp = client.put(
+        "/convert/upload/raw",
+        params={"category": "document", "target": "pdf", "filename": "big.txt"},
+        content=b"a" * 4096,
+    )
+    assert resp.status_code == 413
+    assert set(Path(settings.UPLOAD_DIR).iterdir()) == before
+
+
+def test_raw_upload_empty_body(client):
+    resp = client.put(
+        "/convert/upload/raw",
+        params={"category": "document", "target": "pdf", "filename": "a.txt"},
+        content=b"",
+    )
+    assert resp.status_code == 400
+    assert "缺少文件" in resp.json()["detail"]
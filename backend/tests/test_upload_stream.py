@@ -0,0 +1,44 @@
+"""
+流式上传测试：分块写入与大小限制
+"""
+
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.utils.file_utils import FileTooLargeError, save_stream_to_file
+
+
+async def _chunks(count: int, size: int):
+    for _ in range(count):
+        yield b"x" * size
+
+
+async def test_save_stream_to_file_writes_all_chunks(tmp_path):
+    dest = tmp_path / "out.bin"
+    written = await save_stream_to_file(_chunks(4, 1000), dest, max_bytes=10_000)
+    assert written == 4000
+    assert dest.stat().st_size == 4000
+
+
+async def test_save_stream_to_file_rejects_oversize_and_removes_partial(tmp_path):
+    dest = tmp_path / "out.bin"
+    with pytest.raises(FileTooLargeError):
+        await save_stream_to_file(_chunks(10, 1000), dest, max_bytes=2500)
+    assert not dest.exists()
+
+
+def test_upload_oversize_returns_413(client, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_BYTES", 1024)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 256)
+    before = set(Path(settings.UPLOAD_DIR).iterdir())
+
+    files = {"file": ("big.txt", b"a" * 4096, "text/plain")}
+    data = {"category": "document", "target": "pdf"}
+    resp = client.post("/convert/upload", files=files, data=data)
+
+    assert resp.status_code == 413
+    assert "超过限制" in resp.json()["detail"]
+    # 不应残留部分写入的文件
+    assert set(Path(settings.UPLOAD_DIR).iterdir()) == before
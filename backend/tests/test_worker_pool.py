@@ -0,0 +1,127 @@
+"""
+Python 转换 worker 池测试
+"""
+
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.utils.worker_pool import PythonWorkerPool, WorkerCrashedError
+
+SCRIPT = """
+import argparse
+import os
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-i", "--input", required=True)
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--mode", default="ok")
+    args = parser.parse_args()
+    if args.mode == "sleep":
+        time.sleep(30)
+    if args.mode == "crash":
+        os._exit(3)
+    with open(args.input) as src, open(args.output, "w") as dst:
+        dst.write(src.read().upper())
+    print(f"pid={os.getpid()}")
+    sys.exit(0 if args.mode == "ok" else 2)
+"""
+
+
+@pytest.fixture()
+async def pool():
+    instance = PythonWorkerPool()
+    yield instance
+    await instance.close()
+
+
+@pytest.fixture()
+def script(tmp_path) -> Path:
+    path = tmp_path / "fake_convert.py"
+    path.write_text(SCRIPT)
+    return path
+
+
+async def _convert(pool, script, tmp_path, name, mode="ok", timeout=30):
+    src = tmp_path / f"{name}.txt"
+    src.write_text("hello")
+    dest = tmp_path / f"{name}.out"
+    result = await pool.run(script, ["-i", src, "-o", dest, "--mode", mode], timeout)
+    return result, dest
+
+
+async def test_worker_runs_script_and_is_reused(pool, script, tmp_path):
+    (code, stdout, _), dest = await _convert(pool, script, tmp_path, "a")
+    assert code == 0
+    assert dest.read_text() == "HELLO"
+    (_, second_stdout, _), _ = await _convert(pool, script, tmp_path, "b")
+
+    assert stdout == second_stdout  # 同一个 worker 进程
+    stats = pool.get_stats()
+    assert (stats["spawned"], stats["idle"], stats["tasks"]) == (1, 1, 2)
+
+
+async def test_exit_code_and_output_are_returned(pool, script, tmp_path):
+    (code, _, _), _ = await _convert(pool, script, tmp_path, "a", mode="fail")
+    assert code == 2
+    (code, _, stderr), _ = await _convert(pool, script, tmp_path, "b", mode="bad-args")
+    assert code == 2
+    assert pool.get_stats()["idle"] == 1
+
+
+async def test_worker_recycled_after_max_tasks(pool, script, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PY_WORKER_MAX_TASKS", 2)
+    pids = set()
+    for i in range(4):
+        (_, stdout, _), _ = await _convert(pool, script, tmp_path, f"f{i}")
+        pids.add(stdout)
+    assert len(pids) == 2
+    assert pool.get_stats()["recycled"] == 2
+
+
+async def test_timeout_kills_worker(pool, script, tmp_path):
+    with pytest.raises(asyncio.TimeoutError):
+        await _convert(pool, script, tmp_path, "a", mode="sleep", timeout=1)
+    assert pool.get_stats()["idle"] == 0
+
+
+async def test_crashed_worker_is_replaced(pool, script, tmp_path):
+    with pytest.raises(WorkerCrashedError):
+        await _convert(pool, script, tmp_path, "a", mode="crash")
+    (code, _, _), dest = await _convert(pool, script, tmp_path, "b")
+    assert code == 0 and dest.exists()
+    assert pool.get_stats()["spawned"] == 2
+
+
+async def test_retiring_worker_does_not_block_loop(pool, script, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PY_WORKER_MAX_TASKS", 1)
+    stop = PythonWorkerPool._retire
+
+    def slow_retire(self, worker, graceful):
+        time.sleep(0.5)
+        stop(self, worker, graceful)
+
+    monkeypatch.setattr(PythonWorkerPool, "_retire", slow_retire)
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(asyncio.get_running_loop().time())
+            await asyncio.sleep(0.05)
+
+    tick = asyncio.create_task(ticker())
+    try:
+        await _convert(pool, script, tmp_path, "a")
+        await asyncio.sleep(0.1)
+    finally:
+        tick.cancel()
+    # 回收 worker 期间事件循环仍在处理其他协程
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.3
+    assert pool.get_stats()["recycled"] == 1